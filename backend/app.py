@@ -1,29 +1,55 @@
 import os
 import json
+import math
+import hashlib
 import logging
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from recommender import CardRecommender
-from card_scraper import CardScraper
+from card_scraper import DEFAULT_REFRESH_INTERVAL
+from card_identity import CardLookup
+import card_search
+import card_listing
+import http_cache
+import request_logging
+import metrics
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('api.log')
-    ]
-)
+# Log through a background writer thread: JSON lines to api.log, text to the console
+request_logging.configure_logging()
 logger = logging.getLogger('swipe-api')
 
+# Seconds between scheduled card data refreshes (0 disables the schedule)
+REFRESH_INTERVAL = int(os.environ.get('SWIPE_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL))
+
+# Maximum number of items accepted by /api/recommend/batch
+MAX_BATCH_ITEMS = 10000
+
+# Results per /api/search page, by default and at most
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# Cards per /api/cards page when paging with a cursor, by default and at most
+CARDS_PAGE_SIZE = 100
+MAX_CARDS_PAGE_SIZE = 1000
+# /api/cards responses with more cards are streamed instead of kept by the response cache
+MAX_CACHED_CARDS = 20000
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+request_logging.init_app(app)  # Request IDs, durations and per-route log sampling
 
-# Initialize the recommender and scraper
-recommender = CardRecommender()
-scraper = CardScraper()
+# Initialize the recommender and share its scraper (and card catalog)
+recommender = CardRecommender(os.environ.get('SWIPE_DATA_DIR'))
+scraper = recommender.scraper
+# Serialized and compressed catalog and reference data responses, per data version
+response_cache = http_cache.ResponseCache()
+# Per-route request metrics and GET /metrics
+metrics.init_app(app, scraper.catalog, caches={
+    "merchant_classification": recommender.classification_cache,
+    "recommendation_ranking": recommender.ranking_cache,
+    "response_bodies": response_cache.cache
+})
 
 # Setup static file directory for card images
 STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
@@ -43,7 +69,8 @@ def recommend():
             return jsonify({"error": "Request must be JSON"}), 400
             
         data = request.json
-        logger.info(f"Received request: {data}")
+        # The payload is kept as JSON so logged traffic can be replayed
+        logger.info("Received request", extra={"payload": data})
         
         # Validate required fields
         if 'merchant' not in data or 'amount' not in data:
@@ -54,110 +81,333 @@ def recommend():
         amount = float(data['amount'])
         
         # Get optional user preferences if provided
-        user_preferences = data.get('user_preferences', None)
+        try:
+            user_preferences = _parse_user_preferences(data.get('user_preferences'))
+        except ValueError as e:
+            logger.warning("Invalid user preferences in request")
+            return jsonify({"error": f"Invalid user_preferences: {e}"}), 400
         
-        logger.info(f"Processing request for merchant: {merchant}, amount: {amount}")
+        # Optional cap on the number of recommendations (body or query string)
+        limit = data.get('limit', request.args.get('limit'))
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                limit = 0
+            if limit <= 0:
+                logger.warning("Invalid limit in request")
+                return jsonify({"error": "limit must be a positive integer"}), 400
+        
+        logger.debug("Processing request for merchant: %s, amount: %s", merchant, amount)
         
         # Get recommendations using our enhanced recommender
-        response = recommender.get_recommendations(merchant, amount, user_preferences)
+        response = recommender.get_recommendations(merchant, amount, user_preferences, limit)
         
-        logger.info(f"Sending response with {len(response['recommendations'])} recommendations")
+        logger.debug("Sending response with %s recommendations", len(response['recommendations']))
         return jsonify(response)
         
     except Exception as e:
         # Log the error and return a generic error message
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
+
+def _parse_user_preferences(preferences):
+    """Validated user_preferences: issuer and network lists of strings and a numeric max_annual_fee.
+    
+    Raises ValueError on other types, which would otherwise fail in the
+    ranking cache (lists aren't hashable) or the card filter.
+    """
+    if preferences is None:
+        return None
+    if not isinstance(preferences, dict):
+        raise ValueError("must be an object")
+    parsed = {}
+    for name in ("preferred_issuers", "preferred_networks"):
+        values = preferences.get(name)
+        if values is None:
+            continue
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"{name} must be a list of strings")
+        parsed[name] = values
+    max_annual_fee = preferences.get("max_annual_fee")
+    if max_annual_fee is not None:
+        # bool is an int, but not a fee
+        if isinstance(max_annual_fee, bool) or not isinstance(max_annual_fee, (int, float, str)):
+            raise ValueError("max_annual_fee must be a number")
+        try:
+            max_annual_fee = float(max_annual_fee)
+        except ValueError:
+            raise ValueError("max_annual_fee must be a number") from None
+        if not math.isfinite(max_annual_fee):
+            raise ValueError("max_annual_fee must be a number")
+        parsed["max_annual_fee"] = max_annual_fee
+    return parsed
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """Get recommendations for many merchant/amount items in one request"""
+    try:
+        if not request.is_json:
+            logger.warning("Batch request doesn't contain JSON data")
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        data = request.json
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Missing required field: items"}), 400
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({"error": f"Too many items (max {MAX_BATCH_ITEMS})"}), 400
+        
+        # Validate every item up front so the batch is all-or-nothing
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or 'merchant' not in item or 'amount' not in item:
+                return jsonify({"error": f"items[{i}]: Missing required field: merchant or amount"}), 400
+            try:
+                float(item['amount'])
+            except (TypeError, ValueError):
+                return jsonify({"error": f"items[{i}]: amount must be a number"}), 400
+            try:
+                if item.get('user_preferences') is not None:
+                    items[i] = dict(item, user_preferences=_parse_user_preferences(item['user_preferences']))
+            except ValueError as e:
+                return jsonify({"error": f"items[{i}]: Invalid user_preferences: {e}"}), 400
+        
+        limit = data.get('limit', request.args.get('limit'))
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                limit = 0
+            if limit <= 0:
+                return jsonify({"error": "limit must be a positive integer"}), 400
+        
+        logger.info("Processing batch request with %s items", len(items))
+        results = recommender.get_batch_recommendations(items, limit)
+        return jsonify({"success": True, "count": len(results), "results": results})
+        
+    except Exception as e:
+        logger.error("Error processing batch request: %s", e, exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/api/cards', methods=['GET'])
 def get_all_cards():
-    """Return all available credit cards with their details"""
+    """Return the credit cards with their details.
+    
+    fields keeps only the listed card fields. ids returns the cards with
+    the listed IDs (names and aliases work too), and the ones not found.
+    With limit (or a cursor) one page is returned, with the next_cursor to
+    pass as cursor for the next page, or null on the last one. Cards are
+    sent as one JSON object per line when application/x-ndjson is requested
+    (Accept header or format=ndjson); the next cursor is then in the
+    X-Next-Cursor header.
+    
+    The ETag derives from the catalog checksum, so polls of an unchanged
+    catalog get a 304. Unpaged JSON bodies (the whole catalog, per fields
+    projection) are kept serialized and compressed per catalog version,
+    unless the catalog has over MAX_CACHED_CARDS cards; pages and NDJSON
+    responses are encoded as they are sent.
+    """
     try:
-        # Get the cards from our scraper
-        cards = scraper.get_card_data()
-        return jsonify({"cards": cards})
+        snapshot = scraper.get_snapshot()
+        if 'ids' in request.args:
+            return _get_cards_by_id(snapshot)
+        cursor = request.args.get('cursor')
+        try:
+            fields = card_listing.parse_fields(request.args.get('fields'))
+            start = card_listing.decode_cursor(cursor, snapshot.checksum) if cursor else 0
+            limit = request.args.get('limit')
+            limit = int(limit) if limit else (CARDS_PAGE_SIZE if cursor else None)
+        except card_listing.StaleCursor:
+            return jsonify({"error": "The card catalog changed; start again without a cursor"}), 410
+        except ValueError as e:
+            return jsonify({"error": f"Invalid fields, cursor or limit: {e}"}), 400
+        if limit is not None and not 0 < limit <= MAX_CARDS_PAGE_SIZE:
+            return jsonify({"error": f"limit must be 1 to {MAX_CARDS_PAGE_SIZE}"}), 400
+        
+        cards = snapshot.cards
+        end = len(cards) if limit is None else min(start + limit, len(cards))
+        page = (cards[position] for position in range(start, end))
+        next_cursor = card_listing.encode_cursor(snapshot.checksum, end) if end < len(cards) else None
+        
+        ndjson = request.args.get('format', '').lower() == 'ndjson' or request.accept_mimetypes.best_match(
+            ['application/json', card_listing.NDJSON_MIMETYPE]) == card_listing.NDJSON_MIMETYPE
+        if ndjson:
+            mimetype, chunks = card_listing.NDJSON_MIMETYPE, card_listing.iter_ndjson(page, fields)
+        else:
+            # Unpaged responses keep their original {"cards": [...]} shape
+            extra = {"next_cursor": next_cursor} if limit is not None else {}
+            mimetype, chunks = 'application/json', card_listing.iter_json(page, fields, **extra)
+        variant = (fields, start, end, limit is not None, ndjson)
+        etag = f"{snapshot.checksum[:24]}-{hashlib.sha256(repr(variant).encode()).hexdigest()[:16]}"
+        
+        # Pages aren't cached: paging through the catalog would evict the full catalog body
+        if not ndjson and limit is None and len(cards) <= MAX_CACHED_CARDS:
+            response = response_cache.respond(("cards", variant), snapshot.checksum, lambda: "".join(chunks),
+                                              mimetype, etag)
+        elif request.if_none_match.contains_weak(etag):
+            response = http_cache.not_modified(etag)
+        else:
+            # A page, streamed, or too large to keep: encode it while sending
+            response = http_cache.set_cache_headers(Response(chunks, mimetype=mimetype), etag)
+        if ndjson and next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     except Exception as e:
-        logger.error(f"Error getting all cards: {str(e)}", exc_info=True)
+        logger.error("Error getting all cards: %s", e, exc_info=True)
         return jsonify({"error": "Failed to retrieve cards"}), 500
 
+def _get_cards_by_id(snapshot):
+    """/api/cards?ids=: the cards named by IDs (or names, or aliases), in the order asked"""
+    references = [reference.strip() for reference in request.args['ids'].split(',') if reference.strip()]
+    try:
+        fields = card_listing.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid fields: {e}"}), 400
+    if not references:
+        return jsonify({"error": "Query parameter 'ids' is empty"}), 400
+    if len(references) > MAX_CARDS_PAGE_SIZE:
+        return jsonify({"error": f"Too many ids (max {MAX_CARDS_PAGE_SIZE})"}), 400
+    
+    variant = (fields, tuple(references))
+    etag = f"{snapshot.checksum[:24]}-{hashlib.sha256(repr(variant).encode()).hexdigest()[:16]}"
+    if request.if_none_match.contains_weak(etag):
+        return http_cache.not_modified(etag)
+    
+    lookup = snapshot.get_index("lookup", CardLookup)
+    cards, missing = [], []
+    for reference in references:
+        card = lookup.get(reference)
+        if card is None:
+            missing.append(reference)
+        else:
+            cards.append(card_listing.project(card, fields))
+    return http_cache.set_cache_headers(jsonify({"cards": cards, "missing": missing}), etag)
+
 @app.route('/api/card/<card_id>', methods=['GET'])
 def get_card_details(card_id):
-    """Get detailed information about a specific card"""
+    """Get detailed information about a card by its ID, name or an alias"""
     try:
         card_details = recommender.get_card_details(card_id)
-        if card_details:
+        if card_details.get("success"):
             return jsonify(card_details)
         else:
             return jsonify({"error": "Card not found"}), 404
     except Exception as e:
-        logger.error(f"Error getting card details: {str(e)}", exc_info=True)
+        logger.error("Error getting card details: %s", e, exc_info=True)
         return jsonify({"error": "Failed to retrieve card details"}), 500
 
 @app.route('/api/merchant-categories', methods=['GET'])
 def get_merchant_categories():
     """Return all merchant categories"""
     try:
-        return jsonify(recommender.merchant_categories)
+        return response_cache.respond("merchant_categories", recommender.merchant_data_generation,
+                                      lambda: _json_body(recommender.merchant_categories))
     except Exception as e:
-        logger.error(f"Error getting merchant categories: {str(e)}", exc_info=True)
+        logger.error("Error getting merchant categories: %s", e, exc_info=True)
         return jsonify({"error": "Failed to retrieve merchant categories"}), 500
 
 @app.route('/api/top-merchants', methods=['GET'])
 def get_top_merchants():
     """Return list of top merchant domains"""
     try:
-        return jsonify(recommender.top_merchants)
+        return response_cache.respond("top_merchants", recommender.merchant_data_generation,
+                                      lambda: _json_body(recommender.top_merchants))
     except Exception as e:
-        logger.error(f"Error getting top merchants: {str(e)}", exc_info=True)
+        logger.error("Error getting top merchants: %s", e, exc_info=True)
         return jsonify({"error": "Failed to retrieve top merchants"}), 500
 
 @app.route('/api/quarterly-categories', methods=['GET'])
 def get_quarterly_categories():
     """Return current quarterly bonus categories for various cards"""
     try:
-        return jsonify(recommender.quarterly_categories)
+        generation = recommender.merchant_data_generation
+        period = recommender.current_period()
+        quarterly_categories = {card_id: bonus.to_json() for card_id, bonus in period.bonuses.items()}
+        return response_cache.respond("quarterly_categories", (generation, period.start),
+                                      lambda: _json_body(quarterly_categories))
     except Exception as e:
-        logger.error(f"Error getting quarterly categories: {str(e)}", exc_info=True)
+        logger.error("Error getting quarterly categories: %s", e, exc_info=True)
         return jsonify({"error": "Failed to retrieve quarterly categories"}), 500
 
+def _json_body(value):
+    # Same serialization as jsonify, without building a response
+    return app.json.dumps(value, separators=(',', ':'))
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Return hit/miss/eviction statistics for the in-process caches"""
+    try:
+        return jsonify({
+            "merchant_classification": recommender.classification_cache.stats(),
+            "recommendation_ranking": recommender.ranking_cache.stats(),
+            "response_bodies": response_cache.cache.stats()
+        })
+    except Exception as e:
+        logger.error("Error getting cache stats: %s", e, exc_info=True)
+        return jsonify({"error": "Failed to retrieve cache stats"}), 500
+
 @app.route('/api/refresh-card-data', methods=['POST'])
 def refresh_card_data():
-    """Force refresh of card data from external sources"""
+    """Trigger a background refresh of card data from external sources"""
     try:
-        cards = scraper.get_card_data(force_refresh=True)
+        started = scraper.refresh_async()
+        snapshot = scraper.catalog.get_snapshot()
         return jsonify({
             "success": True,
-            "message": f"Successfully refreshed data for {len(cards)} cards",
-            "last_updated": datetime.now().isoformat()
-        })
+            "status": "started" if started else "already_running",
+            "message": "Card data refresh started" if started else "A card data refresh is already in progress",
+            "cards": len(snapshot.cards),
+            "catalog_version": snapshot.version
+        }), 202
     except Exception as e:
-        logger.error(f"Error refreshing card data: {str(e)}", exc_info=True)
+        logger.error("Error refreshing card data: %s", e, exc_info=True)
         return jsonify({"error": "Failed to refresh card data"}), 500
 
 @app.route('/api/search', methods=['GET'])
 def search_cards():
-    """Search for cards by name, issuer, category, etc."""
+    """Search cards by name, issuer, network, benefits and reward categories.
+    
+    Query words match card words they equal or start with, so the last word
+    autocompletes, and from three letters on words they occur in. Results
+    are ranked by relevance and paged with limit and offset; category,
+    min_rate, issuer, network and max_annual_fee filter them. count is the
+    number of matching cards on all pages.
+    """
     try:
-        query = request.args.get('q', '').lower()
-        if not query:
+        query = request.args.get('q', '')
+        try:
+            limit = int(request.args.get('limit', SEARCH_PAGE_SIZE))
+            offset = int(request.args.get('offset', 0))
+            filters = {
+                "category": request.args.get('category', '').lower() or None,
+                "min_rate": _optional_float(request.args.get('min_rate')),
+                "issuer": request.args.get('issuer') or None,
+                "network": request.args.get('network') or None,
+                "max_annual_fee": _optional_float(request.args.get('max_annual_fee'))
+            }
+        except ValueError:
+            return jsonify({"error": "limit, offset, min_rate and max_annual_fee must be numbers"}), 400
+        if not 0 < limit <= MAX_SEARCH_PAGE_SIZE or offset < 0:
+            return jsonify({"error": f"limit must be 1 to {MAX_SEARCH_PAGE_SIZE} and offset non-negative"}), 400
+        if not query.strip() and all(value is None for value in filters.values()):
             return jsonify({"error": "Query parameter 'q' is required"}), 400
-            
-        cards = scraper.get_card_data()
         
-        # Filter cards based on query
-        results = []
-        for card in cards:
-            # Check if query matches card name or issuer
-            if (query in card.get('name', '').lower() or 
-                query in card.get('issuer', '').lower() or 
-                query in card.get('network', '').lower()):
-                results.append(card)
+        index = scraper.get_snapshot().get_index("search", card_search.SearchIndex)
+        count, page = index.search(query, limit, offset, **filters)
         
-        return jsonify({"results": results, "count": len(results)})
+        return jsonify({
+            "results": [index.cards[position] for position, _ in page],
+            "count": count,
+            "offset": offset,
+            "limit": limit
+        })
     except Exception as e:
-        logger.error(f"Error searching cards: {str(e)}", exc_info=True)
+        logger.error("Error searching cards: %s", e, exc_info=True)
         return jsonify({"error": "Failed to search cards"}), 500
 
+def _optional_float(value):
+    return float(value) if value not in (None, '') else None
+
 @app.route('/api/images/<path:filename>')
 def get_card_image(filename):
     """Serve card images from the static directory"""
@@ -173,7 +423,7 @@ def test_recommendation():
         response = recommender.get_recommendations(merchant, amount)
         return jsonify(response)
     except Exception as e:
-        logger.error(f"Error in test recommendation: {str(e)}", exc_info=True)
+        logger.error("Error in test recommendation: %s", e, exc_info=True)
         return jsonify({"error": "Failed to generate test recommendation"}), 500
 
 @app.route('/ping', methods=['GET'])
@@ -217,6 +467,7 @@ def home():
             <pre>{
   "merchant": "Amazon",
   "amount": 50.0,
+  "limit": 5,
   "user_preferences": {
     "preferred_issuers": ["Chase", "Amex"],
     "preferred_networks": ["Visa"],
@@ -225,14 +476,27 @@ def home():
 }</pre>
         </div>
         
+        <div class="endpoint">
+            <h3>POST /api/recommend/batch</h3>
+            <p>Get recommendations for many purchases at once; results come back in input order</p>
+            <pre>{
+  "items": [
+    {"merchant": "Amazon", "amount": 50.0},
+    {"merchant": "Shell", "amount": 40.0, "user_preferences": {"max_annual_fee": 0}}
+  ],
+  "limit": 3
+}</pre>
+        </div>
+        
         <div class="endpoint">
             <h3>GET /api/cards</h3>
             <p>Get all available credit cards</p>
+            <p>Optional parameters: <code>fields</code> (comma separated card fields), <code>limit</code> and <code>cursor</code> (pages with a <code>next_cursor</code>), <code>format=ndjson</code> (one card per line), <code>ids</code> (comma separated card IDs)</p>
         </div>
         
         <div class="endpoint">
             <h3>GET /api/card/:card_id</h3>
-            <p>Get detailed information about a specific card</p>
+            <p>Get detailed information about a specific card, by ID, name or alias (e.g. "Amex Gold")</p>
         </div>
         
         <div class="endpoint">
@@ -242,17 +506,28 @@ def home():
         
         <div class="endpoint">
             <h3>GET /api/quarterly-categories</h3>
-            <p>Get current quarterly bonus categories for various cards</p>
+            <p>Get the rotating bonus categories in effect today, keyed by card ID</p>
+        </div>
+        
+        <div class="endpoint">
+            <h3>GET /metrics</h3>
+            <p>Request, recommendation, catalog and card source metrics in the Prometheus text format</p>
+        </div>
+        
+        <div class="endpoint">
+            <h3>GET /api/cache-stats</h3>
+            <p>Hit, miss and eviction statistics for the in-process caches</p>
         </div>
         
         <div class="endpoint">
             <h3>POST /api/refresh-card-data</h3>
-            <p>Force refresh of card data from external sources</p>
+            <p>Start a background refresh of card data from external sources (only one runs at a time)</p>
         </div>
         
         <div class="endpoint">
             <h3>GET /api/search?q=:query</h3>
-            <p>Search for cards by name, issuer, category, etc.</p>
+            <p>Search for cards by name, issuer, network, benefits and reward categories, best matches first; the last word autocompletes</p>
+            <p>Optional parameters: <code>limit</code> (default 20), <code>offset</code>, <code>category</code>, <code>min_rate</code>, <code>issuer</code>, <code>network</code>, <code>max_annual_fee</code></p>
         </div>
         
         <div class="endpoint">
@@ -265,11 +540,14 @@ def home():
     """
 
 if __name__ == '__main__':
-    # Make sure we have some initial card data
+    # Make sure we have some initial card data (stale data triggers a background refresh)
     try:
         scraper.get_card_data()
     except Exception as e:
-        logger.error(f"Error loading initial card data: {str(e)}", exc_info=True)
+        logger.error("Error loading initial card data: %s", e, exc_info=True)
+    
+    # Keep card data fresh even without traffic
+    scraper.start_refresh_scheduler(REFRESH_INTERVAL)
     
     # Start the Flask app
     app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
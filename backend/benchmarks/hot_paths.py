@@ -0,0 +1,364 @@
+"""Throughput and memory of the recommender and scraper hot paths.
+
+Runs each hot path against synthetic card catalogs of the given sizes and
+a synthetic merchant corpus, and reports operations per second and the
+tracemalloc peak of one call:
+
+    python -m benchmarks.hot_paths [--sizes 100,10000,100000] [--min-time 0.5]
+                                   [--only search,merge_cards] [--output results.json]
+                                   [--baseline benchmarks/baseline.json] [--threshold 0.25]
+
+Results are compared with the baseline (benchmarks/baseline.json unless
+--baseline is given). Benchmarks whose ops/sec dropped, or whose peak
+memory grew, by more than the threshold are listed and the exit status is
+1, so a deploy script can stop on them. --update-baseline saves the run as
+the new baseline. Timings depend on the machine: record the baseline on
+the machine that runs the comparison.
+"""
+import os
+import sys
+import html
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import card_listing  # noqa: E402
+from card_scraper import NERDWALLET_SPEC  # noqa: E402
+from card_search import SearchIndex  # noqa: E402
+from html_parsing import parse_page  # noqa: E402
+from recommender import CardRecommender, MERCHANT_SPECIFIC_MAPPING  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = (100, 10000, 100000)
+DEFAULT_MERCHANTS = 2000
+# Slowdown (or memory growth) relative to the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# Peak memory differences below this many KiB are noise, whatever the ratio
+MEMORY_SLACK_KIB = 16
+
+ISSUERS = ("Chase", "Citi", "American Express", "Capital One", "Discover", "Wells Fargo", "Bank of America",
+           "U.S. Bank", "Barclays", "Synchrony")
+NETWORKS = ("Visa", "Mastercard", "American Express", "Discover")
+PRODUCT_WORDS = ("Freedom", "Sapphire", "Double", "Cash", "Venture", "Quicksilver", "Gold", "Platinum", "Active",
+                 "Custom", "Premier", "Everyday", "Miles", "Rewards", "Travel", "Dividend", "it", "Flex")
+REWARD_CATEGORIES = ("dining", "groceries", "travel", "gas", "streaming", "online_shopping", "drugstores", "transit",
+                     "entertainment", "airlines", "lodging", "wholesale_clubs")
+# Whole words, the keystrokes of an autocompleted query, and no match
+SEARCH_QUERIES = ("chase", "sapphire", "visa", "gold 12", "american express", "no such card",
+                  "s", "sa", "sap", "sapp", "sapphire t", "sapphire tr")
+PREFERENCES = {"preferred_issuers": ["Chase", "Citi"], "max_annual_fee": 95}
+
+
+def make_cards(size, seed=0, first=0):
+    """Synthetic cards shaped like credit_cards.json, numbered from first"""
+    rng = random.Random(seed)
+    cards = []
+    for number in range(first, first + size):
+        issuer = ISSUERS[number % len(ISSUERS)]
+        categories = {category: rng.choice((2, 3, 4, 5))
+                      for category in rng.sample(REWARD_CATEGORIES, rng.randint(0, 3))}
+        categories["other"] = rng.choice((1, 1.25, 1.5, 2))
+        cards.append({
+            "name": f"{issuer} {rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_WORDS)} {number}",
+            "issuer": issuer,
+            "network": rng.choice(NETWORKS),
+            "annual_fee": rng.choice((0, 0, 0, 95, 250, 550)),
+            "categories": categories,
+            "intro_offer": f"${rng.randrange(100, 1000, 50)} bonus after spending ${rng.randrange(500, 5000, 500)} "
+                           f"in first 3 months"
+        })
+    return cards
+
+
+def make_merchants(count, top_merchants, merchant_categories, seed=0):
+    """Merchant strings as sent by the extension: domains, URLs, store names and unknowns"""
+    rng = random.Random(seed)
+    domains = sorted(top_merchants)
+    keywords = sorted({keyword for words in merchant_categories.values() for keyword in words})
+    brands = sorted(MERCHANT_SPECIFIC_MAPPING)
+    templates = (
+        lambda: rng.choice(domains),
+        lambda: f"https://www.{rng.choice(domains)}/checkout?step={rng.randint(1, 9)}",
+        lambda: f"{rng.choice(keywords).title()} #{rng.randint(1, 9999)}",
+        lambda: f"{rng.choice(brands)} store {rng.randint(1, 999)}",
+        lambda: f"shop-{rng.randint(1, 10 ** 6)}.example",
+    )
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def nerdwallet_page(cards):
+    """A listing page with one NERDWALLET_SPEC listing per card"""
+    classes = {field: selector.lstrip('.') for field, selector in NERDWALLET_SPEC.fields.items()}
+    container = NERDWALLET_SPEC.container.lstrip('.')
+    listings = []
+    for card in cards:
+        listings.append(
+            f'<div class="{container}">'
+            f'<h3 class="{classes["name"]}">{html.escape(card["name"])}</h3>'
+            f'<span class="{classes["issuer"]}">{html.escape(card["issuer"])}</span>'
+            f'<p class="{classes["offer"]}">{html.escape(card["intro_offer"])}</p>'
+            f'<span class="{classes["fee"]}">${card["annual_fee"]}</span>'
+            f'</div>')
+    return f'<html><body><main>{"".join(listings)}</main></body></html>'
+
+
+class Context:
+    """A recommender serving a synthetic catalog from a temporary data directory"""
+
+    def __init__(self, size, merchants):
+        self.size = size
+        self.data_dir = tempfile.mkdtemp(prefix='swipe-bench-')
+        self.cards = make_cards(size)
+        with open(os.path.join(self.data_dir, 'credit_cards.json'), 'w') as f:
+            json.dump(self.cards, f)
+        with open(os.path.join(self.data_dir, 'last_updated.txt'), 'w') as f:
+            f.write(datetime.now().isoformat())
+        shutil.copy(os.path.join(BACKEND_DIR, 'data', 'top_merchants.json'), self.data_dir)
+
+        self.recommender = CardRecommender(self.data_dir)
+        self.scraper = self.recommender.scraper
+        self.scraper.auto_refresh = False
+        self.recommender.warm_up()
+        self.merchants = make_merchants(merchants, self.recommender.top_merchants,
+                                        self.recommender.merchant_categories)
+
+    def close(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+# Each benchmark returns a call to time and the operations one call performs
+
+def bench_classify(ctx):
+    merchants = itertools.cycle(ctx.merchants)
+    for merchant in ctx.merchants:
+        ctx.recommender.determine_merchant_categories(merchant)
+    return lambda: ctx.recommender.determine_merchant_categories(next(merchants)), 1
+
+
+def bench_classify_uncached(ctx):
+    merchants = itertools.cycle(ctx.merchants)
+    cache = ctx.recommender.classification_cache
+
+    def call():
+        cache.clear()
+        ctx.recommender.determine_merchant_categories(next(merchants))
+    return call, 1
+
+
+def bench_recommend(ctx):
+    requests = itertools.cycle([(merchant, 10 + i % 200) for i, merchant in enumerate(ctx.merchants)])
+    # Rank every category set of the corpus once
+    category_sets = {tuple(ctx.recommender.determine_merchant_categories(merchant)["categories"])
+                     for merchant in ctx.merchants}
+    for categories in category_sets:
+        ctx.recommender._get_ranking(list(categories), None, None)
+    return lambda: ctx.recommender.get_recommendations(*next(requests)), 1
+
+
+def bench_recommend_uncached(ctx):
+    requests = itertools.cycle([(merchant, 10 + i % 200) for i, merchant in enumerate(ctx.merchants)])
+    cache = ctx.recommender.ranking_cache
+
+    def call():
+        cache.clear()
+        ctx.recommender.get_recommendations(*next(requests))
+    return call, 1
+
+
+def bench_recommend_preferences(ctx):
+    requests = itertools.cycle([(merchant, 10 + i % 200, PREFERENCES) for i, merchant in enumerate(ctx.merchants)])
+    # Rank every category set of the corpus once for these preferences
+    category_sets = {tuple(ctx.recommender.determine_merchant_categories(merchant)["categories"])
+                     for merchant in ctx.merchants}
+    for categories in category_sets:
+        ctx.recommender._get_ranking(list(categories), PREFERENCES, None)
+    return lambda: ctx.recommender.get_recommendations(*next(requests)), 1
+
+
+def bench_search(ctx):
+    queries = itertools.cycle(SEARCH_QUERIES)
+    index = ctx.scraper.get_snapshot().get_index("search", SearchIndex)
+    return lambda: index.search(next(queries), limit=20), 1
+
+
+def bench_search_filtered(ctx):
+    queries = itertools.cycle(SEARCH_QUERIES)
+    index = ctx.scraper.get_snapshot().get_index("search", SearchIndex)
+    return lambda: index.search(next(queries), limit=20, category="dining", min_rate=3), 1
+
+
+def bench_stream_cards(ctx):
+    # /api/cards?fields=...&format=ndjson over the whole catalog
+    cards = ctx.scraper.get_snapshot().cards
+
+    def call():
+        for _ in card_listing.iter_ndjson(cards, ("name", "issuer", "categories")):
+            pass
+    return call, len(cards)
+
+
+def bench_get_card_details(ctx):
+    # By generated ID and by differently cased name, spread over the catalog
+    cards = ctx.scraper.get_snapshot().cards
+    references = itertools.cycle([reference for card in cards[::max(1, len(cards) // 100)]
+                                  for reference in (card["id"], card["name"].upper())])
+    return lambda: ctx.recommender.get_card_details(next(references)), 1
+
+
+def bench_merge_cards(ctx):
+    # Every other stored card with a new offer, and as many new cards
+    updates = [dict(card, intro_offer=card["intro_offer"] + " (updated)") for card in ctx.cards[::2]]
+    incoming = updates + make_cards(len(ctx.cards) - len(updates), seed=1, first=len(ctx.cards))
+    return lambda: ctx.scraper._merge_cards(list(ctx.cards), incoming), len(incoming)
+
+
+def bench_parse_page(ctx):
+    # What a ParsePool worker runs for one listing page
+    page = nerdwallet_page(ctx.cards)
+    backend_name = ctx.scraper.html_backend.name
+    return lambda: parse_page(page, NERDWALLET_SPEC, backend_name), len(ctx.cards)
+
+
+# name: (benchmark, unit of one operation, scales with the catalog)
+BENCHMARKS = {
+    "classify": (bench_classify, "merchants", False),
+    "classify_uncached": (bench_classify_uncached, "merchants", False),
+    "recommend": (bench_recommend, "requests", True),
+    "recommend_uncached": (bench_recommend_uncached, "requests", True),
+    "recommend_preferences": (bench_recommend_preferences, "requests", True),
+    "search": (bench_search, "searches", True),
+    "search_filtered": (bench_search_filtered, "searches", True),
+    "stream_cards": (bench_stream_cards, "cards", True),
+    "get_card_details": (bench_get_card_details, "lookups", True),
+    "merge_cards": (bench_merge_cards, "cards", True),
+    "parse_page": (bench_parse_page, "listings", True),
+}
+
+
+def measure(call, ops_per_call, min_time):
+    """Time call until min_time has passed, then trace the memory of one more call"""
+    call()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        call()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ops_per_sec": calls * ops_per_call / elapsed,
+        "calls": calls,
+        "ops_per_call": ops_per_call,
+        "peak_kib": peak / 1024
+    }
+
+
+def run(sizes=DEFAULT_SIZES, merchants=DEFAULT_MERCHANTS, min_time=0.5, only=None):
+    results = []
+    names = [name for name in BENCHMARKS if not only or name in only]
+    for index, size in enumerate(sizes):
+        ctx = Context(size, merchants)
+        try:
+            for name in names:
+                benchmark, unit, scales = BENCHMARKS[name]
+                # Classification doesn't depend on the catalog, run it once
+                if not scales and index > 0:
+                    continue
+                call, ops_per_call = benchmark(ctx)
+                result = {"benchmark": name, "size": size if scales else merchants,
+                          "unit": unit}
+                result.update(measure(call, ops_per_call, min_time))
+                results.append(result)
+        finally:
+            ctx.close()
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Annotate results with their change from the baseline and list the regressions"""
+    previous = {(entry["benchmark"], entry["size"]): entry for entry in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get((result["benchmark"], result["size"]))
+        if base is None:
+            continue
+        label = f"{result['benchmark']} ({result['size']})"
+        result["speed_change"] = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{label}: {result['ops_per_sec']:.0f} ops/s, baseline {base['ops_per_sec']:.0f} "
+                               f"({result['speed_change']:+.0%})")
+        if result["peak_kib"] > base["peak_kib"] * (1 + threshold) + MEMORY_SLACK_KIB:
+            regressions.append(f"{label}: peak {result['peak_kib']:.0f} KiB, baseline {base['peak_kib']:.0f} KiB")
+    return regressions
+
+
+def report(results, sizes, merchants, min_time):
+    return {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": list(sizes),
+        "merchants": merchants,
+        "min_time": min_time,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="catalog sizes, comma separated")
+    parser.add_argument("--merchants", type=int, default=DEFAULT_MERCHANTS, help="merchant corpus size")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to time each benchmark for")
+    parser.add_argument("--only", help="benchmarks to run, comma separated: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.25")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    results = run(sizes, args.merchants, args.min_time, only)
+
+    regressions = []
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    print(f"{'benchmark':<24}{'size':>8}  {'unit':<10}{'ops/sec':>14}{'peak KiB':>12}{'vs baseline':>13}")
+    for row in results:
+        change = f"{row['speed_change']:+.0%}" if "speed_change" in row else "-"
+        print(f"{row['benchmark']:<24}{row['size']:>8}  {row['unit']:<10}{row['ops_per_sec']:>14.0f}"
+              f"{row['peak_kib']:>12.1f}{change:>13}")
+
+    data = report(results, sizes, args.merchants, args.min_time)
+    for path in filter(None, (args.output, args.baseline if args.update_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        print(f"Results written to {path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
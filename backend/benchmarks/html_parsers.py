@@ -0,0 +1,120 @@
+"""Parse time and memory per page of the HTML parser backends.
+
+Runs every available backend, plus the previous full-tree BeautifulSoup
+parse as a baseline, against the saved fixture pages. Pages can be grown
+with --repeat to approximate a real listing page with many cards.
+
+    python -m benchmarks.html_parsers [--repeat 50] [--rounds 20]
+
+Memory is measured in a fresh process per backend: the tracemalloc peak
+covers Python objects, the RSS growth also covers native trees (lxml,
+selectolax) that tracemalloc can't see.
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from card_scraper import NERDWALLET_SPEC  # noqa: E402
+from fixture_server import load_fixture  # noqa: E402
+from html_parsing import available_backends, extract_items, get_backend  # noqa: E402
+
+BASELINE = "soup-full"
+# Fixture page and the site spec that parses it
+PAGES = {
+    "nerdwallet.html": NERDWALLET_SPEC
+}
+
+
+def load_page(name, repeat):
+    """Load a fixture page, repeating its listing section to grow it"""
+    html = load_fixture(name).decode("utf-8")
+    if repeat > 1:
+        start = html.index("<main>")
+        end = html.index("</main>") + len("</main>")
+        html = html[:start] + html[start:end] * repeat + html[end:]
+    return html
+
+
+def baseline_extract(html, spec):
+    """The previous approach: a full html.parser tree of the whole page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = []
+    for container in soup.select(spec.container):
+        item = {}
+        for field, selector in spec.fields.items():
+            element = container.select_one(selector)
+            item[field] = element.text.strip() if element is not None else None
+        items.append(item)
+    return items
+
+
+def extractor(backend_name):
+    if backend_name == BASELINE:
+        return baseline_extract
+    return partial(extract_items, backend=get_backend(backend_name))
+
+
+def measure_memory(backend_name, html, spec, queue):
+    extract = extractor(backend_name)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    extract(html, spec)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    queue.put((peak, rss_growth))
+
+
+def run(repeat, rounds):
+    results = []
+    for page, spec in PAGES.items():
+        html = load_page(page, repeat)
+        for backend_name in [BASELINE] + available_backends():
+            extract = extractor(backend_name)
+            items = len(extract(html, spec))
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                extract(html, spec)
+            per_page = (time.perf_counter() - start) / rounds
+
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=measure_memory, args=(backend_name, html, spec, queue))
+            process.start()
+            peak, rss_growth = queue.get()
+            process.join()
+
+            results.append({
+                "page": page,
+                "bytes": len(html.encode("utf-8")),
+                "backend": backend_name,
+                "items": items,
+                "ms_per_page": per_page * 1000,
+                "python_peak_kib": peak / 1024,
+                "rss_growth_kib": rss_growth
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, help="times to repeat each page's listing section")
+    parser.add_argument("--rounds", type=int, default=20, help="timed parses per backend")
+    args = parser.parse_args()
+
+    print(f"{'page':<18}{'bytes':>10}  {'backend':<12}{'items':>7}{'ms/page':>10}{'py peak KiB':>13}{'RSS KiB':>10}")
+    for row in run(args.repeat, args.rounds):
+        print(f"{row['page']:<18}{row['bytes']:>10}  {row['backend']:<12}{row['items']:>7}"
+              f"{row['ms_per_page']:>10.2f}{row['python_peak_kib']:>13.0f}{row['rss_growth_kib']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""Load test the API on a local server with a request mix or replayed traffic.
+
+    python -m benchmarks.load [--rate 500] [--duration 30] [--concurrency 16]
+                              [--mix recommend=8,search=1,ping=1 | --replay api.log]
+                              [--server gunicorn --workers 2 | --url http://host:port]
+                              [--output results.json] [--max-p99-ms 50] [--max-error-rate 0.01]
+
+Unless --url is given, the API is started on a free local port (serve.py,
+or the Flask development server with --server dev) with a private copy of
+the data files. The card sources point at a FixtureServer serving the
+saved fixture pages, so nothing leaves the machine even if a refresh runs.
+
+Requests are sent by --concurrency clients spread over processes. With a
+--rate, each client sends on a fixed schedule and latency counts from the
+scheduled send time, so time spent queued behind a slow response is
+included; --rate 0 sends as fast as responses come back. --replay takes
+the /api/recommend requests recorded in a log file, both the JSON lines of
+the current log format and the "Received request" / "Request JSON" lines
+of the old text format, and sends them in recorded order.
+
+Throughput, latency percentiles and error rates are reported per endpoint.
+The exit status is 1 when --max-p99-ms or --max-error-rate is exceeded.
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_server import FixtureServer, load_fixture  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILES = ('credit_cards.json', 'top_merchants.json', 'rotating_categories.json')
+# Seconds to wait for the server to answer /ping
+STARTUP_TIMEOUT = 60
+REQUEST_TIMEOUT = 10
+PERCENTILES = (50, 90, 99)
+
+MERCHANTS = ("amazon.com", "walmart.com", "target.com", "Starbucks", "shell gas station", "netflix.com",
+             "Whole Foods", "uber.com", "https://www.bestbuy.com/checkout", "Joe's Pizza", "Delta Air Lines",
+             "CVS Pharmacy", "Marriott Downtown", "unknown-shop.example")
+# Share of purchases large enough to go over a rotating bonus spend cap
+LARGE_PURCHASE_SHARE = 0.1
+SEARCH_QUERIES = ("chase", "sapphire", "visa", "cash", "travel", "no such card")
+
+# The old text log: the request line, then its JSON as a Python literal
+_LEGACY_RECEIVED = re.compile(r"Received request: <Request '(?P<url>[^']*)' \[(?P<method>[A-Z]+)\]>")
+_LEGACY_JSON = re.compile(r"Request JSON: (?P<payload>.*)$")
+
+
+# Each generator returns (label, method, path, JSON body) for one request
+
+def purchase_amount(rng):
+    if rng.random() < LARGE_PURCHASE_SHARE:
+        return round(rng.uniform(1500, 10000), 2)
+    return round(rng.uniform(5, 500), 2)
+
+
+def recommend_request(rng):
+    body = {"merchant": rng.choice(MERCHANTS), "amount": purchase_amount(rng)}
+    return "POST /api/recommend", "POST", "/api/recommend", body
+
+
+def batch_request(rng):
+    items = [{"merchant": rng.choice(MERCHANTS), "amount": purchase_amount(rng)} for _ in range(20)]
+    return "POST /api/recommend/batch", "POST", "/api/recommend/batch", {"items": items, "limit": 3}
+
+
+def search_request(rng):
+    return "GET /api/search", "GET", f"/api/search?q={rng.choice(SEARCH_QUERIES)}", None
+
+
+def cards_request(rng):
+    return "GET /api/cards", "GET", "/api/cards", None
+
+
+def merchant_categories_request(rng):
+    return "GET /api/merchant-categories", "GET", "/api/merchant-categories", None
+
+
+def ping_request(rng):
+    return "GET /ping", "GET", "/ping", None
+
+
+MIX_REQUESTS = {
+    "recommend": recommend_request,
+    "batch": batch_request,
+    "search": search_request,
+    "cards": cards_request,
+    "merchant_categories": merchant_categories_request,
+    "ping": ping_request,
+}
+
+
+def parse_mix(spec):
+    """Parse "recommend=8,search=1" into {name: weight}"""
+    mix = {}
+    for entry in spec.split(','):
+        name, _, weight = entry.strip().partition('=')
+        if name not in MIX_REQUESTS:
+            raise ValueError(f"Unknown request type {name!r}, expected one of {', '.join(MIX_REQUESTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def mixed_requests(mix, count, seed=0):
+    """count requests drawn from the mix with the given weights"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    return [MIX_REQUESTS[name](rng) for name in rng.choices(names, weights, k=count)]
+
+
+def read_recorded_requests(path):
+    """Reconstruct the /api/recommend requests logged in a log file, in order"""
+    recorded = []
+    pending = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("message") == "Received request" and "payload" in entry:
+                    route = entry.get("route") or "/api/recommend"
+                    recorded.append((f"POST {route}", "POST", route, entry["payload"]))
+                continue
+
+            match = _LEGACY_RECEIVED.search(line)
+            if match:
+                pending = (match["method"], urlsplit(match["url"]).path)
+                continue
+            match = _LEGACY_JSON.search(line)
+            if match and pending is not None:
+                method, route = pending
+                pending = None
+                try:
+                    payload = ast.literal_eval(match["payload"])
+                except (ValueError, SyntaxError):
+                    continue
+                recorded.append((f"{method} {route}", method, route, payload))
+    return recorded
+
+
+def _client(base_url, plan, first_send, interval, stop_at, results):
+    """Send plan's requests in a loop, one every interval seconds (0: back to back)"""
+    session = requests.Session()
+    samples = []
+    next_send = first_send
+    index = 0
+    while True:
+        now = time.time()
+        if interval:
+            if next_send >= stop_at:
+                break
+            if next_send > now:
+                time.sleep(next_send - now)
+            start = next_send
+            next_send += interval
+        else:
+            if now >= stop_at:
+                break
+            start = now
+
+        label, method, path, body = plan[index % len(plan)]
+        index += 1
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=REQUEST_TIMEOUT)
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        samples.append((label, status, time.time() - start))
+    results.extend(samples)
+
+
+def _client_process(base_url, plans, first_sends, interval, stop_at, queue):
+    results = []
+    threads = [threading.Thread(target=_client, args=(base_url, plan, first_send, interval, stop_at, results))
+               for plan, first_send in zip(plans, first_sends)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def generate_load(base_url, plan, rate, duration, concurrency, processes=None):
+    """Send plan's requests for duration seconds; return (label, status, seconds) samples.
+
+    Client i sends plan[i], plan[i + concurrency], ... With a rate, sends
+    are staggered so the clients together send rate requests per second.
+    """
+    concurrency = max(1, concurrency)
+    processes = max(1, min(processes or os.cpu_count() or 1, concurrency))
+    interval = concurrency / rate if rate else 0
+    start_at = time.time() + 0.5
+    stop_at = start_at + duration
+
+    plans = [plan[i::concurrency] or plan for i in range(concurrency)]
+    first_sends = [start_at + i * (interval / concurrency) for i in range(concurrency)]
+    queue = multiprocessing.Queue()
+    workers = []
+    for p in range(processes):
+        args = (base_url, plans[p::processes], first_sends[p::processes], interval, stop_at, queue)
+        worker = multiprocessing.Process(target=_client_process, args=args)
+        worker.start()
+        workers.append(worker)
+    samples = []
+    for _ in workers:
+        samples.extend(queue.get())
+    for worker in workers:
+        worker.join()
+    return samples
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, duration):
+    """Throughput, latency percentiles and error rate per endpoint, plus an "all" row"""
+    groups = {}
+    for label, status, seconds in samples:
+        groups.setdefault(label, []).append((status, seconds))
+    groups["all"] = [(status, seconds) for _, status, seconds in samples]
+
+    summary = {}
+    for label, entries in groups.items():
+        latencies = sorted(seconds * 1000 for _, seconds in entries)
+        statuses = {}
+        for status, _ in entries:
+            key = str(status) if status else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        errors = sum(1 for status, _ in entries if not 200 <= status < 400)
+        summary[label] = {
+            "requests": len(entries),
+            "throughput": len(entries) / duration if duration else 0.0,
+            "error_rate": errors / len(entries) if entries else 0.0,
+            "statuses": statuses,
+            "latency_ms": dict({f"p{pct}": percentile(latencies, pct) for pct in PERCENTILES},
+                               max=latencies[-1] if latencies else None)
+        }
+    return summary
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """The API on a free local port, with private data files and local card sources"""
+
+    def __init__(self, kind="gunicorn", workers=2):
+        self.kind = kind
+        self.workers = workers
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.data_dir = None
+        self.sources = None
+        self.process = None
+
+    def start(self):
+        self.data_dir = tempfile.mkdtemp(prefix='swipe-load-')
+        for name in DATA_FILES:
+            shutil.copy(os.path.join(BACKEND_DIR, 'data', name), self.data_dir)
+        with open(os.path.join(self.data_dir, 'last_updated.txt'), 'w') as f:
+            f.write(datetime.now().isoformat())
+
+        self.sources = FixtureServer({
+            "/github.json": (200, {"Content-Type": "application/json"}, load_fixture("github_cards.json")),
+            "/nerdwallet.html": (200, {"Content-Type": "text/html; charset=utf-8"}, load_fixture("nerdwallet.html"))
+        }).start()
+        env = dict(os.environ,
+                   SWIPE_DATA_DIR=self.data_dir,
+                   SWIPE_LOG_FILE=os.path.join(self.data_dir, 'api.log'),
+                   SWIPE_REFRESH_INTERVAL='0',
+                   SWIPE_GITHUB_CARDS_URL=self.sources.url("/github.json"),
+                   SWIPE_NERDWALLET_URL=self.sources.url("/nerdwallet.html"))
+        if self.kind == "gunicorn":
+            command = [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'),
+                       '--bind', f'127.0.0.1:{self.port}', '--workers', str(self.workers)]
+        else:
+            command = [sys.executable, '-m', 'flask', '--app', 'app', 'run',
+                       '--host', '127.0.0.1', '--port', str(self.port), '--with-threads']
+        self.log = open(os.path.join(self.data_dir, 'server.log'), 'w')
+        self.process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=self.log,
+                                        stderr=subprocess.STDOUT)
+        self._wait_until_up()
+        return self
+
+    def _wait_until_up(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, "
+                                   f"see {os.path.join(self.data_dir, 'server.log')}")
+            try:
+                requests.get(self.url + '/ping', timeout=1).raise_for_status()
+                return
+            except requests.RequestException:
+                time.sleep(0.1)
+        raise RuntimeError("Server did not start")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.log.close()
+        if self.sources is not None:
+            self.sources.stop()
+        if self.data_dir is not None:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run(base_url, plan, rate, duration, concurrency, warmup=2.0, processes=None):
+    """Warm the server up, then load it and summarize the measured run"""
+    if warmup:
+        generate_load(base_url, plan, rate, warmup, concurrency, processes)
+    samples = generate_load(base_url, plan, rate, duration, concurrency, processes)
+    return summarize(samples, duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=500, help="requests per second in total, 0 for unpaced")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--processes", type=int, help="client processes, default one per CPU")
+    parser.add_argument("--mix", default="recommend=1",
+                        help="request types and weights, from: " + ", ".join(MIX_REQUESTS))
+    parser.add_argument("--replay", help="log file whose recorded requests are sent instead of the mix")
+    parser.add_argument("--server", choices=("gunicorn", "dev"), default="gunicorn", help="server to start")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--max-p99-ms", type=float, help="fail when the overall p99 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="fail when the overall error rate is higher")
+    args = parser.parse_args()
+
+    if args.replay:
+        plan = read_recorded_requests(args.replay)
+        if not plan:
+            parser.error(f"No recorded requests found in {args.replay}")
+    else:
+        plan = mixed_requests(parse_mix(args.mix), max(1000, int(args.rate * args.duration)))
+
+    server = None if args.url else LocalServer(args.server, args.workers).start()
+    try:
+        summary = run(args.url or server.url, plan, args.rate, args.duration, args.concurrency,
+                      args.warmup, args.processes)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"{'endpoint':<30}{'requests':>10}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}")
+    for label, row in sorted(summary.items(), key=lambda item: item[0] == "all"):
+        latency = {key: f"{value:.1f}" if value is not None else "-" for key, value in row["latency_ms"].items()}
+        print(f"{label:<30}{row['requests']:>10}{row['throughput']:>9.1f}{row['error_rate']:>8.1%}"
+              f"{latency['p50']:>9}{latency['p90']:>9}{latency['p99']:>9}{latency['max']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec='seconds'),
+                "target": args.url or args.server,
+                "rate": args.rate,
+                "duration": args.duration,
+                "concurrency": args.concurrency,
+                "requests": args.replay or args.mix,
+                "endpoints": summary
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    overall = summary["all"]
+    failures = []
+    if args.max_p99_ms is not None and (overall["latency_ms"]["p99"] or 0) > args.max_p99_ms:
+        failures.append(f"p99 {overall['latency_ms']['p99']:.1f} ms is above {args.max_p99_ms} ms")
+    if args.max_error_rate is not None and overall["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {overall['error_rate']:.2%} is above {args.max_error_rate:.2%}")
+    for failure in failures:
+        print("FAIL: " + failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
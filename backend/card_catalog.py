@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import pickle
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger('card-catalog')
+
+# Binary snapshot layout: magic, format version, then a pickled payload
+SNAPSHOT_MAGIC = b'SWIPECAT'
+SNAPSHOT_FORMAT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('>8sH')
+
+# The process umask, for the mode of new files; it can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class CatalogSnapshot:
+    """Immutable, versioned view of the card catalog.
+
+    Snapshots are never modified after they are published; a reload builds a
+    new snapshot and swaps the catalog's reference to it, so a request that
+    grabbed a snapshot keeps a consistent list for its whole lifetime.
+    """
+
+    def __init__(self, cards, version, checksum, source, index_builders=None, indexes=None):
+        self.cards = tuple(cards)
+        self.version = version
+        self.checksum = checksum
+        self.source = source
+        self.loaded_at = time.time()
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+
+        # Build derived indexes up front so the first request doesn't pay for
+        # them, reusing the ones restored from a binary snapshot
+        for name, builder in (index_builders or {}).items():
+            restored = (indexes or {}).get(name)
+            if restored is not None and restored[0] == index_key(builder):
+                self._indexes[name] = restored[1]
+            else:
+                self._build_index(name, builder)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def get_index(self, name, builder=None):
+        """Return a derived index, building it on first use if needed"""
+        index = self._indexes.get(name)
+        if index is None and builder is not None:
+            with self._index_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._build_index(name, builder)
+        return index
+
+    def _build_index(self, name, builder):
+        index = builder(self.cards)
+        self._indexes[name] = index
+        return index
+
+    def persistable_indexes(self, index_builders):
+        """Built indexes with the key of the builder that made them"""
+        return {
+            name: (index_key(builder), self._indexes[name])
+            for name, builder in index_builders.items()
+            if name in self._indexes
+        }
+
+
+def index_key(builder):
+    """Identify an index builder and the layout of what it builds.
+
+    Builders (usually classes) can declare a SNAPSHOT_VERSION that is bumped
+    whenever the structure of their index changes, so snapshots written by
+    older code are rebuilt instead of restored.
+    """
+    return (
+        getattr(builder, '__module__', None),
+        getattr(builder, '__qualname__', repr(builder)),
+        getattr(builder, 'SNAPSHOT_VERSION', 0)
+    )
+
+
+class CardCatalog:
+    """Process-wide, lazily reloaded card catalog backed by a binary snapshot.
+
+    The catalog is kept in memory as a CatalogSnapshot and persisted as a
+    pickled snapshot file holding the cards and their derived indexes, so a
+    start or reload restores everything without re-deriving it. Readers only
+    pay for an occasional os.stat(); the version only bumps when the content
+    changed. The JSON cards file is an export, written after every save, and
+    is imported again only when it was edited by hand since. Only save()
+    writes the snapshot: a process that imports the JSON, such as a worker
+    checking between another process's JSON and snapshot writes, just
+    publishes it.
+    """
+
+    def __init__(self, cards_file, fallback=None, check_interval=1.0, snapshot_file=None, prepare=None):
+        self.cards_file = cards_file
+        self.snapshot_file = snapshot_file or os.path.splitext(cards_file)[0] + '.snapshot'
+        self.fallback = fallback
+        # Applied to the cards of every snapshot; returns them unchanged when there is nothing to do
+        self.prepare = prepare
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        # Held by whoever is refreshing this catalog from its sources
+        self.refresh_lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._version = 0
+        self._last_check = 0.0
+        self._index_builders = {}
+
+    @property
+    def version(self):
+        return self._version
+
+    def register_index(self, name, builder):
+        """Register a derived index that is built alongside every snapshot"""
+        with self._lock:
+            self._index_builders[name] = builder
+
+    def get_snapshot(self):
+        """Return the current snapshot, reloading it if a file changed"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            return snapshot
+
+        signature = self._stat_signature()
+        self._last_check = now
+        if snapshot is not None and signature == self._signature:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._snapshot is None or signature != self._signature:
+                self._reload(signature)
+            return self._snapshot
+
+    def get_cards(self):
+        """Return the cards of the current snapshot"""
+        return self.get_snapshot().cards
+
+    def index(self, name):
+        """Return a registered derived index for the current snapshot"""
+        return self.get_snapshot().get_index(name, self._index_builders.get(name))
+
+    def reload(self):
+        """Force a re-read of the catalog files"""
+        with self._lock:
+            self._reload(self._stat_signature())
+            return self._snapshot
+
+    def save(self, cards):
+        """Persist cards as a new snapshot (and JSON export) and publish them"""
+        if self.prepare is not None:
+            cards = self.prepare(cards)
+        payload = self._export_payload(cards)
+        with self._lock:
+            _atomic_write(self.cards_file, payload)
+            self._publish(cards, self._checksum(payload), 'file', None)
+            self._write_snapshot(self._snapshot, self._file_signature(self.cards_file))
+            return self._snapshot
+
+    def _reload(self, signature):
+        snapshot_signature, json_signature = signature
+
+        if snapshot_signature is not None:
+            try:
+                payload = self._read_snapshot()
+                if json_signature is None or payload["json_signature"] == json_signature:
+                    self._publish_restored(payload, signature)
+                    return
+                logger.info("%s changed since the last snapshot, importing it", self.cards_file)
+            except Exception as e:
+                logger.error("Error loading catalog snapshot: %s", e)
+
+        if json_signature is None:
+            if self._snapshot is None:
+                logger.warning("Cards file not found: %s", self.cards_file)
+                self._publish(self._fallback_cards(), None, 'default', signature)
+            else:
+                self._signature = signature
+            return
+
+        self._import_json(signature)
+
+    def _publish_restored(self, payload, signature):
+        if self._snapshot is not None and payload["checksum"] == self._snapshot.checksum:
+            # Rewritten but not changed, keep the current version
+            self._signature = signature
+            return
+        self._publish(payload["cards"], payload["checksum"], 'file', signature, payload["indexes"])
+        logger.info("Restored %s cards from snapshot (catalog version %s)", len(payload['cards']), self._version)
+
+    def _import_json(self, signature):
+        try:
+            with open(self.cards_file, 'rb') as f:
+                payload = f.read()
+            checksum = self._checksum(payload)
+            if self._snapshot is None or checksum != self._snapshot.checksum:
+                cards = json.loads(payload)
+                self._publish(cards, checksum, 'file', signature)
+                logger.info("Loaded %s cards from file (catalog version %s)", len(cards), self._version)
+            # Otherwise touched but not changed, keep the current version
+        except Exception as e:
+            logger.error("Error loading cards from file: %s", e)
+            if self._snapshot is None:
+                self._publish(self._fallback_cards(), None, 'default', signature)
+            else:
+                # Keep serving the last good snapshot until the file is fixed
+                self._signature = signature
+
+    def _publish(self, cards, checksum, source, signature, indexes=None):
+        if checksum is None:
+            # Built-in cards have no file payload; hash them so every process agrees on the checksum
+            checksum = self._checksum(json.dumps(cards, sort_keys=True).encode('utf-8'))
+        if self.prepare is not None:
+            prepared = self.prepare(cards)
+            if prepared is not cards:
+                # Indexes restored with the cards refer to the unprepared ones
+                cards, indexes = prepared, None
+        self._version += 1
+        snapshot = CatalogSnapshot(cards, self._version, checksum, source, dict(self._index_builders), indexes)
+        # Single reference assignment, readers see either the old or the new snapshot
+        self._snapshot = snapshot
+        self._signature = signature
+
+    def _read_snapshot(self):
+        with open(self.snapshot_file, 'rb') as f:
+            data = f.read()
+        magic, format_version = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.snapshot_file} is not a catalog snapshot")
+        if format_version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot format {format_version}")
+        return pickle.loads(data[_SNAPSHOT_HEADER.size:])
+
+    def _write_snapshot(self, snapshot, json_signature):
+        """Write the snapshot file; failures only cost the next start a JSON import.
+
+        The file signature is refreshed afterwards so our own write doesn't
+        look like a change on the next check.
+        """
+        payload = {
+            "checksum": snapshot.checksum,
+            "cards": snapshot.cards,
+            "indexes": snapshot.persistable_indexes(self._index_builders),
+            # The export this snapshot matches, a different one was edited by hand
+            "json_signature": json_signature
+        }
+        try:
+            data = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION)
+            data += pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+            _atomic_write(self.snapshot_file, data)
+        except Exception as e:
+            logger.error("Error writing catalog snapshot: %s", e)
+        self._signature = self._stat_signature()
+
+    def _fallback_cards(self):
+        return self.fallback() if self.fallback else []
+
+    def _stat_signature(self):
+        return (self._file_signature(self.snapshot_file), self._file_signature(self.cards_file))
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _export_payload(cards):
+        return json.dumps(cards, indent=2).encode('utf-8')
+
+    @staticmethod
+    def _checksum(payload):
+        return hashlib.sha1(payload).hexdigest()
+
+
+def _atomic_write(path, data):
+    """Write a file via a temporary file and rename, so readers never see it half-written.
+
+    The file keeps the mode it had, or gets the umask default when new;
+    mkstemp alone would leave it readable by the owner only.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(cards_file, fallback=None, prepare=None):
+    """Return the shared catalog for a cards file, creating it on first use"""
+    key = os.path.abspath(cards_file)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                catalog = CardCatalog(key, fallback=fallback, prepare=prepare)
+                _catalogs[key] = catalog
+    return catalog
@@ -0,0 +1,257 @@
+import re
+
+# Issuer spellings (after normalization) mapped to one canonical issuer
+ISSUER_ALIASES = {
+    "american express": "amex",
+    "amex": "amex",
+    "chase": "chase",
+    "chase bank": "chase",
+    "jpmorgan chase": "chase",
+    "jp morgan chase": "chase",
+    "citi": "citi",
+    "citibank": "citi",
+    "capital one": "capital one",
+    "capitalone": "capital one",
+    "bank of america": "bank of america",
+    "bofa": "bank of america",
+    "wells fargo": "wells fargo",
+    "us bank": "us bank",
+    "u s bank": "us bank",
+    "usbank": "us bank",
+    "discover": "discover",
+    "barclays": "barclays",
+    "barclaycard": "barclays",
+    "goldman sachs": "goldman sachs",
+    "synchrony": "synchrony",
+    "synchrony bank": "synchrony"
+}
+UNKNOWN_ISSUERS = frozenset(["", "unknown", "unknown issuer"])
+
+# Trailing words that don't identify a card, longest first
+NAME_SUFFIXES = (
+    "world elite mastercard", "visa signature", "visa infinite",
+    "credit card", "mastercard", "visa", "card"
+)
+
+# Words shorter than this are never treated as typos
+MIN_TYPO_WORD_LENGTH = 5
+
+MATCH_CANONICAL = "canonical"
+MATCH_NEAR = "near"
+
+_TRADEMARKS = re.compile('[®™©℠]')
+_APOSTROPHES = re.compile("['’]")
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_NUMBERS = re.compile(r'\d+')
+
+# Every spelling of each canonical issuer, longest first, for stripping from names
+_ISSUER_SPELLINGS = {}
+for _alias, _issuer in ISSUER_ALIASES.items():
+    _ISSUER_SPELLINGS.setdefault(_issuer, [_issuer]).append(_alias)
+for _issuer, _spellings in _ISSUER_SPELLINGS.items():
+    _ISSUER_SPELLINGS[_issuer] = sorted(set(_spellings), key=len, reverse=True)
+
+
+def normalize_text(text):
+    """Lowercase text with trademark symbols and punctuation removed"""
+    text = _TRADEMARKS.sub('', (text or '').lower())
+    text = _APOSTROPHES.sub('', text.replace('&', ' and '))
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def canonical_issuer(issuer):
+    """Canonical issuer name ("AMERICAN_EXPRESS" -> "amex"), "" when unknown"""
+    normalized = normalize_text(issuer)
+    if normalized in UNKNOWN_ISSUERS:
+        return ""
+    return ISSUER_ALIASES.get(normalized, normalized)
+
+
+def canonical_name(name, issuer=""):
+    """Card name without issuer, network and "card" decorations.
+
+    "Blue Cash Preferred® Card from American Express" and "American Express
+    Blue Cash Preferred" both become "blue cash preferred".
+    """
+    normalized = normalize_text(name)
+    spellings = _ISSUER_SPELLINGS.get(issuer, [issuer] if issuer else [])
+    key = normalized
+
+    changed = True
+    while changed:
+        changed = False
+        for spelling in spellings:
+            if key.startswith(spelling + " "):
+                key, changed = key[len(spelling) + 1:], True
+            for tail in (f" from {spelling}", f" by {spelling}"):
+                if key.endswith(tail):
+                    key, changed = key[:-len(tail)], True
+        for suffix in NAME_SUFFIXES:
+            if key.endswith(" " + suffix):
+                key, changed = key[:-len(suffix) - 1], True
+
+    # A name that is nothing but decorations ("Apple Card" keeps "apple")
+    return key or normalized
+
+
+def canonical_key(card):
+    """(canonical issuer, canonical name) identifying a card across sources"""
+    issuer = canonical_issuer(card.get("issuer", ""))
+    return issuer, canonical_name(card.get("name", ""), issuer)
+
+
+class DuplicateIndex:
+    """Finds the known card an incoming card duplicates.
+
+    Canonical keys are dict lookups. Near duplicates are names with a one
+    letter typo in one word ("Sapphire Prefered"). Each name is blocked
+    under keys made of its other words plus the typo word with up to one
+    letter deleted; two words within one edit of each other always share
+    such a key. Matching N cards against M known ones therefore costs one
+    dict probe per key instead of comparing every pair, and extra words
+    ("Business", "Plus") or numbers always tell cards apart.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._keys_by_name = {}
+        self._blocks = {}
+
+    def add(self, card, position):
+        """Register a known card under its position"""
+        issuer, name = canonical_key(card)
+        self._keys.setdefault((issuer, name), position)
+        self._keys_by_name.setdefault(name, set()).add(position)
+        if issuer:
+            for block in self._blocks_of(issuer, name):
+                self._blocks.setdefault(block, position)
+
+    def find(self, card):
+        """Return (position, MATCH_CANONICAL or MATCH_NEAR) of the card's duplicate, or None"""
+        issuer, name = canonical_key(card)
+        position = self._keys.get((issuer, name))
+        if position is None and issuer:
+            # The known card may have been stored without an issuer
+            position = self._keys.get(("", name))
+        if position is not None:
+            return position, MATCH_CANONICAL
+
+        if not issuer:
+            # Without an issuer only an unambiguous name is a match
+            positions = self._keys_by_name.get(name, ())
+            if len(positions) == 1:
+                return next(iter(positions)), MATCH_CANONICAL
+            return None
+
+        matches = [self._blocks[block] for block in self._blocks_of(issuer, name) if block in self._blocks]
+        return (min(matches), MATCH_NEAR) if matches else None
+
+    @staticmethod
+    def _blocks_of(issuer, name):
+        """Block keys of a name, for each word long enough to hold a typo"""
+        words = name.split(" ")
+        for i, word in enumerate(words):
+            if len(word) < MIN_TYPO_WORD_LENGTH or _NUMBERS.search(word):
+                # Short words and numbers are distinct on their own ("Venture 1" vs "Venture 2")
+                continue
+            # One compact string per key; tuples of words cost several objects each
+            prefix = f"{issuer}\x1f{' '.join(words[:i])}\x1f"
+            suffix = f"\x1f{' '.join(words[i + 1:])}"
+            yield prefix + word + suffix
+            for j in range(len(word)):
+                yield prefix + word[:j] + word[j + 1:] + suffix
+
+
+def card_slug(card):
+    """Readable card ID from the canonical issuer and name ("amex-gold")"""
+    issuer, name = canonical_key(card)
+    return "-".join(part.replace(" ", "-") for part in (issuer, name) if part) or "card"
+
+
+def assign_card_ids(cards):
+    """Give every card without an "id" a unique one generated from its name.
+
+    Existing IDs are kept, so a card keeps its ID across refreshes even if
+    its name changes. Returns cards itself when every card already had an
+    ID, otherwise a new list in which only the cards given an ID are copies.
+    """
+    if all(card.get("id") for card in cards):
+        return cards
+    taken = {str(card["id"]) for card in cards if card.get("id")}
+    result = []
+    for card in cards:
+        if not card.get("id"):
+            card_id = base = card_slug(card)
+            suffix = 2
+            while card_id in taken:
+                card_id, suffix = f"{base}-{suffix}", suffix + 1
+            taken.add(card_id)
+            card = dict(card, id=card_id)
+        result.append(card)
+    return result
+
+
+class CardLookup:
+    """Resolves a card ID, name or alias to the card's catalog position.
+
+    Built once per catalog snapshot, so a lookup is a dict probe instead of
+    a scan. Besides its ID and name, a card is found by its canonical name
+    alone or after any spelling of its issuer ("Gold", "Amex Gold" and
+    "American Express Gold" for the "American Express Gold Card"), and by
+    the names in its "aliases" field. An alias several cards share resolves
+    to none of them.
+    """
+
+    # Bump when the index layout changes, so persisted catalog snapshots are rebuilt
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.ids = {}
+        self.names = {}
+        for position, card in enumerate(cards):
+            if card.get("id"):
+                self.ids.setdefault(str(card["id"]), position)
+            self.names.setdefault(normalize_text(card.get("name")), position)
+
+        aliases = {}
+        for position, card in enumerate(cards):
+            for alias in self._aliases(card):
+                aliases.setdefault(alias, set()).add(position)
+        for alias, positions in aliases.items():
+            if len(positions) == 1:
+                self.names.setdefault(alias, next(iter(positions)))
+
+    def __len__(self):
+        return len(self.cards)
+
+    @staticmethod
+    def _aliases(card):
+        issuer, name = canonical_key(card)
+        yield name
+        for spelling in _ISSUER_SPELLINGS.get(issuer, ()):
+            yield f"{spelling} {name}"
+        for alias in card.get("aliases") or ():
+            yield normalize_text(alias)
+
+    def find(self, reference):
+        """Catalog position of the card a reference names, or None"""
+        position = self.ids.get(reference)
+        if position is not None:
+            return position
+        key = normalize_text(reference)
+        position = self.names.get(key)
+        if position is None:
+            # Decorated names: "Amex Gold Card", "Gold Card from American Express"
+            for issuer in _ISSUER_SPELLINGS:
+                name = canonical_name(key, issuer)
+                if name != key:
+                    position = self.names.get(f"{issuer} {name}")
+                    if position is not None:
+                        break
+        return position
+
+    def get(self, reference):
+        """The card a reference names, or None"""
+        position = self.find(reference)
+        return self.cards[position] if position is not None else None
@@ -0,0 +1,86 @@
+"""Card listing for /api/cards: field projection, cursors and streamed encoding"""
+import re
+import json
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Cards encoded per yielded chunk of a streamed response
+STREAM_BATCH_SIZE = 100
+
+_FIELD = re.compile(r'^[A-Za-z0-9_]+$')
+_CURSOR = re.compile(r'^([0-9a-f]+)\.(\d+)$')
+# Catalog checksum characters in a cursor
+CURSOR_CHECKSUM_LENGTH = 16
+
+
+class StaleCursor(ValueError):
+    """The cursor was issued for another catalog content"""
+
+
+def parse_fields(value):
+    """Tuple of field names from a comma separated list, or None for all fields"""
+    fields = tuple(field.strip() for field in (value or '').split(',') if field.strip())
+    for field in fields:
+        if not _FIELD.match(field):
+            raise ValueError(f"Invalid field name: {field!r}")
+    return fields or None
+
+
+def project(card, fields):
+    """The card with only the given fields, if it has them"""
+    if fields is None:
+        return card
+    return {field: card[field] for field in fields if field in card}
+
+
+def encode_cursor(checksum, position):
+    """Cursor for a position in the catalog with this checksum.
+
+    The checksum, unlike the per-process catalog version, is the same in
+    every worker and across restarts.
+    """
+    return f"{checksum[:CURSOR_CHECKSUM_LENGTH]}.{position}"
+
+
+def decode_cursor(cursor, checksum):
+    """Position a cursor resumes from; raises StaleCursor once the catalog changed"""
+    match = _CURSOR.match(cursor)
+    if not match:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if match.group(1) != checksum[:CURSOR_CHECKSUM_LENGTH]:
+        raise StaleCursor(f"Cursor {cursor!r} is from another catalog content")
+    return int(match.group(2))
+
+
+def _encode(card, fields):
+    return json.dumps(project(card, fields), separators=(',', ':'))
+
+
+def iter_ndjson(cards, fields=None):
+    """Yield the cards as newline delimited JSON, a batch of lines at a time"""
+    batch = []
+    for card in cards:
+        batch.append(_encode(card, fields) + '\n')
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_json(cards, fields=None, **extra):
+    """Yield {"cards": [...], **extra} as JSON text, a batch of cards at a time"""
+    yield '{"cards":['
+    separator = ''
+    batch = []
+    for card in cards:
+        batch.append(separator + _encode(card, fields))
+        separator = ','
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield ''.join(batch)
+            batch = []
+    batch.append(']')
+    for key, value in extra.items():
+        batch.append(f',{json.dumps(key)}:{json.dumps(value)}')
+    batch.append('}')
+    yield ''.join(batch)
@@ -1,74 +1,93 @@
 import os
 import json
-import requests
-import logging
 import time
-from bs4 import BeautifulSoup
+import hashlib
+import logging
+import threading
 from datetime import datetime
+from urllib.parse import urljoin
+from card_catalog import get_catalog
+from http_fetcher import SourceFetcher
+from json_stream import iter_json_array
+from html_parsing import SiteSpec, extract_items, get_backend
+from card_identity import CardLookup, DuplicateIndex, assign_card_ids
+from card_search import SearchIndex
+from parse_pool import ParsePool, DEFAULT_PARSE_WORKERS, DEFAULT_PAGE_TIMEOUT
+from metrics import record_source_report
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('card-scraper')
 
+# Card data sources, overridable to run against local copies (benchmarks/load.py)
+GITHUB_CARDS_URL = os.environ.get(
+    'SWIPE_GITHUB_CARDS_URL',
+    "https://raw.githubusercontent.com/andenacitelli/credit-card-bonuses-api/main/exports/data.json")
+NERDWALLET_URL = os.environ.get('SWIPE_NERDWALLET_URL', "https://www.nerdwallet.com/best/credit-cards/")
+
+# Selectors of the comparison site listings
+NERDWALLET_SPEC = SiteSpec(
+    "nerdwallet",
+    container=".CreditCardCard_cardDetails__ZG8Pp",
+    fields={
+        "name": ".CreditCardCard_cardName__Z5U1B",
+        "issuer": ".CreditCardCard_cardIssuer__iV2wT",
+        "offer": ".CreditCardCard_cardReward__NJaQn",
+        "fee": ".CreditCardCard_cardFee__aJlqH"
+    },
+    next_page='a[rel="next"]'
+)
+
+# Fields that identify a stored card, duplicates from other sources don't overwrite them
+IDENTITY_FIELDS = ("id", "name", "issuer", "image")
+
+# Background refresh schedule and minimum delay between refresh attempts, in seconds
+DEFAULT_REFRESH_INTERVAL = 24 * 60 * 60
+REFRESH_RETRY_INTERVAL = 5 * 60
+
 class CardScraper:
-    def __init__(self):
-        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    def __init__(self, data_dir=None, stream_ingestion=True, html_parser=None,
+                 parse_workers=DEFAULT_PARSE_WORKERS, page_timeout=DEFAULT_PAGE_TIMEOUT):
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             
         self.cards_file = os.path.join(self.data_dir, 'credit_cards.json')
-        self.cache_file = os.path.join(self.data_dir, 'card_cache.json')
-        self.cache_expiry = 24 * 60 * 60  # 24 hours in seconds
+        self.last_updated_file = os.path.join(self.data_dir, 'last_updated.txt')
+        self.source_state_file = os.path.join(self.data_dir, 'source_state.json')
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36'
-    
-    def get_card_data(self, force_refresh=False):
-        """Get credit card data, either from cache or by fetching fresh data"""
-        # Check if we have a recent cache
-        if not force_refresh and os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    cache_data = json.load(f)
-                    
-                # Check cache expiry
-                current_time = time.time()
-                if current_time - cache_data.get('timestamp', 0) < self.cache_expiry:
-                    logger.info("Using cached card data")
-                    return cache_data.get('cards', [])
-            except Exception as e:
-                logger.error(f"Error reading cache: {str(e)}")
         
-        # Cache is expired or doesn't exist, load from source
-        cards = self._load_cards_from_file()
+        # Card sources, fetched concurrently on refresh. Sources with a
+        # stream_parser are ingested incrementally when streaming is enabled;
+        # HTML sources declare a SiteSpec and a transform from listings to
+        # cards, and are parsed in the parse pool. Comparison website
+        # parsers need to be customized to each site's structure.
+        self.sources = [
+            {"name": "github", "url": GITHUB_CARDS_URL, "parser": self._parse_github_cards,
+             "stream_parser": self._stream_github_cards},
+            {"name": "nerdwallet", "url": NERDWALLET_URL, "spec": NERDWALLET_SPEC,
+             "transform": self._cards_from_nerdwallet, "headers": {'User-Agent': self.user_agent}}
+        ]
+        self.stream_ingestion = stream_ingestion
+        self.html_backend = get_backend(html_parser)
+        self.parse_workers = parse_workers
+        self.page_timeout = page_timeout
+        # Kept across refreshes, so worker processes start once per scraper
+        self.parse_pool = ParsePool(parse_workers, page_timeout, self.html_backend.name)
+        self.fetcher = SourceFetcher()
+        self.last_fetch_report = {}
         
-        # Save to cache for future use
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump({
-                    'timestamp': time.time(),
-                    'cards': cards
-                }, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error writing cache: {str(e)}")
-            
-        return cards
-    
-    def _load_cards_from_file(self):
-        """Load card data from our JSON file"""
-        try:
-            if os.path.exists(self.cards_file):
-                with open(self.cards_file, 'r') as f:
-                    cards = json.load(f)
-                logger.info(f"Loaded {len(cards)} cards from file")
-                return cards
-            else:
-                logger.warning(f"Cards file not found: {self.cards_file}")
-                return self._get_default_cards()
-        except Exception as e:
-            logger.error(f"Error loading cards from file: {str(e)}")
-            return self._get_default_cards()
+        # Shared in-memory catalog, loaded once per process; every card gets a stable ID
+        self.catalog = get_catalog(self.cards_file, fallback=self._get_default_cards, prepare=assign_card_ids)
+        # Indexes for /api/search and for card lookups by ID, name or alias, built alongside every snapshot
+        self.catalog.register_index("search", SearchIndex)
+        self.catalog.register_index("lookup", CardLookup)
+        self._last_updated = None
+        self._last_updated_loaded = False
+        
+        # Background refresh state; auto_refresh lets reads of stale data start one
+        self.auto_refresh = True
+        self._last_refresh_attempt = 0
+        self._refresh_thread = None
+        self._scheduler = None
     
     def _get_default_cards(self):
         """Fallback with a small set of default cards if file loading fails"""
@@ -116,178 +135,428 @@ class CardScraper:
     
     def fetch_card_data(self):
         """Fetch credit card data from various sources and compile them"""
-        logger.info("Starting credit card data fetch...")
+        # Only one refresh per catalog at a time; later callers wait for it
+        with self.catalog.refresh_lock:
+            return self._fetch_card_data()
+    
+    def refresh_async(self):
+        """Start a background refresh unless one is already in flight.
         
-        cards = []
+        Returns True if a refresh was started, False if one was running.
+        """
+        if not self.catalog.refresh_lock.acquire(blocking=False):
+            return False
         
-        try:
-            # Get existing data if available
-            if os.path.exists(self.cards_file):
-                with open(self.cards_file, 'r') as f:
-                    cards = json.load(f)
-                logger.info(f"Loaded {len(cards)} existing cards from local storage")
-            
-            # Try to fetch cards from GitHub API (credit-card-bonuses-api)
+        def run():
             try:
-                github_cards = self._fetch_github_cards()
-                if github_cards:
-                    logger.info(f"Fetched {len(github_cards)} cards from GitHub API")
-                    self._merge_cards(cards, github_cards)
+                self._fetch_card_data()
             except Exception as e:
-                logger.error(f"Error fetching cards from GitHub: {str(e)}")
+                logger.error("Background refresh failed: %s", e, exc_info=True)
+            finally:
+                self.catalog.refresh_lock.release()
+        
+        self._last_refresh_attempt = time.monotonic()
+        thread = threading.Thread(target=run, name="card-refresh", daemon=True)
+        thread.start()
+        self._refresh_thread = thread
+        return True
+    
+    @property
+    def is_refreshing(self):
+        return self.catalog.refresh_lock.locked()
+    
+    def start_refresh_scheduler(self, interval=DEFAULT_REFRESH_INTERVAL):
+        """Refresh card data in the background every `interval` seconds"""
+        if self._scheduler is not None or not interval or interval <= 0:
+            return False
+        
+        stop = threading.Event()
+        
+        def loop():
+            while not stop.wait(interval):
+                self.refresh_async()
+        
+        thread = threading.Thread(target=loop, name="card-refresh-scheduler", daemon=True)
+        self._scheduler = (thread, stop)
+        thread.start()
+        logger.info("Card data refresh scheduled every %s seconds", interval)
+        return True
+    
+    def stop_refresh_scheduler(self):
+        """Stop the background refresh schedule"""
+        if self._scheduler is not None:
+            thread, stop = self._scheduler
+            stop.set()
+            thread.join()
+            self._scheduler = None
+    
+    def _fetch_card_data(self):
+        logger.info("Starting credit card data fetch...")
+        
+        try:
+            # Validators only make sense while the catalog file holds what they describe
+            source_state = self._load_source_state() if self.catalog.get_snapshot().source == 'file' else {}
+            
+            # Fetch all sources concurrently (conditionally when we have validators)
+            requests_to_send = []
+            for source in self.sources:
+                headers = dict(source.get("headers") or {})
+                state = source_state.get(source["name"], {})
+                # A first page that didn't change says nothing about the pages after it
+                if state.get("url") == source["url"] and not self._paginated(source):
+                    if state.get("etag"):
+                        headers["If-None-Match"] = state["etag"]
+                    if state.get("last_modified"):
+                        headers["If-Modified-Since"] = state["last_modified"]
+                stream = self.stream_ingestion and "stream_parser" in source
+                requests_to_send.append((source["name"], source["url"], headers, stream))
             
-            # Fetch top credit cards from credit card comparison websites
+            results = {}
             try:
-                web_cards = self._fetch_web_cards()
-                if web_cards:
-                    logger.info(f"Fetched {len(web_cards)} cards from web scraping")
-                    self._merge_cards(cards, web_cards)
-            except Exception as e:
-                logger.error(f"Error fetching cards from web: {str(e)}")
+                for result in self.fetcher.fetch_all(requests_to_send):
+                    results[result.name] = result
+                
+                cards, changed = self._ingest_results(results, source_state)
+            finally:
+                # Release connections of streamed bodies that were never read
+                for result in results.values():
+                    result.close()
             
-            # Save updated data
-            with open(self.cards_file, 'w') as f:
-                json.dump(cards, f, indent=2)
+            if changed:
+                # Save updated data and publish it to the shared catalog, which assigns new cards their IDs
+                cards = list(self.catalog.save(cards).cards)
+                logger.info("Successfully saved %s cards to local storage", len(cards))
+            else:
+                logger.info("No source changed, keeping catalog version %s", self.catalog.version)
             
-            # Update last updated time
-            with open(self.last_updated_file, 'w') as f:
-                f.write(datetime.now().isoformat())
-                
-            logger.info(f"Successfully saved {len(cards)} cards to local storage")
+            logger.info("Source fetch report: %s", json.dumps(self.last_fetch_report))
+            for name, report in self.last_fetch_report.items():
+                record_source_report(name, report)
+            self._save_source_state(source_state)
             
-            return cards
+            # Only a refresh that reached a source counts; otherwise the retry interval applies
+            if any(report["outcome"] != "fetch_failed" for report in self.last_fetch_report.values()):
+                self._set_last_updated(datetime.now())
+            else:
+                logger.warning("Every source failed, card data stays stale")
+            
+            return cards if changed else list(self.catalog.get_cards())
         
         except Exception as e:
-            logger.error(f"Error in fetch_card_data: {str(e)}")
-            # Return default data or cached data if available
-            if os.path.exists(self.cards_file):
-                with open(self.cards_file, 'r') as f:
-                    return json.load(f)
-            return []
-    
-    def _fetch_github_cards(self):
-        """Fetch credit card data from credit-card-bonuses-api GitHub repo"""
-        url = "https://raw.githubusercontent.com/andenacitelli/credit-card-bonuses-api/main/exports/data.json"
-        response = requests.get(url)
-        
-        if response.status_code == 200:
-            cards_data = response.json()
-            # Transform data to our format
-            cards = []
-            for card in cards_data:
-                # Map fields from GitHub data to our format
-                try:
-                    new_card = {
-                        "name": card.get("name", ""),
-                        "issuer": card.get("issuer", ""),
-                        "network": self._determine_network(card.get("name", "")),
-                        "annual_fee": self._extract_annual_fee(card.get("annualFee", "0")),
-                        "intro_offer": card.get("bonus", {}).get("text", ""),
-                        "bonus_value": self._extract_bonus_value(card.get("bonus", {}).get("text", "")),
-                        "categories": self._determine_categories(card),
-                        "point_value": self._determine_point_value(card.get("issuer", "")),
-                        "image": f"{card.get('issuer', '').lower().replace(' ', '_')}_{card.get('name', '').lower().replace(' ', '_')}.png",
-                        "url": card.get("link", ""),
-                        "external_id": card.get("id", "")
-                    }
-                    cards.append(new_card)
-                except Exception as e:
-                    logger.error(f"Error transforming card {card.get('name', 'unknown')}: {str(e)}")
-                    continue
-            
-            return cards
-        else:
-            logger.error(f"GitHub API request failed with status code {response.status_code}")
-            return []
+            logger.error("Error in fetch_card_data: %s", e)
+            # Return whatever the catalog currently holds
+            return list(self.catalog.get_cards())
     
-    def _fetch_web_cards(self):
-        """Scrape credit card data from popular websites"""
-        cards = []
+    def _ingest_results(self, results, source_state):
+        """Parse and merge fetched sources in declared order.
         
-        # Define websites to scrape (these would need to be customized based on site structure)
-        sites = [
-            {"url": "https://www.nerdwallet.com/best/credit-cards/", "parser": self._parse_nerdwallet}
-            # Add more sites as needed
-        ]
+        Returns the merged card list (None if no source had new content) and
+        whether the merge changed any card. Streamed sources are merged card
+        by card as they arrive, so the raw feed is never held in memory.
+        HTML pages are all handed to the parse pool up front and merged
+        page by page as they finish.
+        """
+        self.last_fetch_report = {}
+        cards = None
+        changed = False
         
-        for site in sites:
+        pool = self.parse_pool
+        # Decide what to ingest first so every site's first page parses in parallel
+        first_pages = {}
+        skipped = set()
+        for source in self.sources:
+            result = results[source["name"]]
+            if result.status == 304 or not result.ok:
+                skipped.add(source["name"])
+            elif self._unchanged(source, result, source_state):
+                skipped.add(source["name"])
+            elif "spec" in source:
+                first_pages[source["name"]] = pool.submit(result.text, source["spec"])
+        
+        for source in self.sources:
+            result = results[source["name"]]
+            report = result.report()
+            report["changed"] = False
+            report["outcome"] = "unchanged"
+            self.last_fetch_report[source["name"]] = report
+            state = source_state.get(source["name"], {})
+            
+            if result.status == 304:
+                report["outcome"] = "not_modified"
+                logger.info("%s not modified since last refresh", source['name'])
+                continue
+            if not result.ok:
+                report["outcome"] = "fetch_failed"
+                logger.error("Request to %s failed: %s", result.url, result.error or f"status code {result.status}")
+                continue
+            if source["name"] in skipped:
+                # Same payload without validator support, skip parsing and merging
+                logger.info("%s content unchanged since last refresh", source['name'])
+                source_state[source["name"]] = self._source_state_entry(source, result, result.sha256)
+                continue
+            
+            if cards is None:
+                cards = self._load_existing_cards()
+            
+            merge_stats = self._merge_stats()
             try:
-                headers = {'User-Agent': self.user_agent}
-                response = requests.get(site["url"], headers=headers)
-                if response.status_code == 200:
-                    site_cards = site["parser"](response.text)
-                    if site_cards:
-                        cards.extend(site_cards)
+                parse_start = time.perf_counter()
+                if "spec" in source:
+                    content_hash = self._merge_pages(source, result, first_pages[source["name"]],
+                                                     pool, cards, merge_stats, report)
                 else:
-                    logger.error(f"Request to {site['url']} failed with status code {response.status_code}")
+                    if result.streaming:
+                        source_cards = source["stream_parser"](result.iter_content())
+                    else:
+                        source_cards = source["parser"](result.text)
+                    self._merge_cards(cards, source_cards, merge_stats)
+                    content_hash = result.sha256
+                report["parse_seconds"] = round(time.perf_counter() - parse_start, 4)
+                report["changed"] = not (state.get("url") == source["url"] and state.get("sha256") == content_hash)
+                report["outcome"] = "changed" if report["changed"] else "unchanged"
+                logger.info("Fetched %s cards from %s: %s added, %s updated, %s merged",
+                            merge_stats['received'], source['name'], merge_stats['added'],
+                            merge_stats['updated'], merge_stats['merged'])
+                source_state[source["name"]] = self._source_state_entry(source, result, content_hash)
             except Exception as e:
-                logger.error(f"Error scraping {site['url']}: {str(e)}")
+                # Cards merged before a streamed or paginated source failed are
+                # kept; its state isn't updated, so the next refresh reads it in full again
+                report["error"] = str(e)
+                report["outcome"] = "parse_failed"
+                logger.error("Error processing cards from %s: %s", source['name'], e)
+            
+            if result.bytes_read:
+                # Streamed body, only counted once read
+                report["bytes"] = result.bytes_read
+            report["cards"] = merge_stats["received"]
+            report["added"] = merge_stats["added"]
+            report["updated"] = merge_stats["updated"]
+            report["merged"] = merge_stats["merged"]
+            changed = changed or merge_stats["changed"] > 0
+
+        return cards, changed
+    
+    def _merge_pages(self, source, result, page, pool, cards, merge_stats, report):
+        """Merge an HTML source page by page, following its next page links.
         
-        return cards
+        Returns the hash over all pages' content.
+        """
+        spec = source["spec"]
+        digest = hashlib.sha256(result.body)
+        report["pages"] = 1
+        report["bytes"] = len(result.body)
+        page_url = result.url
+        
+        while True:
+            listings, next_href = page.result()
+            self._merge_cards(cards, source["transform"](listings), merge_stats)
+            if not next_href or report["pages"] >= spec.max_pages:
+                return digest.hexdigest()
+            
+            page_url = urljoin(page_url, next_href)
+            page_result = self.fetcher.fetch(source["name"], page_url, source.get("headers"))
+            if not page_result.ok:
+                raise IOError(f"Fetching page {report['pages'] + 1} from {page_url} failed: "
+                              f"{page_result.error or f'status code {page_result.status}'}")
+            digest.update(page_result.body)
+            report["pages"] += 1
+            report["bytes"] += len(page_result.body)
+            page = pool.submit(page_result.text, spec)
+    
+    @staticmethod
+    def _paginated(source):
+        return "spec" in source and source["spec"].next_page is not None
+    
+    def _unchanged(self, source, result, source_state):
+        """Whether a buffered, single-page response matches the last ingested content"""
+        if result.streaming or self._paginated(source):
+            # Hash only known after reading, or covers every page
+            return False
+        state = source_state.get(source["name"], {})
+        return state.get("url") == source["url"] and state.get("sha256") == result.sha256
+    
+    def _load_existing_cards(self):
+        """Current catalog cards as a list to merge into.
+        
+        Card dicts are shared with the published snapshot; _merge_cards
+        copies a card before its first update.
+        """
+        snapshot = self.catalog.get_snapshot()
+        if snapshot.source == 'default':
+            # Built-in fallback cards aren't stored data
+            return []
+        logger.info("Loaded %s existing cards from the catalog", len(snapshot.cards))
+        return list(snapshot.cards)
+    
+    @staticmethod
+    def _source_state_entry(source, result, content_hash):
+        return {
+            "url": source["url"],
+            "etag": result.headers.get("ETag"),
+            "last_modified": result.headers.get("Last-Modified"),
+            "sha256": content_hash
+        }
+    
+    def _load_source_state(self):
+        """Load per-source validators (ETag, Last-Modified) and content hashes"""
+        try:
+            with open(self.source_state_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error("Error loading source state: %s", e)
+            return {}
+    
+    def _save_source_state(self, source_state):
+        """Persist per-source validators atomically"""
+        tmp_file = self.source_state_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(source_state, f, indent=2)
+        os.replace(tmp_file, self.source_state_file)
+    
+    def _parse_github_cards(self, content):
+        """Parse the credit-card-bonuses-api export into our card format"""
+        return list(self._transform_github_cards(json.loads(content)))
+    
+    def _stream_github_cards(self, chunks):
+        """Lazily parse the credit-card-bonuses-api export from response chunks"""
+        return self._transform_github_cards(iter_json_array(chunks))
+    
+    def _transform_github_cards(self, cards_data):
+        """Transform GitHub export records to our format, one card at a time"""
+        for card in cards_data:
+            # Map fields from GitHub data to our format
+            try:
+                yield {
+                    "name": card.get("name", ""),
+                    "issuer": card.get("issuer", ""),
+                    "network": self._determine_network(card.get("name", "")),
+                    "annual_fee": self._extract_annual_fee(card.get("annualFee", "0")),
+                    "intro_offer": card.get("bonus", {}).get("text", ""),
+                    "bonus_value": self._extract_bonus_value(card.get("bonus", {}).get("text", "")),
+                    "categories": self._determine_categories(card),
+                    "point_value": self._determine_point_value(card.get("issuer", "")),
+                    "image": f"{card.get('issuer', '').lower().replace(' ', '_')}_{card.get('name', '').lower().replace(' ', '_')}.png",
+                    "url": card.get("link", ""),
+                    "external_id": card.get("id", "")
+                }
+            except Exception as e:
+                logger.error("Error transforming card %s: %s", card.get('name', 'unknown'), e)
+                continue
     
     def _parse_nerdwallet(self, html_content):
         """Parse NerdWallet credit card listings (simplified example)"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        try:
+            return self._cards_from_nerdwallet(extract_items(html_content, NERDWALLET_SPEC, self.html_backend))
+        except Exception as e:
+            logger.error("Error in NerdWallet parser: %s", e)
+            return []
+    
+    def _cards_from_nerdwallet(self, listings):
+        """Build cards from NerdWallet listing fields"""
         cards = []
         
         # This is a simplified example and would need to be adjusted based on actual website structure
-        try:
-            card_elements = soup.select(".CreditCardCard_cardDetails__ZG8Pp")
-            
-            for card_elem in card_elements:
-                try:
-                    name_elem = card_elem.select_one(".CreditCardCard_cardName__Z5U1B")
-                    name = name_elem.text.strip() if name_elem else "Unknown Card"
-                    
-                    issuer_elem = card_elem.select_one(".CreditCardCard_cardIssuer__iV2wT")
-                    issuer = issuer_elem.text.strip() if issuer_elem else "Unknown Issuer"
-                    
-                    offer_elem = card_elem.select_one(".CreditCardCard_cardReward__NJaQn")
-                    intro_offer = offer_elem.text.strip() if offer_elem else ""
-                    
-                    fee_elem = card_elem.select_one(".CreditCardCard_cardFee__aJlqH")
-                    fee_text = fee_elem.text.strip() if fee_elem else "$0"
-                    annual_fee = self._extract_annual_fee(fee_text)
-                    
-                    # Create card object
-                    card = {
-                        "name": name,
-                        "issuer": issuer,
-                        "network": self._determine_network(name),
-                        "annual_fee": annual_fee,
-                        "intro_offer": intro_offer,
-                        "bonus_value": self._extract_bonus_value(intro_offer),
-                        "categories": self._determine_categories_from_text(intro_offer),
-                        "point_value": self._determine_point_value(issuer),
-                        "image": f"{issuer.lower().replace(' ', '_')}_{name.lower().replace(' ', '_')}.png"
-                    }
-                    
-                    cards.append(card)
-                except Exception as e:
-                    logger.error(f"Error parsing card element: {str(e)}")
-                    continue
-        except Exception as e:
-            logger.error(f"Error in NerdWallet parser: {str(e)}")
+        for listing in listings:
+            try:
+                name = listing["name"] or "Unknown Card"
+                issuer = listing["issuer"] or "Unknown Issuer"
+                intro_offer = listing["offer"] or ""
+                annual_fee = self._extract_annual_fee(listing["fee"] or "$0")
+                
+                # Create card object
+                card = {
+                    "name": name,
+                    "issuer": issuer,
+                    "network": self._determine_network(name),
+                    "annual_fee": annual_fee,
+                    "intro_offer": intro_offer,
+                    "bonus_value": self._extract_bonus_value(intro_offer),
+                    "categories": self._determine_categories_from_text(intro_offer),
+                    "point_value": self._determine_point_value(issuer),
+                    "image": f"{issuer.lower().replace(' ', '_')}_{name.lower().replace(' ', '_')}.png"
+                }
+                
+                cards.append(card)
+            except Exception as e:
+                logger.error("Error parsing card element: %s", e)
+                continue
         
         return cards
     
-    def _merge_cards(self, existing_cards, new_cards):
-        """Merge new cards with existing ones, updating if needed"""
-        existing_card_names = {card["name"].lower(): i for i, card in enumerate(existing_cards)}
+    def _merge_cards(self, existing_cards, new_cards, stats=None):
+        """Merge new cards with existing ones, updating if needed.
         
-        for new_card in new_cards:
-            # Check if card exists by name
-            name_key = new_card["name"].lower()
-            if name_key in existing_card_names:
-                # Update existing card
-                idx = existing_card_names[name_key]
-                for key, value in new_card.items():
-                    if value and value != existing_cards[idx].get(key, ""):
-                        existing_cards[idx][key] = value
+        Cards are matched on their canonical issuer and name (see
+        card_identity), so the same card from different sources is stored
+        once; duplicates already in existing_cards are folded as well.
+        new_cards may be any iterable, including a lazy generator. Counts are
+        accumulated into stats as the merge goes, so they stay accurate if
+        the iterable fails part way:
+        
+        - received: incoming cards
+        - added: cards new to the catalog
+        - updated: existing cards that got new field values
+        - merged: duplicates folded into a card stored under another name
+        - changed: added and updated cards plus folded existing duplicates
+        """
+        if stats is None:
+            stats = self._merge_stats()
+        duplicates = DuplicateIndex()
+        # Existing cards may belong to a published snapshot, copy them before updating
+        copied = set()
+        
+        def update(cards, idx, card, fill_only=False):
+            updated = False
+            for key, value in card.items():
+                if key in IDENTITY_FIELDS and cards[idx].get(key):
+                    continue
+                current = cards[idx].get(key, "")
+                if value and value != current and not (fill_only and current):
+                    if idx not in copied:
+                        cards[idx] = dict(cards[idx])
+                        copied.add(idx)
+                    cards[idx][key] = value
+                    updated = True
+            return updated
+        
+        # Fold duplicates already stored, keeping the first of each
+        unique = []
+        for card in existing_cards:
+            match = duplicates.find(card)
+            if match is None:
+                duplicates.add(card, len(unique))
+                unique.append(card)
             else:
+                update(unique, match[0], card, fill_only=True)
+                stats["merged"] += 1
+                stats["changed"] += 1
+        existing_cards[:] = unique
+        
+        for new_card in new_cards:
+            stats["received"] += 1
+            match = duplicates.find(new_card)
+            if match is None:
                 # Add new card
+                duplicates.add(new_card, len(existing_cards))
                 existing_cards.append(new_card)
-                existing_card_names[name_key] = len(existing_cards) - 1
+                stats["added"] += 1
+                stats["changed"] += 1
+                continue
+            
+            idx = match[0]
+            if new_card.get("name", "").lower() != existing_cards[idx].get("name", "").lower():
+                stats["merged"] += 1
+            if update(existing_cards, idx, new_card):
+                stats["updated"] += 1
+                stats["changed"] += 1
+        
+        return stats
+    
+    @staticmethod
+    def _merge_stats():
+        return {"received": 0, "added": 0, "updated": 0, "merged": 0, "changed": 0}
     
     def _determine_network(self, card_name):
         """Determine the card network based on name"""
@@ -418,27 +687,48 @@ class CardScraper:
     
     def is_data_stale(self, max_age_days=1):
         """Check if the card data needs to be refreshed"""
-        if not os.path.exists(self.last_updated_file):
-            return True
-            
-        try:
-            with open(self.last_updated_file, 'r') as f:
-                last_updated_str = f.read().strip()
-                last_updated = datetime.fromisoformat(last_updated_str)
-                age = datetime.now() - last_updated
-                return age.days >= max_age_days
-        except Exception:
+        last_updated = self._get_last_updated()
+        if last_updated is None:
             return True
+        age = datetime.now() - last_updated
+        return age.days >= max_age_days
+    
+    def _get_last_updated(self):
+        """Return the last refresh time, reading last_updated.txt only once"""
+        if not self._last_updated_loaded:
+            try:
+                with open(self.last_updated_file, 'r') as f:
+                    self._last_updated = datetime.fromisoformat(f.read().strip())
+            except Exception:
+                self._last_updated = None
+            self._last_updated_loaded = True
+        return self._last_updated
+    
+    def _set_last_updated(self, timestamp):
+        """Record a successful refresh in memory and on disk"""
+        with open(self.last_updated_file, 'w') as f:
+            f.write(timestamp.isoformat())
+        self._last_updated = timestamp
+        self._last_updated_loaded = True
+    
+    def get_snapshot(self, force_refresh=False):
+        """Get the current catalog snapshot, refreshing the data if needed.
+        
+        Stale data is served immediately while a single background refresh
+        runs; only force_refresh blocks until fresh data is fetched.
+        """
+        if force_refresh:
+            self.fetch_card_data()
+        elif self.auto_refresh and self.is_data_stale() and not self.is_refreshing:
+            # Don't retry a failing refresh on every request
+            since_attempt = time.monotonic() - self._last_refresh_attempt
+            if self._last_refresh_attempt == 0 or since_attempt >= REFRESH_RETRY_INTERVAL:
+                self.refresh_async()
+        return self.catalog.get_snapshot()
     
     def get_card_data(self, force_refresh=False):
         """Get card data, refreshing if needed"""
-        if force_refresh or self.is_data_stale():
-            return self.fetch_card_data()
-        elif os.path.exists(self.cards_file):
-            with open(self.cards_file, 'r') as f:
-                return json.load(f)
-        else:
-            return self.fetch_card_data()
+        return list(self.get_snapshot(force_refresh).cards)
 
 # Test the scraper if run directly
 if __name__ == "__main__":
@@ -0,0 +1,295 @@
+"""Card search for /api/search"""
+import re
+import heapq
+import numbers
+import unicodedata
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+# Card fields that are searched, with the weight of a match in each
+SEARCH_FIELDS = {"name": 4, "issuer": 3, "network": 2, "categories": 2, "benefits": 1}
+
+# Score factors for a query word that is a whole card word, starts one, or occurs inside one
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.75
+INFIX_MATCH = 0.5
+
+# Query words up to this long are answered from precomputed prefix postings
+SHORT_PREFIX_LENGTH = 2
+# Query words shorter than this are only matched at the start of card words
+NGRAM_LENGTH = 3
+# Postings at least this long are also stored in ranked order
+RANKED_POSTING_LENGTH = 64
+# Filter combinations whose allowed cards are kept per index
+ALLOWED_CACHE_SIZE = 64
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase words of a text, accents and punctuation removed"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return _WORD.findall(text.lower())
+
+
+def _ngrams(word):
+    return {word[i:i + NGRAM_LENGTH] for i in range(len(word) - NGRAM_LENGTH + 1)}
+
+
+def _number(value):
+    return value if isinstance(value, numbers.Real) and not isinstance(value, bool) else None
+
+
+def _field_text(card, field):
+    value = card.get(field)
+    if field == "categories":
+        # Reward category names ("online_shopping"), not the catch-all rate
+        return " ".join(category.replace("_", " ") for category in (value or {}) if category != "other")
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value) if value else ""
+
+
+def _ranked(scores):
+    """Positions ordered by descending score, then catalog order"""
+    return sorted(scores, key=lambda position: (-scores[position], position))
+
+
+def _levels(scores):
+    """{position: score} as [(score, positions)], best score first"""
+    by_score = {}
+    for position, score in scores.items():
+        by_score.setdefault(score, set()).add(position)
+    return sorted(by_score.items(), key=lambda level: -level[0])
+
+
+class SearchIndex:
+    """Inverted word and n-gram index over the card catalog.
+
+    Built once per catalog snapshot. The posting of every word of the
+    searched fields groups the cards containing it by field weight. A query
+    word matches card words equal to it, starting with it (found by
+    bisecting the sorted vocabulary, so the last, partly typed word of a
+    query autocompletes) or, from NGRAM_LENGTH letters on, containing it
+    (candidate words come from the n-gram postings). A card must match
+    every query word and scores the sum of its best match per word.
+
+    Queries stay cheap as the catalog grows: matches are intersected and
+    summed as sets of cards per score rather than card by card, one and two
+    letter prefixes are merged up front, long postings are also kept in
+    ranked order so a one-word query only walks its page, and filters are
+    sorted lists cut with bisect.
+    """
+
+    # Bump when the index layout changes, so persisted catalog snapshots are rebuilt
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, cards):
+        self.cards = cards
+        scores_by_word = {}
+        category_rates = {}
+        best_rates = []
+        self.issuers = {}
+        self.networks = {}
+        annual_fees = []
+
+        for position, card in enumerate(cards):
+            for field, weight in SEARCH_FIELDS.items():
+                for word in tokenize(_field_text(card, field)):
+                    scores = scores_by_word.setdefault(word, {})
+                    if weight > scores.get(position, 0):
+                        scores[position] = weight
+
+            rates = [(category, _number(rate)) for category, rate in (card.get("categories") or {}).items()]
+            rates = [(category, rate) for category, rate in rates if rate is not None]
+            for category, rate in rates:
+                category_rates.setdefault(category, {})[position] = rate
+            best_rates.append(max((rate for _, rate in rates), default=0))
+            self.issuers.setdefault(str(card.get("issuer") or "").lower(), []).append(position)
+            self.networks.setdefault(str(card.get("network") or "").lower(), []).append(position)
+            annual_fees.append(_number(card.get("annual_fee")) or 0)
+
+        self.vocabulary = sorted(scores_by_word)
+        self.postings = {word: _levels(scores) for word, scores in scores_by_word.items()}
+        self.ngrams = {}
+        for word in self.vocabulary:
+            for ngram in _ngrams(word):
+                self.ngrams.setdefault(ngram, []).append(word)
+
+        # Short prefixes match much of the catalog; merge their postings up front
+        scores_by_prefix = {}
+        for word in self.vocabulary:
+            for length in range(1, min(len(word), SHORT_PREFIX_LENGTH) + 1):
+                factor = EXACT_MATCH if length == len(word) else PREFIX_MATCH
+                scores = scores_by_prefix.setdefault(word[:length], {})
+                for position, weight in scores_by_word[word].items():
+                    if weight * factor > scores.get(position, 0):
+                        scores[position] = weight * factor
+        self.short_prefixes = {prefix: _levels(scores) for prefix, scores in scores_by_prefix.items()}
+
+        self.ranked_postings = {word: _ranked(scores) for word, scores in scores_by_word.items()
+                                if len(scores) >= RANKED_POSTING_LENGTH}
+        self.ranked_prefixes = {prefix: _ranked(scores) for prefix, scores in scores_by_prefix.items()
+                                if len(scores) >= RANKED_POSTING_LENGTH}
+
+        # Filters: positions by descending rate or ascending fee, with the bisectable keys
+        self.category_rates = category_rates
+        self.category_order = {}
+        for category, rates in category_rates.items():
+            order = _ranked(rates)
+            self.category_order[category] = (order, [-rates[position] for position in order])
+        order = _ranked(dict(enumerate(best_rates)))
+        self.best_rate_order = (order, [-best_rates[position] for position in order])
+        order = sorted(range(len(annual_fees)), key=lambda position: (annual_fees[position], position))
+        self.fee_order = (order, [annual_fees[position] for position in order])
+        self._allowed_cache = {}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __getstate__(self):
+        # Filter results are rebuilt on demand, not persisted with the catalog snapshot
+        state = self.__dict__.copy()
+        state["_allowed_cache"] = {}
+        return state
+
+    def _word_levels(self, word):
+        """Cards matching one query word as [(score, positions)], and their ranking if precomputed"""
+        if len(word) <= SHORT_PREFIX_LENGTH:
+            return self.short_prefixes.get(word, []), self.ranked_prefixes.get(word)
+
+        matches = []
+        # Card words equal to or starting with the query word sort right after it
+        i = bisect_left(self.vocabulary, word)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            candidate = self.vocabulary[i]
+            matches.append((candidate, EXACT_MATCH if candidate == word else PREFIX_MATCH))
+            i += 1
+
+        # Card words containing it elsewhere share all of its n-grams
+        ngram_words = sorted((self.ngrams.get(ngram, ()) for ngram in _ngrams(word)), key=len)
+        if ngram_words and ngram_words[0]:
+            for candidate in set(ngram_words[0]).intersection(*ngram_words[1:]):
+                if word in candidate and not candidate.startswith(word):
+                    matches.append((candidate, INFIX_MATCH))
+
+        if len(matches) == 1:
+            candidate, factor = matches[0]
+            levels = [(weight * factor, positions) for weight, positions in self.postings[candidate]]
+            return levels, self.ranked_postings.get(candidate)
+
+        # A card matching several card words scores its best match
+        by_score = {}
+        for candidate, factor in matches:
+            for weight, positions in self.postings[candidate]:
+                by_score.setdefault(weight * factor, []).append(positions)
+        levels = []
+        seen = set()
+        for score in sorted(by_score, reverse=True):
+            positions = set().union(*by_score[score]) - seen
+            if positions:
+                levels.append((score, positions))
+                seen |= positions
+        return levels, None
+
+    def allowed_positions(self, category=None, min_rate=None, issuer=None, network=None, max_annual_fee=None):
+        """Set of card positions passing the filters, or None without filters.
+
+        min_rate applies to the category's rate when a category is given,
+        otherwise to the card's best rate in any category. The returned set
+        is shared and must not be modified.
+        """
+        key = (category, min_rate, (issuer or "").lower(), (network or "").lower(), max_annual_fee)
+        allowed = self._allowed_cache.get(key)
+        if allowed is not None:
+            return allowed
+
+        sets = []
+        if category is not None:
+            order, neg_rates = self.category_order.get(category, ((), ()))
+            end = bisect_right(neg_rates, -min_rate) if min_rate is not None else len(order)
+            sets.append(order[:end])
+        elif min_rate is not None:
+            order, neg_rates = self.best_rate_order
+            sets.append(order[:bisect_right(neg_rates, -min_rate)])
+        if issuer:
+            sets.append(self.issuers.get(issuer.lower(), ()))
+        if network:
+            sets.append(self.networks.get(network.lower(), ()))
+        if max_annual_fee is not None:
+            order, fees = self.fee_order
+            sets.append(order[:bisect_right(fees, max_annual_fee)])
+        if not sets:
+            return None
+
+        sets.sort(key=len)
+        allowed = set(sets[0]).intersection(*sets[1:])
+        if len(self._allowed_cache) >= ALLOWED_CACHE_SIZE:
+            self._allowed_cache.clear()
+        self._allowed_cache[key] = allowed
+        return allowed
+
+    def search(self, query, limit=None, offset=0, **filters):
+        """Return (total matches, [(position, score), ...]) for a page of results.
+
+        Results are ranked by score, then catalog order. Without query
+        words, every card passing the filters matches, ranked by its rate in
+        the filtered category (catalog order without one).
+        """
+        words = tokenize(query or "")
+        allowed = self.allowed_positions(**filters)
+        end = offset + limit if limit is not None else None
+
+        if not words:
+            category = filters.get("category")
+            if category is not None:
+                rates = self.category_rates.get(category, {})
+                ranking = [position for position in self.category_order.get(category, ((), ()))[0]
+                           if position in allowed]
+                return len(ranking), [(position, rates[position]) for position in ranking[offset:end]]
+            ranking = sorted(allowed) if allowed is not None else range(len(self.cards))
+            return len(ranking), [(position, 0) for position in ranking[offset:end]]
+
+        word_levels = [self._word_levels(word) for word in words]
+        if len(words) == 1 and word_levels[0][1] is not None:
+            # Walk the precomputed ranking until the page is full
+            levels, ranking = word_levels[0]
+            if allowed is None:
+                count = sum(len(positions) for _, positions in levels)
+                page = ranking[offset:end]
+            else:
+                count = sum(len(positions & allowed) for _, positions in levels)
+                page = list(islice((position for position in ranking if position in allowed), offset, end))
+            return count, [(position, next(score for score, positions in levels if position in positions))
+                           for position in page]
+
+        # Cards matching every word so far, grouped by their total score; most selective words first
+        totals = {0: allowed} if allowed is not None else None
+        word_levels.sort(key=lambda entry: sum(len(positions) for _, positions in entry[0]))
+        for levels, _ in word_levels:
+            if totals is None:
+                totals = dict(levels)
+                continue
+            combined = {}
+            for total, matched in totals.items():
+                for score, positions in levels:
+                    both = matched & positions
+                    if both:
+                        if total + score in combined:
+                            combined[total + score] |= both
+                        else:
+                            combined[total + score] = both
+            totals = combined
+            if not totals:
+                break
+
+        count = sum(len(positions) for positions in totals.values())
+        page = []
+        for total in sorted(totals, reverse=True):
+            if end is not None and len(page) >= end:
+                break
+            positions = totals[total]
+            needed = len(positions) if end is None else min(len(positions), end - len(page))
+            chosen = sorted(positions) if needed == len(positions) else heapq.nsmallest(needed, positions)
+            page.extend((position, total) for position in chosen)
+        return count, page[offset:]
@@ -0,0 +1,17 @@
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A private copy of the bundled data files with a fresh refresh stamp"""
+    for name in ('credit_cards.json', 'top_merchants.json', 'rotating_categories.json'):
+        shutil.copy(os.path.join(DATA_DIR, name), tmp_path / name)
+    with open(tmp_path / 'last_updated.txt', 'w') as f:
+        f.write(datetime.now().isoformat())
+    return str(tmp_path)
@@ -0,0 +1,148 @@
+import re
+from urllib.parse import urlsplit
+
+# Public suffixes with more than one label. Single-label TLDs (com, org,
+# io, ...) don't need listing: the last label is always treated as one.
+MULTI_LABEL_PUBLIC_SUFFIXES = frozenset([
+    "co.uk", "org.uk", "me.uk", "ltd.uk", "plc.uk", "ac.uk", "gov.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.nz", "net.nz", "org.nz",
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp",
+    "co.kr", "or.kr",
+    "co.in", "net.in", "org.in", "firm.in",
+    "co.za", "org.za",
+    "co.il", "org.il",
+    "com.br", "net.br", "org.br",
+    "com.mx", "org.mx",
+    "com.ar", "com.co", "com.pe", "com.ve",
+    "com.cn", "net.cn", "org.cn",
+    "com.hk", "org.hk",
+    "com.sg", "org.sg",
+    "com.tw", "org.tw",
+    "com.tr", "com.my", "com.ph", "com.vn", "co.th", "co.id",
+    "com.sa", "com.eg", "com.ng", "co.ke",
+    "com.pl", "co.at", "or.at", "com.es", "com.pt", "com.gr", "com.ua"
+])
+
+# A hostname somewhere in a merchant string, e.g. "Checkout - Amazon.co.uk"
+_HOST_PATTERN = re.compile(
+    r'(?<![\w.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63})\.?(?::\d+)?(?![\w-])'
+)
+
+
+def extract_host(merchant_string):
+    """Extract the lowercase hostname from a URL, bare domain or free text, or None"""
+    text = merchant_string.strip().lower()
+    if "." not in text:
+        return None
+
+    if "://" in text:
+        try:
+            host = urlsplit(text).hostname
+        except ValueError:
+            host = None
+        if host:
+            return host.rstrip(".")
+
+    match = _HOST_PATTERN.search(text)
+    return match.group(1) if match else None
+
+
+def public_suffix(host):
+    """Return the public suffix of a hostname (e.g. "co.uk" or "com")"""
+    labels = host.split(".")
+    if len(labels) >= 2 and ".".join(labels[-2:]) in MULTI_LABEL_PUBLIC_SUFFIXES:
+        return ".".join(labels[-2:])
+    return labels[-1]
+
+
+def registrable_domain(host):
+    """Return the registrable domain of a hostname (e.g. "amazon.co.uk"), or None"""
+    suffix = public_suffix(host)
+    if host == suffix:
+        return None
+    rest = host[:-len(suffix) - 1]
+    return rest.rsplit(".", 1)[-1] + "." + suffix
+
+
+class MerchantDomainIndex:
+    """Longest-suffix lookup of hosts against known merchant domains.
+
+    Conceptually a trie over reversed host labels (com -> walmart ->
+    grocery). Because a lookup only ever follows one path, the trie is
+    flattened into a single dict keyed by the domain strings themselves,
+    and a lookup probes the host's label suffixes from most to least
+    specific: at most one probe per label, and one dict entry per known
+    domain instead of one node object per label.
+
+    Hosts that match no entry fall back to the brand label of their
+    registrable domain, so "amazon.co.uk" resolves to the "amazon.com"
+    entry when "amazon" identifies a single known merchant.
+    """
+
+    MATCH_EXACT = "exact"
+    MATCH_SUFFIX = "suffix"
+    MATCH_BRAND = "brand"
+
+    def __init__(self, merchants=None):
+        self._domains = {}
+        self._brands = {}
+        self._ambiguous_brands = set()
+
+        for domain, info in (merchants or {}).items():
+            self.add(domain, info)
+
+    def __len__(self):
+        return len(self._domains)
+
+    def __contains__(self, domain):
+        return domain in self._domains
+
+    def add(self, domain, info):
+        """Register a merchant domain with its info"""
+        domain = domain.strip().lower().rstrip(".")
+        if domain.startswith("www."):
+            domain = domain[4:]
+        registrable = registrable_domain(domain)
+        if registrable is None:
+            # Public suffixes can't identify a merchant
+            return
+
+        self._domains[domain] = info
+
+        # Brand fallback only for registrable domains, not subdomains like grocery.walmart.com
+        if registrable == domain:
+            brand = domain.split(".", 1)[0]
+            existing = self._brands.get(brand)
+            if existing is not None and existing[0] != domain:
+                self._ambiguous_brands.add(brand)
+            elif brand not in self._ambiguous_brands:
+                self._brands[brand] = (domain, info)
+
+    def lookup(self, host):
+        """Resolve a host to (domain, info, match type), or None"""
+        if not host:
+            return None
+        host = host.lower().rstrip(".")
+
+        info = self._domains.get(host)
+        if info is not None:
+            return host, info, self.MATCH_EXACT
+
+        # Walk label suffixes, most specific first
+        start = host.find(".")
+        while start != -1:
+            suffix = host[start + 1:]
+            info = self._domains.get(suffix)
+            if info is not None:
+                return suffix, info, self.MATCH_SUFFIX
+            start = host.find(".", start + 1)
+
+        registrable = registrable_domain(host)
+        if registrable is not None:
+            brand = registrable.split(".", 1)[0]
+            if brand not in self._ambiguous_brands and brand in self._brands:
+                domain, info = self._brands[brand]
+                return domain, info, self.MATCH_BRAND
+
+        return None
@@ -0,0 +1,85 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    """Read a fixture file as bytes"""
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+class FixtureServer:
+    """Local stand-in HTTP server for card sources, used by tests and load runs.
+
+    Routes map a path to either a (status, headers, body) tuple or a callable
+    taking the request handler and returning one. Every request is recorded
+    in `requests` as (path, headers).
+    """
+
+    def __init__(self, routes=None, host='127.0.0.1', port=0):
+        self.routes = dict(routes or {})
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def hits(self, path):
+        with self._lock:
+            return sum(1 for request_path, _ in self.requests if request_path == path)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                with server._lock:
+                    server.requests.append((path, dict(self.headers)))
+
+                route = server.routes.get(path)
+                if route is None:
+                    status, headers, body = 404, {}, b"not found"
+                elif callable(route):
+                    status, headers, body = route(self)
+                else:
+                    status, headers, body = route
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,157 @@
+import os
+import re
+import logging
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import lxml  # noqa: F401 -- only needed as a BeautifulSoup tree builder
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+logger = logging.getLogger('html-parsing')
+
+# Backends in order of preference
+BACKEND_SELECTOLAX = "selectolax"
+BACKEND_LXML = "lxml"
+BACKEND_HTML_PARSER = "html.parser"
+
+# Listing pages followed per source unless a spec says otherwise
+DEFAULT_MAX_PAGES = 10
+
+# Parts of a compound selector BeautifulSoup can turn into a SoupStrainer
+_COMBINATORS = re.compile(r'[\s>+~,]')
+_ATTRIBUTE_SELECTORS = re.compile(r'\[[^\]]*\]')
+_TAG = re.compile(r'^[a-zA-Z][\w-]*')
+_CLASS = re.compile(r'\.([\w-]+)')
+
+
+class SiteSpec:
+    """Selectors a site parser needs: one container per listing and a selector per field.
+
+    Only container subtrees are relevant, so backends that build a full tree
+    query containers alone, and BeautifulSoup backends don't build the rest
+    of the page at all when the container selector is a simple tag/class.
+    """
+
+    def __init__(self, name, container, fields, next_page=None, max_pages=DEFAULT_MAX_PAGES):
+        self.name = name
+        self.container = container
+        self.fields = dict(fields)
+        # Link to the next listing page, followed up to max_pages pages
+        self.next_page = next_page
+        self.max_pages = max_pages
+        self.strainer = self._build_strainer(container)
+        self.next_page_strainer = self._build_strainer(next_page) if next_page else None
+
+    @staticmethod
+    def _build_strainer(selector):
+        """Strain on the tag and first class of a compound selector, or None.
+
+        The full selector is still applied to the strained tree; selectors
+        with combinators need their ancestors and get no strainer.
+        """
+        selector = selector.strip()
+        if _COMBINATORS.search(selector):
+            return None
+        selector = _ATTRIBUTE_SELECTORS.sub('', selector)
+        tag = _TAG.match(selector)
+        css_class = _CLASS.search(selector)
+        if not tag and not css_class:
+            return None
+        kwargs = {"class_": css_class.group(1)} if css_class else {}
+        return SoupStrainer(tag.group(0) if tag else None, **kwargs)
+
+
+class SoupBackend:
+    """BeautifulSoup backend that only builds the container subtrees"""
+
+    def __init__(self, builder=BACKEND_HTML_PARSER):
+        self.name = builder
+        self.builder = builder
+
+    def extract_page(self, html, spec):
+        soup = BeautifulSoup(html, self.builder, parse_only=spec.strainer)
+        items = []
+        for container in soup.select(spec.container):
+            item = {}
+            for field, selector in spec.fields.items():
+                element = container.select_one(selector)
+                item[field] = element.get_text().strip() if element is not None else None
+            items.append(item)
+
+        next_href = None
+        if spec.next_page:
+            if spec.strainer is not None:
+                # The listing tree doesn't contain the pagination links
+                soup = BeautifulSoup(html, self.builder, parse_only=spec.next_page_strainer)
+            link = soup.select_one(spec.next_page)
+            next_href = link.get("href") if link is not None else None
+        return items, next_href
+
+
+class SelectolaxBackend:
+    """selectolax backend (Lexbor engine), a C HTML5 parser with native CSS matching"""
+
+    name = BACKEND_SELECTOLAX
+
+    def extract_page(self, html, spec):
+        tree = SelectolaxParser(html)
+        items = []
+        for container in tree.css(spec.container):
+            item = {}
+            for field, selector in spec.fields.items():
+                element = container.css_first(selector)
+                item[field] = element.text().strip() if element is not None else None
+            items.append(item)
+
+        next_href = None
+        if spec.next_page:
+            link = tree.css_first(spec.next_page)
+            next_href = link.attributes.get("href") if link is not None else None
+        return items, next_href
+
+
+def available_backends():
+    """Names of the backends usable in this environment, fastest first"""
+    backends = []
+    if SelectolaxParser is not None:
+        backends.append(BACKEND_SELECTOLAX)
+    if HAVE_LXML:
+        backends.append(BACKEND_LXML)
+    backends.append(BACKEND_HTML_PARSER)
+    return backends
+
+
+def get_backend(name=None):
+    """Return an HTML backend by name, or the fastest available one.
+
+    The name defaults to the SWIPE_HTML_PARSER environment variable. An
+    unavailable backend falls back to the fastest available one.
+    """
+    name = name or os.environ.get('SWIPE_HTML_PARSER')
+    available = available_backends()
+    if name and name not in available:
+        logger.warning("HTML parser backend %s is not available, using %s", name, available[0])
+        name = None
+    name = name or available[0]
+
+    if name == BACKEND_SELECTOLAX:
+        return SelectolaxBackend()
+    return SoupBackend(name)
+
+
+def extract_items(html, spec, backend=None):
+    """Extract one {field: text or None} dict per container in the page"""
+    return (backend or get_backend()).extract_page(html, spec)[0]
+
+
+def parse_page(html, spec, backend_name=None):
+    """Extract a page's items and next page link; picklable entry point for worker processes"""
+    return get_backend(backend_name).extract_page(html, spec)
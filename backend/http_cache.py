@@ -0,0 +1,163 @@
+"""Conditional (ETag) and compressed responses for data that changes once per reload"""
+import gzip
+import hashlib
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from lru_cache import LRUCache
+
+# Clients and proxies may store the responses but must revalidate them
+CACHE_CONTROL = 'public, no-cache'
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+# Bodies are compressed on the request that first asks for them, in every
+# worker and for every version and projection, so favour speed over the last
+# few percent of ratio: brotli 11 takes seconds on a large catalog
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Total bytes of the bodies a ResponseCache keeps, compressed codings included
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+# ETag suffix per content coding: each encoded body is its own representation
+ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+
+def content_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def choose_encoding(accept_encodings, size):
+    """Best content coding the client accepts for a body of this size"""
+    if size < MIN_COMPRESS_SIZE:
+        return 'identity'
+    best, best_quality = 'identity', 0
+    # Brotli first, so it wins ties
+    for encoding in (('br',) if brotli is not None else ()) + ('gzip',):
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def variant_etag(etag, encoding):
+    """ETag of a body sent with a content coding"""
+    return etag + ETAG_SUFFIXES[encoding]
+
+
+def set_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def not_modified(etag):
+    return set_cache_headers(Response(status=304), etag)
+
+
+class CachedBody:
+    """A serialized response body with its ETag, compressed per content coding on first use.
+
+    Concurrent requests for a coding that isn't compressed yet wait for the
+    first one instead of compressing the same body again.
+    """
+
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag or content_etag(body)
+        self._encoded = {'identity': body}
+        self._encode_lock = threading.Lock()
+
+    @property
+    def size(self):
+        """Bytes held for every coding encoded so far"""
+        return sum(len(data) for data in list(self._encoded.values()))
+
+    def encoded(self, encoding):
+        """Body in a content coding; the second value is True if this call compressed it"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._encode_lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = self._compress(encoding)
+                    self._encoded[encoding] = data
+                    return data, True
+        return data, False
+
+    def _compress(self, encoding):
+        if encoding == 'br':
+            return brotli.compress(self.body, quality=BROTLI_QUALITY)
+        return gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+
+
+class ResponseCache:
+    """Serialized, pre-compressed response bodies, keyed by name and data version.
+
+    A request repeating the ETag it already has gets a 304 without the body
+    being serialized or sent again. The ETag is the body's content hash
+    unless the caller derives one from the data version, which also skips
+    the cache lookup for unchanged data. Compressed bodies get the ETag with
+    a suffix per content coding ("<etag>-gz"), since they are different
+    bytes. The cache holds at most maxsize bodies and max_bytes in total.
+    Concurrent misses for a key build its body once; the others wait for
+    it, while misses for other keys build in parallel.
+    """
+
+    def __init__(self, maxsize=16, max_bytes=MAX_CACHED_BYTES):
+        self.cache = LRUCache(maxsize, max_weight=max_bytes, weigh=lambda entry: entry.size)
+        self._build_locks = {}
+        self._locks_lock = threading.Lock()
+
+    def respond(self, key, version, build, mimetype='application/json', etag=None):
+        """Response for the current request; build() returns the body as str or bytes"""
+        if etag is not None:
+            for variant in (variant_etag(etag, encoding) for encoding in ETAG_SUFFIXES):
+                if request.if_none_match.contains_weak(variant):
+                    return self._not_modified(variant)
+
+        cache_key = (key, version)
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            entry = self._build(cache_key, build, etag)
+        encoding = choose_encoding(request.accept_encodings, len(entry.body))
+        etag = variant_etag(entry.etag, encoding)
+        if request.if_none_match.contains_weak(etag):
+            return self._not_modified(etag)
+
+        body, compressed = entry.encoded(encoding)
+        if compressed:
+            # Re-weigh the entry with its new coding
+            self.cache.put(cache_key, entry)
+        response = Response(body, mimetype=mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return set_cache_headers(response, etag)
+
+    def _build(self, cache_key, build, etag):
+        with self._locks_lock:
+            lock = self._build_locks.setdefault(cache_key, threading.Lock())
+        try:
+            with lock:
+                entry = self.cache.get(cache_key)
+                if entry is None:
+                    body = build()
+                    entry = CachedBody(body.encode('utf-8') if isinstance(body, str) else body, etag)
+                    self.cache.put(cache_key, entry)
+                return entry
+        finally:
+            with self._locks_lock:
+                if self._build_locks.get(cache_key) is lock:
+                    del self._build_locks[cache_key]
+
+    @staticmethod
+    def _not_modified(etag):
+        response = not_modified(etag)
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,180 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger('http-fetcher')
+
+# Defaults for fetching card sources
+DEFAULT_TIMEOUT = (3.05, 20)  # (connect, read) seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_MAX_WORKERS = 8
+STREAM_CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class FetchResult:
+    """Outcome of fetching one source"""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.status = None
+        self.headers = {}
+        self.body = b""
+        self.encoding = None
+        self.error = None
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.bytes_read = 0
+        self._sha256 = None
+        self._response = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.status == 200
+
+    @property
+    def streaming(self):
+        """True when the body is left on the connection for iter_content()"""
+        return self._response is not None
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    @property
+    def sha256(self):
+        """Hex digest of the body; for streamed bodies only once fully read"""
+        if self._sha256 is None and not self.streaming:
+            self._sha256 = hashlib.sha256(self.body).hexdigest()
+        return self._sha256
+
+    def iter_content(self, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield a streamed body in chunks, hashing it as it goes"""
+        response = self._response
+        if response is None:
+            raise RuntimeError(f"Body of {self.name} is not streamed or was already consumed")
+        digest = hashlib.sha256()
+        start = time.perf_counter()
+        try:
+            for chunk in response.iter_content(chunk_size):
+                digest.update(chunk)
+                self.bytes_read += len(chunk)
+                yield chunk
+            self._sha256 = digest.hexdigest()
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.close()
+
+    def close(self):
+        """Release the connection of a streamed body that wasn't fully read"""
+        response, self._response = self._response, None
+        if response is not None:
+            response.close()
+
+    def report(self):
+        """Timing and outcome summary for logs and metrics"""
+        return {
+            "url": self.url,
+            "status": self.status,
+            "bytes": self.bytes_read or len(self.body),
+            "attempts": self.attempts,
+            "fetch_seconds": round(self.elapsed, 4),
+            "error": self.error
+        }
+
+
+class SourceFetcher:
+    """Fetches many sources concurrently over pooled keep-alive connections.
+
+    One requests.Session is shared by all worker threads; its adapter keeps
+    up to `per_host_limit` connections per host alive between refreshes and
+    retries connection errors and 429/5xx responses with exponential backoff.
+    A per-host semaphore caps the number of in-flight requests to one host.
+    """
+
+    def __init__(self, user_agent=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff_factor=DEFAULT_BACKOFF, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        self.timeout = timeout
+        self.retries = retries
+        self.per_host_limit = per_host_limit
+        self.max_workers = max_workers
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=per_host_limit, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host_limit))
+        self._host_slots_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._host_slots_lock:
+            return self._host_slots[host]
+
+    def fetch(self, name, url, headers=None, stream=False):
+        """Fetch a single source; errors are recorded on the result, not raised.
+
+        With stream=True a 200 body is left unread for result.iter_content();
+        the per-host slot only covers the request and response headers then.
+        """
+        result = FetchResult(name, url)
+        start = time.perf_counter()
+        try:
+            with self._host_slot(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            result.status = response.status_code
+            # Case-insensitive, servers differ on ETag vs Etag
+            result.headers = response.headers
+            result.encoding = response.encoding
+            if stream and response.status_code == 200:
+                result._response = response
+            else:
+                result.body = response.content
+            retries = getattr(response.raw, "retries", None)
+            result.attempts = len(retries.history) + 1 if retries is not None else 1
+        except requests.RequestException as e:
+            result.error = str(e)
+            # Retriable errors only surface once every retry was used
+            result.attempts = 1 + self.retries
+            logger.warning("Fetching %s from %s failed: %s", name, url, result.error)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def fetch_all(self, sources):
+        """Fetch (name, url, headers[, stream]) sources concurrently.
+
+        Yields results as they complete, so a slow source doesn't hold up
+        processing of the others.
+        """
+        if not sources:
+            return
+        workers = min(self.max_workers, len(sources))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="card-fetch") as pool:
+            futures = [pool.submit(self.fetch, *source) for source in sources]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        self.session.close()
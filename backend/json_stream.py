@@ -0,0 +1,83 @@
+import re
+import json
+import codecs
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TERMINATORS = frozenset(' \t\n\r,]')
+
+# Parser states
+_EXPECT_ARRAY = 0
+_EXPECT_FIRST_VALUE = 1
+_EXPECT_VALUE = 2
+_EXPECT_SEPARATOR = 3
+_DONE = 4
+
+
+def iter_json_array(chunks, decoder=None):
+    """Yield the elements of a top-level JSON array from an iterable of byte chunks.
+
+    Only the current, not yet complete element is buffered, so memory stays
+    proportional to the largest element rather than to the whole document.
+    Elements are decoded with json.JSONDecoder.raw_decode as soon as they
+    are complete. Raises ValueError if the document is not a JSON array.
+    """
+    decoder = decoder or json.JSONDecoder()
+    # utf-8-sig also drops a leading byte order mark
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    state = _EXPECT_ARRAY
+
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+            buffer += text_decoder.decode(b'', final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+
+            if state == _EXPECT_ARRAY:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Expected a JSON array, found {buffer[pos]!r}")
+                pos += 1
+                state = _EXPECT_FIRST_VALUE
+            elif state == _EXPECT_SEPARATOR:
+                if buffer[pos] == ',':
+                    state = _EXPECT_VALUE
+                elif buffer[pos] == ']':
+                    state = _DONE
+                else:
+                    raise ValueError(f"Expected ',' or ']' at offset {pos}, found {buffer[pos]!r}")
+                pos += 1
+            elif state == _DONE:
+                raise ValueError(f"Unexpected data after the JSON array: {buffer[pos]!r}")
+            elif state == _EXPECT_FIRST_VALUE and buffer[pos] == ']':
+                pos += 1
+                state = _DONE
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    # Element is split across chunks, wait for more data
+                    break
+                if not final and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                        and (end == len(buffer) or buffer[end] not in _NUMBER_TERMINATORS):
+                    # A number may continue in the next chunk ("12" + "34", "-5" + ".0")
+                    break
+                yield value
+                pos = end
+                state = _EXPECT_SEPARATOR
+
+        buffer = buffer[pos:]
+
+    if state != _DONE:
+        raise ValueError("Unterminated JSON array")
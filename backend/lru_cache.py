@@ -0,0 +1,109 @@
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with optional TTL and hit statistics.
+
+    With max_weight, entries are also evicted while the sum of weigh(value)
+    exceeds it; a value heavier than max_weight on its own is not stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, max_weight=None, weigh=None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+        if max_weight is not None and weigh is None:
+            raise ValueError("max_weight needs a weigh function")
+
+        self._data = OrderedDict()
+        self._weights = {}
+        self.weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full.
+
+        Storing the same value again re-weighs it, e.g. after it grew.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        weight = self.weigh(value) if self.max_weight is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+            self._data[key] = (value, expires_at)
+            self._weights[key] = weight
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                    self.max_weight is not None and self.weight > self.max_weight):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._data[key]
+        self.weight -= self._weights.pop(key, 0)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop all entries (statistics are kept)"""
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current fill level"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "weight": self.weight,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
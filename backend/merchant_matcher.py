@@ -0,0 +1,126 @@
+from collections import deque
+
+# Suffixes a keyword may carry at its end and still match, so "restaurant"
+# matches "Lou's Restaurants" and "bus" matches "buses"
+PLURAL_SUFFIXES = ("s", "es")
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every keyword in a string in one pass.
+
+    Keywords are matched case-insensitively and on word boundaries: a keyword
+    that starts (or ends) with a letter or digit only matches when the
+    character before (or after) it in the text is not a letter or digit, so
+    "bp" matches "BP Gas" but not "subpar". A keyword may end in a plural
+    suffix ("Airlines" for "airline"). Matching cost is linear in the
+    length of the text plus the number of matches, independent of how many
+    keywords were added.
+    """
+
+    def __init__(self, keywords=None):
+        self._goto = [{}]
+        self._fail = [0]
+        # Keyword ids ending at each state, and the nearest state on the
+        # failure chain that has outputs of its own (0 when there is none)
+        self._outputs = [[]]
+        self._output_link = [0]
+        self._keywords = []
+        self._built = False
+
+        for keyword, payload in keywords or ():
+            self.add(keyword, payload)
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def add(self, keyword, payload):
+        """Add a keyword with the payload returned when it matches"""
+        keyword = keyword.lower()
+        if not keyword:
+            return
+
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._output_link.append(0)
+            state = next_state
+
+        self._outputs[state].append(len(self._keywords))
+        self._keywords.append((
+            len(keyword),
+            keyword[0].isalnum(),
+            keyword[-1].isalnum(),
+            payload
+        ))
+        self._built = False
+
+    def build(self):
+        """Compute failure and output links (breadth-first over the trie)"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            self._output_link[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                fail = self._goto[fallback].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._outputs[fail] else self._output_link[fail]
+
+        self._built = True
+        return self
+
+    def find(self, text):
+        """Return the payloads of all keywords found in text, in match order"""
+        if not self._built:
+            self.build()
+
+        text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        output_link = self._output_link
+        keywords = self._keywords
+        last = len(text) - 1
+        matches = []
+
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            match_state = state if outputs[state] else output_link[state]
+            while match_state:
+                for keyword_id in outputs[match_state]:
+                    length, left_bound, right_bound, payload = keywords[keyword_id]
+                    start = end - length + 1
+                    if left_bound and start > 0 and text[start - 1].isalnum():
+                        continue
+                    if right_bound and end < last and text[end + 1].isalnum() and not _plural_end(text, end + 1):
+                        continue
+                    matches.append(payload)
+                match_state = output_link[match_state]
+
+        return matches
+
+
+def _plural_end(text, position):
+    """Whether a plural suffix starting at position ends a word"""
+    for suffix in PLURAL_SUFFIXES:
+        after = position + len(suffix)
+        if text.startswith(suffix, position) and (after == len(text) or not text[after].isalnum()):
+            return True
+    return False
@@ -0,0 +1,225 @@
+import os
+import time
+import atexit
+import threading
+
+from flask import Response, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+
+# Set for multi-process servers (serve.py); every process then records into files there
+MULTIPROCESS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# Latency buckets in seconds, for whole requests and for source refreshes
+REQUEST_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+SOURCE_BUCKETS = (.05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Seconds between folding in-process statistics into the counters below
+EXPORT_INTERVAL = 1.0
+
+HTTP_REQUESTS = Counter(
+    'swipe_http_requests_total', 'HTTP requests by route, method and status',
+    ['route', 'method', 'status'])
+HTTP_REQUEST_DURATION = Histogram(
+    'swipe_http_request_duration_seconds', 'HTTP request latency by route',
+    ['route', 'method'], buckets=REQUEST_BUCKETS)
+
+RECOMMENDATION_PHASE_SECONDS = Counter(
+    'swipe_recommendation_phase_seconds_total', 'Time spent in each phase of get_recommendations',
+    ['phase'])
+RECOMMENDATION_PHASE_CALLS = Counter(
+    'swipe_recommendation_phase_calls_total', 'Times each phase of get_recommendations ran',
+    ['phase'])
+
+CACHE_EVENTS = Counter(
+    'swipe_cache_events_total', 'In-process cache hits, misses, evictions and expirations',
+    ['cache', 'event'])
+CACHE_EVENT_TYPES = ("hits", "misses", "evictions", "expirations")
+
+FALLBACK_RECOMMENDATIONS = Counter(
+    'swipe_fallback_recommendations_total', 'Fallback recommendations served after an error')
+
+SOURCE_FETCH_DURATION = Histogram(
+    'swipe_source_fetch_seconds', 'Card source download time, retries included',
+    ['source'], buckets=SOURCE_BUCKETS)
+SOURCE_PARSE_DURATION = Histogram(
+    'swipe_source_parse_seconds', 'Card source parse and merge time',
+    ['source'], buckets=SOURCE_BUCKETS)
+# Outcomes as in CardScraper.last_fetch_report: changed, unchanged, not_modified, fetch_failed, parse_failed
+SOURCE_REFRESHES = Counter(
+    'swipe_source_refreshes_total', 'Card source refreshes by outcome',
+    ['source', 'outcome'])
+
+
+class PhaseTimings:
+    """Time per phase, summed in-process and exported to counters periodically.
+
+    Adding to a Python float is far cheaper than updating a (multi-process)
+    metric, and phases are timed several times per request.
+    """
+
+    def __init__(self, phases):
+        self.phases = tuple(phases)
+        self._seconds = dict.fromkeys(self.phases, 0.0)
+        self._calls = dict.fromkeys(self.phases, 0)
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self._seconds[phase] += seconds
+            self._calls[phase] += 1
+
+    def export(self):
+        """Add everything timed since the last export to the phase counters"""
+        with self._lock:
+            seconds, self._seconds = self._seconds, dict.fromkeys(self.phases, 0.0)
+            calls, self._calls = self._calls, dict.fromkeys(self.phases, 0)
+        for phase in self.phases:
+            if calls[phase]:
+                RECOMMENDATION_PHASE_SECONDS.labels(phase).inc(seconds[phase])
+                RECOMMENDATION_PHASE_CALLS.labels(phase).inc(calls[phase])
+
+
+# Phases of get_recommendations; scoring, sorting and preference filtering
+# happen in one pass over the reward index and are timed together as "rank"
+RECOMMENDATION_PHASES = PhaseTimings(("classify", "catalog", "rank", "describe", "cashback"))
+
+
+class RequestCounts:
+    """Requests per (route, method, status), counted in-process like PhaseTimings"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, method, status):
+        key = (route, method, status)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def export(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        for (route, method, status), count in counts.items():
+            HTTP_REQUESTS.labels(route, method, str(status)).inc(count)
+
+
+class StatsExporter:
+    """Folds in-process statistics into the shared counters.
+
+    Request counts, phase timings and the caches' own hit/miss counts are
+    exported as deltas at most once per interval, before serving /metrics
+    and at exit, so requests don't pay for a metric update per lookup or phase.
+    """
+
+    def __init__(self, caches, phase_timings=RECOMMENDATION_PHASES, request_counts=None, interval=EXPORT_INTERVAL):
+        self.caches = dict(caches)
+        self.phase_timings = phase_timings
+        self.request_counts = request_counts or RequestCounts()
+        self.interval = interval
+        self._exported = {}
+        self._next_export = 0
+        self._lock = threading.Lock()
+
+    def maybe_export(self):
+        if time.monotonic() >= self._next_export:
+            self.export()
+
+    def export(self):
+        if not self._lock.acquire(blocking=False):
+            # Another thread is exporting right now
+            return
+        try:
+            self._next_export = time.monotonic() + self.interval
+            self.phase_timings.export()
+            self.request_counts.export()
+            for name, cache in self.caches.items():
+                stats = cache.stats()
+                for event in CACHE_EVENT_TYPES:
+                    delta = stats[event] - self._exported.get((name, event), 0)
+                    if delta > 0:
+                        CACHE_EVENTS.labels(name, event).inc(delta)
+                    self._exported[(name, event)] = stats[event]
+        finally:
+            self._lock.release()
+
+
+def record_source_report(name, report):
+    """Record one source's entry of CardScraper.last_fetch_report"""
+    if report.get("fetch_seconds") is not None:
+        SOURCE_FETCH_DURATION.labels(name).observe(report["fetch_seconds"])
+    if report.get("parse_seconds") is not None:
+        SOURCE_PARSE_DURATION.labels(name).observe(report["parse_seconds"])
+    SOURCE_REFRESHES.labels(name, report["outcome"]).inc()
+
+
+class CatalogCollector:
+    """Catalog gauges, read from the live catalog at scrape time"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def collect(self):
+        snapshot = self.catalog.get_snapshot()
+        cards = GaugeMetricFamily('swipe_catalog_cards', 'Cards in the served catalog snapshot')
+        cards.add_metric([], len(snapshot))
+        yield cards
+
+        version = GaugeMetricFamily('swipe_catalog_version', 'Version of the served catalog snapshot')
+        version.add_metric([], snapshot.version)
+        yield version
+
+        loaded = GaugeMetricFamily('swipe_catalog_loaded_timestamp_seconds',
+                                   'Time the served catalog snapshot was loaded')
+        loaded.add_metric([], snapshot.loaded_at)
+        yield loaded
+
+
+def init_app(app, catalog, caches=None):
+    """Time every request and serve the metrics at /metrics.
+
+    caches maps metric label names to LRUCache instances whose statistics
+    are exported.
+    """
+    catalog_collector = CatalogCollector(catalog)
+    exporter = StatsExporter(caches or {})
+    atexit.register(exporter.export)
+    multiprocess_mode = MULTIPROCESS_DIR_ENV in os.environ
+    if not multiprocess_mode:
+        REGISTRY.register(catalog_collector)
+
+    # Histogram children by (route, method); labels() locks and validates on every call
+    durations = {}
+
+    @app.before_request
+    def start_request_timer():
+        request.environ['swipe.start'] = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        environ = request.environ
+        start = environ.get('swipe.start')
+        if start is not None:
+            rule = request.url_rule
+            key = (rule.rule if rule is not None else 'unmatched', environ['REQUEST_METHOD'])
+            histogram = durations.get(key)
+            if histogram is None:
+                histogram = durations[key] = HTTP_REQUEST_DURATION.labels(*key)
+            histogram.observe(time.perf_counter() - start)
+            exporter.request_counts.add(key[0], key[1], response.status_code)
+        exporter.maybe_export()
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics in the text exposition format"""
+        exporter.export()
+        if multiprocess_mode:
+            # Counters and histograms summed over all processes, gauges from this one
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(catalog_collector)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,186 @@
+import os
+import sys
+import pickle
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from html_parsing import parse_page
+
+logger = logging.getLogger('parse-pool')
+
+# Worker processes for HTML parsing; 0 parses on the calling thread
+DEFAULT_PARSE_WORKERS = int(os.environ.get('SWIPE_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+# Seconds to wait for one page before giving up on it
+DEFAULT_PAGE_TIMEOUT = float(os.environ.get('SWIPE_PAGE_TIMEOUT', 30.0))
+# Workers run this script in a fresh interpreter: nothing is forked from the
+# server process, whose threads may hold locks (logging, connection pools),
+# and the server's main script is never re-run the way multiprocessing's
+# spawn start method would
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parse_worker.py')
+
+
+class WorkerExited(RuntimeError):
+    """The worker process died before answering, e.g. killed after a timeout"""
+
+
+class ParseWorker:
+    """One parse_worker.py process, parsing one page at a time"""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def parse(self, html, spec, backend_name):
+        """Return (items, next_href) for a page; raises the worker's exception"""
+        try:
+            pickle.dump((html, spec, backend_name), self.process.stdin, pickle.HIGHEST_PROTOCOL)
+            self.process.stdin.flush()
+            status, value = pickle.load(self.process.stdout)
+        except (EOFError, OSError) as e:
+            raise WorkerExited(f"Parse worker {self.process.pid} exited") from e
+        if status == "error":
+            raise value
+        return value
+
+    def kill(self):
+        """Stop the worker; the thread waiting for its answer gets WorkerExited"""
+        self.process.kill()
+
+    def close(self):
+        """Close the worker's stdin, which makes an idle worker exit, and reap it"""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.stdout.close()
+        self.process.wait()
+
+
+class ParsedPage:
+    """Handle to a page submitted to a ParsePool"""
+
+    def __init__(self, pool, future=None, value=None, error=None):
+        self._pool = pool
+        self._future = future
+        self._value = value
+        self._error = error
+        # The worker parsing the page, set and cleared under the pool lock
+        self.worker = None
+        self.timed_out = False
+
+    def result(self):
+        """Return (items, next_href), raising TimeoutError if parsing took over the page timeout"""
+        if self._future is not None:
+            return self._future.result()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class ParsePool:
+    """Runs site parsers on fetched HTML pages in worker processes.
+
+    Pages submitted together are parsed in parallel; a page gets at most
+    page_timeout seconds from when a worker starts on it, so a pathological
+    page can't stall a refresh. Workers are started as pages need them, up
+    to `workers`, and are kept for later refreshes until close(); a worker
+    whose page timed out is killed and replaced.
+    """
+
+    def __init__(self, workers=DEFAULT_PARSE_WORKERS, page_timeout=DEFAULT_PAGE_TIMEOUT, backend_name=None):
+        self.workers = workers
+        self.page_timeout = page_timeout
+        self.backend_name = backend_name
+        self._executor = None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def submit(self, html, spec):
+        """Queue a page for parsing and return its ParsedPage handle"""
+        if self.workers <= 0:
+            try:
+                return ParsedPage(self, value=parse_page(html, spec, self.backend_name))
+            except Exception as e:
+                return ParsedPage(self, error=e)
+
+        with self._lock:
+            if self._executor is None:
+                # One thread per worker process hands it pages and waits for the results
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="parse-pool")
+            page = ParsedPage(self)
+            page._future = self._executor.submit(self._parse, page, html, spec)
+        return page
+
+    def _parse(self, page, html, spec):
+        worker = self._checkout()
+        with self._lock:
+            page.worker = worker
+        # The timeout counts from here, not from when the page was queued
+        timer = threading.Timer(self.page_timeout, self._expire, (page, worker))
+        timer.daemon = True
+        timer.start()
+        try:
+            return worker.parse(html, spec, self.backend_name)
+        except WorkerExited:
+            worker.kill()
+            worker.close()
+            worker = None
+            if page.timed_out:
+                raise TimeoutError(f"Page not parsed within {self.page_timeout}s") from None
+            raise
+        finally:
+            timer.cancel()
+            with self._lock:
+                page.worker = None
+            if worker is not None:
+                self._checkin(worker)
+
+    def _expire(self, page, worker):
+        """Kill a page's worker at its timeout, unless it is done with the page"""
+        with self._lock:
+            # Once cleared, the worker may already be parsing another page
+            if page.worker is not worker:
+                return
+            page.timed_out = True
+            # The worker may be stuck for good, a new one replaces it
+            logger.warning("Killing parse worker %s after a page timeout", worker.process.pid)
+            worker.kill()
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                worker.close()
+        return ParseWorker()
+
+    def _checkin(self, worker):
+        with self._lock:
+            if self._executor is not None:
+                self._idle.append(worker)
+                return
+        worker.close()
+
+    def close(self):
+        """Wait for submitted pages, then stop the workers"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,39 @@
+"""Entry point of the parse pool's worker processes.
+
+    python parse_worker.py
+
+Reads pickled (html, spec, backend_name) tasks from stdin and answers each
+with a pickled ("ok", (items, next_href)) or ("error", exception) on
+stdout, until stdin is closed. It only imports html_parsing, so a worker
+never runs the setup of the server that started it.
+"""
+import sys
+import pickle
+
+from html_parsing import parse_page
+
+
+def main():
+    tasks = sys.stdin.buffer
+    results = sys.stdout.buffer
+    # Anything else printed would corrupt the results stream
+    sys.stdout = sys.stderr
+
+    while True:
+        try:
+            html, spec, backend_name = pickle.load(tasks)
+        except EOFError:
+            return
+        try:
+            reply = pickle.dumps(("ok", parse_page(html, spec, backend_name)), pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            try:
+                reply = pickle.dumps(("error", e), pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                reply = pickle.dumps(("error", RuntimeError(repr(e))), pickle.HIGHEST_PROTOCOL)
+        results.write(reply)
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,118 @@
 import logging
 import json
 import os
-from datetime import datetime
+import time
+from datetime import date
+import numpy as np
 from card_scraper import CardScraper
+from card_identity import CardLookup
+from merchant_matcher import KeywordMatcher
+from lru_cache import LRUCache
+from domain_index import MerchantDomainIndex, extract_host
+from reward_matrix import RewardMatrix
+from reward_index import RewardIndex, SOURCE_BASE, SOURCE_QUARTERLY, card_category_rate
+from rotating_categories import BonusTable, RotatingCalendar
+import metrics
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('card-recommender')
 
+# Indicators that a merchant string refers to an online store
+ONLINE_INDICATORS = [".com", "online", "website", "web", "shop", "checkout", "cart"]
+
+# Specific merchants with custom category assignments
+MERCHANT_SPECIFIC_MAPPING = {
+    "amazon": ["amazon", "online_shopping"],
+    "walmart": ["walmart", "groceries", "shopping"],
+    "target": ["target", "groceries", "shopping"],
+    "paypal": ["paypal"],
+    "costco": ["wholesale_clubs", "groceries"],
+    "uber": ["transit"],
+    "lyft": ["transit"],
+    "netflix": ["streaming"],
+    "spotify": ["streaming"],
+    "hulu": ["streaming"],
+    "starbucks": ["dining"],
+    "mcdonalds": ["dining"],
+    "delta": ["travel", "airlines"],
+    "american airlines": ["travel", "airlines"],
+    "united airlines": ["travel", "airlines"],
+    "southwest": ["travel", "airlines"],
+    "airbnb": ["travel", "lodging"],
+    "marriott": ["travel", "lodging"],
+    "hilton": ["travel", "lodging"],
+    "apple": ["apple", "electronics"]
+}
+
+# Categories named after a merchant, for card bonuses at that merchant (e.g.
+# 5% at Walmart); merchants matched by domain get them too
+MERCHANT_BRAND_CATEGORIES = frozenset(
+    merchant for merchant, categories in MERCHANT_SPECIFIC_MAPPING.items() if merchant in categories)
+
+# Default number of cached merchant classifications
+CLASSIFICATION_CACHE_SIZE = 4096
+
+# Default number of cached recommendation rankings
+RANKING_CACHE_SIZE = 1024
+
+# Items per vectorized cashback computation in batch recommendations
+BATCH_CHUNK_SIZE = 256
+
+# Keyword groups in the compiled merchant matcher
+KEYWORD_GROUP_CATEGORY = 0
+KEYWORD_GROUP_ONLINE = 1
+KEYWORD_GROUP_MERCHANT = 2
+
 class CardRecommender:
-    def __init__(self):
-        self.scraper = CardScraper()
-        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    def __init__(self, data_dir=None, classification_cache_size=CLASSIFICATION_CACHE_SIZE, classification_cache_ttl=None,
+                 ranking_cache_size=RANKING_CACHE_SIZE):
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
+        self.scraper = CardScraper(self.data_dir)
+        self.scraper.catalog.register_index("rewards", RewardIndex)
+        self.scraper.catalog.register_index("reward_matrix", RewardMatrix)
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         
-        # Load merchant categories
+        # Merchant category mappings and top merchants file for exact domain matching
         self.merchant_categories_file = os.path.join(self.data_dir, 'merchant_categories.json')
-        self.merchant_categories = self._load_merchant_categories()
-        
-        # Load top merchants file for exact domain matching
         self.top_merchants_file = os.path.join(self.data_dir, 'top_merchants.json')
-        self.top_merchants = self._load_top_merchants()
         
-        # Quarterly bonus categories
-        self.quarterly_categories = self._get_quarterly_categories()
+        # Dated rotating bonus categories, keyed by card ID
+        self.rotating_categories_file = os.path.join(self.data_dir, 'rotating_categories.json')
+        self._bonus_table = None
+        
+        # Bounded cache of merchant classifications, keyed by normalized merchant string
+        self.classification_cache = LRUCache(classification_cache_size, classification_cache_ttl)
+        self.merchant_data_generation = 0
+        self.reload_merchant_data()
+        
+        # Amount-independent rankings, keyed by category set, period, preferences and catalog version
+        self.ranking_cache = LRUCache(ranking_cache_size)
+    
+    def warm_up(self):
+        """Load the card catalog and build its indexes ahead of the first request"""
+        snapshot = self.scraper.catalog.get_snapshot()
+        for name in ("rewards", "reward_matrix", "lookup"):
+            self.scraper.catalog.index(name)
+        return snapshot
+    
+    def reload_merchant_data(self):
+        """Load merchant tables and the rotating-category calendar, and invalidate what was derived from them"""
+        merchant_categories = self._load_merchant_categories()
+        top_merchants = self._load_top_merchants()
+        merchant_matcher = self._build_merchant_matcher(merchant_categories)
+        merchant_domains = MerchantDomainIndex(top_merchants)
+        rotating_calendar = RotatingCalendar.load(self.rotating_categories_file)
+        
+        self.merchant_categories = merchant_categories
+        self.top_merchants = top_merchants
+        self.merchant_matcher = merchant_matcher
+        self.merchant_domains = merchant_domains
+        self.rotating_calendar = rotating_calendar
+        self._bonus_table = None
+        
+        # Entries of older generations can no longer be hit, clear them eagerly
+        self.merchant_data_generation += 1
+        self.classification_cache.clear()
     
     def _load_top_merchants(self):
         """Load curated list of top merchant domains"""
@@ -36,7 +121,7 @@ class CardRecommender:
                 with open(self.top_merchants_file, 'r') as f:
                     return json.load(f)
             except Exception as e:
-                logger.error(f"Error loading top merchants: {str(e)}")
+                logger.error("Error loading top merchants: %s", e)
         
         # Return empty dict if file doesn't exist or has errors
         return {}
@@ -48,7 +133,7 @@ class CardRecommender:
                 with open(self.merchant_categories_file, 'r') as f:
                     return json.load(f)
             except Exception as e:
-                logger.error(f"Error loading merchant categories: {str(e)}")
+                logger.error("Error loading merchant categories: %s", e)
         
         # Default merchant categories
         return {
@@ -71,112 +156,124 @@ class CardRecommender:
             "insurance": ["insurance", "geico", "state farm", "progressive", "allstate"]
         }
     
-    def _get_quarterly_categories(self):
-        """Get current quarterly bonus categories for various cards"""
-        current_quarter = self._get_current_quarter()
-        
-        # These would ideally be updated each quarter
-        discover_it_categories = {
-            1: ["groceries", "drugstores"],         # Q1 (Jan-Mar)
-            2: ["gas", "home_improvement"],         # Q2 (Apr-Jun)
-            3: ["dining", "online_shopping"],       # Q3 (Jul-Sep)
-            4: ["amazon", "target", "walmart"]      # Q4 (Oct-Dec)
-        }
+    def _build_merchant_matcher(self, merchant_categories):
+        """Compile merchant keywords into one multi-pattern matcher"""
+        matcher = KeywordMatcher()
         
-        chase_freedom_categories = {
-            1: ["groceries", "gas"],                # Q1 (Jan-Mar)
-            2: ["online_shopping", "transit"],      # Q2 (Apr-Jun)
-            3: ["restaurants", "streaming"],        # Q3 (Jul-Sep)
-            4: ["walmart", "amazon", "paypal"]      # Q4 (Oct-Dec)
-        }
+        # Payloads sort by (group, rank) so results keep the table order
+        for rank, (category, keywords) in enumerate(merchant_categories.items()):
+            for keyword in keywords:
+                matcher.add(keyword, (KEYWORD_GROUP_CATEGORY, rank, (category,)))
         
-        citi_dividend_categories = {
-            1: ["fitness", "drugstores"],           # Q1 (Jan-Mar)
-            2: ["home_improvement", "utilities"],   # Q2 (Apr-Jun)
-            3: ["airlines", "car_rentals"],         # Q3 (Jul-Sep)
-            4: ["department_stores", "amazon"]      # Q4 (Oct-Dec)
-        }
+        for indicator in ONLINE_INDICATORS:
+            matcher.add(indicator, (KEYWORD_GROUP_ONLINE, 0, ()))
         
-        return {
-            "discover_it": discover_it_categories.get(current_quarter, []),
-            "chase_freedom": chase_freedom_categories.get(current_quarter, []),
-            "citi_dividend": citi_dividend_categories.get(current_quarter, [])
-        }
+        for rank, (merchant_keyword, categories) in enumerate(MERCHANT_SPECIFIC_MAPPING.items()):
+            matcher.add(merchant_keyword, (KEYWORD_GROUP_MERCHANT, rank, tuple(categories)))
+        
+        return matcher.build()
     
-    def _get_current_quarter(self):
-        """Get the current quarter (1-4) based on the current date"""
-        current_month = datetime.now().month
-        if current_month <= 3:
-            return 1
-        elif current_month <= 6:
-            return 2
-        elif current_month <= 9:
-            return 3
-        else:
-            return 4
+    def _today(self):
+        return date.today()
+    
+    def current_period(self):
+        """The rotating-category period in effect today"""
+        return self.rotating_calendar.period_at(self._today())
+    
+    def _get_bonus_table(self, snapshot):
+        """Rotating bonuses of the current period, rebuilt when it ends or the catalog changes"""
+        today = self._today()
+        table = self._bonus_table
+        if table is None or not table.is_current(today, snapshot.version):
+            period = self.rotating_calendar.period_at(today)
+            if not period.bonuses and self.rotating_calendar.entries:
+                logger.warning("No rotating categories cover %s, add its period to %s", today,
+                               self.rotating_categories_file)
+            lookup = snapshot.get_index("lookup", CardLookup)
+            table = BonusTable(period, lookup, snapshot.version)
+            self._bonus_table = table
+        return table
+    
+    def _cashback(self, entry, amount):
+        """Cashback on a purchase.
+        
+        Spend beyond a rotating bonus cap earns the card's own best rate for
+        the merchant, and the card is paid the better of that blend and its
+        own rate on the whole purchase.
+        """
+        spend_cap = entry.get("spend_cap")
+        if spend_cap is None or amount <= spend_cap:
+            return round(amount * (entry["reward_percentage"] / 100), 2)
+        capped = spend_cap * (entry["reward_percentage"] / 100)
+        blended = capped + (amount - spend_cap) * (entry["rate_after_cap"] / 100)
+        return round(max(blended, amount * (entry["rate_after_cap"] / 100)), 2)
+    
+    def _ranking_limit(self, limit, bonuses):
+        """Cards to rank for `limit` results: capped bonus cards may drop below the limit once scored"""
+        return limit + bonuses.capped if limit is not None else None
+    
+    def _order_by_cashback(self, card_scores, amount, limit):
+        """Cards scored for an amount, best cashback first.
+        
+        Rankings are by reward rate, which orders cashback too until the
+        amount exceeds a bonus spend cap; then the cards are re-sorted by
+        cashback, equal amounts keeping their rate order.
+        """
+        if any("spend_cap" in score and amount > score["spend_cap"] for score in card_scores):
+            card_scores.sort(key=lambda score: -score["cashback"])
+        return card_scores[:limit] if limit is not None else card_scores
     
     def determine_merchant_categories(self, merchant_name):
         """Determine the categories of a merchant based on its name"""
-        # Extract domain for exact matching
-        domain = self._extract_domain(merchant_name)
+        key = (self.merchant_data_generation, merchant_name.strip().lower())
+        categories, name, confidence = self.classification_cache.get_or_compute(
+            key, lambda: self._classify_merchant(merchant_name))
+        
+        return {
+            "categories": list(categories),
+            "name": name or merchant_name,
+            "confidence": confidence
+        }
+    
+    def _classify_merchant(self, merchant_name):
+        """Classify a merchant as (categories, known merchant name or None, confidence)"""
+        # Extract the host for domain matching
+        host = extract_host(merchant_name)
         confidence = "low"
         
-        # First try exact domain matching with our top merchants list
-        if domain and domain in self.top_merchants:
-            merchant_info = self.top_merchants[domain]
+        # First try the most specific match in our top merchants list
+        match = self.merchant_domains.lookup(host) if host else None
+        if match:
+            _, merchant_info, match_type = match
             confidence = merchant_info.get("confidence", "medium")
-            return {
-                "categories": [merchant_info["category"]],
-                "name": merchant_info["name"],
-                "confidence": confidence
-            }
+            if match_type == MerchantDomainIndex.MATCH_BRAND:
+                # Same brand under another suffix, e.g. amazon.co.uk for amazon.com
+                confidence = "medium"
+            categories = [merchant_info["category"]]
+            for group, _, merchant_categories in self.merchant_matcher.find(merchant_info["name"]):
+                if group == KEYWORD_GROUP_MERCHANT:
+                    categories.extend(category for category in merchant_categories
+                                      if category in MERCHANT_BRAND_CATEGORIES and category not in categories)
+            return (tuple(categories), merchant_info["name"], confidence)
         
-        # Convert to lowercase for case-insensitive matching
-        merchant_lower = merchant_name.lower()
+        # Single pass over the merchant string with the compiled keyword matcher
+        hits = sorted(set(self.merchant_matcher.find(merchant_name)))
         
         matching_categories = []
         
-        # Check each category's keywords
-        for category, keywords in self.merchant_categories.items():
-            for keyword in keywords:
-                if keyword.lower() in merchant_lower:
-                    matching_categories.append(category)
-                    break  # Only add each category once
+        # Keyword matches from the merchant category table, in table order
+        for group, _, categories in hits:
+            if group == KEYWORD_GROUP_CATEGORY:
+                matching_categories.extend(categories)
         
         # Special case for online retailers
         if not any(cat in ["online_shopping", "shopping"] for cat in matching_categories):
-            online_indicators = [".com", "online", "website", "web", "shop", "checkout", "cart"]
-            for indicator in online_indicators:
-                if indicator in merchant_lower:
-                    matching_categories.append("online_shopping")
-                    break
-        
-        # Handle specific merchants with custom category assignments
-        merchant_specific_mapping = {
-            "amazon": ["amazon", "online_shopping"],
-            "walmart": ["groceries", "shopping"],
-            "target": ["groceries", "shopping"],
-            "costco": ["wholesale_clubs", "groceries"],
-            "uber": ["transit"],
-            "lyft": ["transit"],
-            "netflix": ["streaming"],
-            "spotify": ["streaming"],
-            "hulu": ["streaming"],
-            "starbucks": ["dining"],
-            "mcdonalds": ["dining"],
-            "delta": ["travel", "airlines"],
-            "american airlines": ["travel", "airlines"],
-            "united airlines": ["travel", "airlines"],
-            "southwest": ["travel", "airlines"],
-            "airbnb": ["travel", "lodging"],
-            "marriott": ["travel", "lodging"],
-            "hilton": ["travel", "lodging"],
-            "apple": ["apple", "electronics"]
-        }
+            if any(group == KEYWORD_GROUP_ONLINE for group, _, _ in hits):
+                matching_categories.append("online_shopping")
         
         # Add merchant-specific categories if they exist
-        for merchant_keyword, categories in merchant_specific_mapping.items():
-            if merchant_keyword in merchant_lower:
+        for group, _, categories in hits:
+            if group == KEYWORD_GROUP_MERCHANT:
                 for category in categories:
                     if category not in matching_categories:
                         matching_categories.append(category)
@@ -185,126 +282,28 @@ class CardRecommender:
         if not matching_categories:
             matching_categories.append("other")
         
-        return {
-            "categories": matching_categories,
-            "name": merchant_name,
-            "confidence": "medium" if len(matching_categories) > 0 else "low"
-        }
+        return (tuple(matching_categories), None, "medium" if len(matching_categories) > 0 else "low")
     
-    def _extract_domain(self, merchant_string):
-        """Extract domain from a merchant name that might be a URL or contain a domain"""
-        # Check if it looks like a domain/URL
-        if "." in merchant_string:
-            # Try to handle URLs
-            if "://" in merchant_string:
-                try:
-                    # Extract domain from URL
-                    parts = merchant_string.split('/')
-                    if len(parts) >= 3:
-                        domain_part = parts[2].lower()
-                        return self._clean_domain(domain_part)
-                except:
-                    pass
-            
-            # Check if it's just a domain name
-            if "www." in merchant_string or ".com" in merchant_string or ".org" in merchant_string:
-                return self._clean_domain(merchant_string)
-        
-        return None
-    
-    def _clean_domain(self, domain):
-        """Clean up a domain name for standard comparison"""
-        domain = domain.lower().strip()
-        # Remove protocol
-        if "://" in domain:
-            domain = domain.split('://', 1)[1]
-        # Remove www.
-        if domain.startswith('www.'):
-            domain = domain[4:]
-        # Remove path
-        if '/' in domain:
-            domain = domain.split('/', 1)[0]
-        # Remove port
-        if ':' in domain:
-            domain = domain.split(':', 1)[0]
-        
-        return domain
-    
-    def get_recommendations(self, merchant, amount, user_preferences=None):
+    def get_recommendations(self, merchant, amount, user_preferences=None, limit=None):
         """Get card recommendations for a specific merchant and purchase amount"""
         try:
             # Get merchant categories
+            start = time.perf_counter()
             merchant_result = self.determine_merchant_categories(merchant)
             categories = merchant_result["categories"]
             merchant_name = merchant_result["name"]
             confidence = merchant_result["confidence"]
+            metrics.RECOMMENDATION_PHASES.add("classify", time.perf_counter() - start)
             
-            # Get card data
-            cards = self.scraper.get_card_data()
-            
-            # Score each card based on rewards for this purchase
-            card_scores = []
-            
-            for card in cards:
-                # Calculate potential rewards for this purchase
-                best_reward_percentage = 1  # Default 1% back
-                best_category = "other"
-                explanation = "1% cash back on all purchases"
-                
-                # Check if any card categories match the merchant categories
-                card_categories = card.get("categories", {})
-                
-                for category in categories:
-                    # Check if the card has a specific category bonus
-                    if category in card_categories:
-                        reward_percentage = card_categories[category]
-                        if reward_percentage > best_reward_percentage:
-                            best_reward_percentage = reward_percentage
-                            best_category = category
-                            explanation = f"{reward_percentage}% back on {category}"
-                
-                # Check for quarterly rotating categories (Discover It, Chase Freedom, etc.)
-                card_name_lower = card.get("name", "").lower()
-                
-                # Discover It
-                if "discover it" in card_name_lower and any(cat in categories for cat in self.quarterly_categories["discover_it"]):
-                    best_reward_percentage = 5
-                    best_category = "quarterly_bonus"
-                    explanation = f"5% cash back on quarterly bonus categories (currently: {', '.join(self.quarterly_categories['discover_it'])})"
-                
-                # Chase Freedom
-                elif ("chase freedom" in card_name_lower or "freedom flex" in card_name_lower) and any(cat in categories for cat in self.quarterly_categories["chase_freedom"]):
-                    best_reward_percentage = 5
-                    best_category = "quarterly_bonus"
-                    explanation = f"5% cash back on quarterly bonus categories (currently: {', '.join(self.quarterly_categories['chase_freedom'])})"
-                
-                # Citi Dividend
-                elif "citi dividend" in card_name_lower and any(cat in categories for cat in self.quarterly_categories["citi_dividend"]):
-                    best_reward_percentage = 5
-                    best_category = "quarterly_bonus"
-                    explanation = f"5% cash back on quarterly bonus categories (currently: {', '.join(self.quarterly_categories['citi_dividend'])})"
-                
-                # Calculate cashback amount
-                cashback_amount = round(amount * (best_reward_percentage / 100), 2)
-                
-                # Add score to results
-                card_scores.append({
-                    "name": card.get("name", "Unknown Card"),
-                    "issuer": card.get("issuer", ""),
-                    "network": card.get("network", ""),
-                    "reward_percentage": best_reward_percentage,
-                    "reward_category": best_category,
-                    "explanation": explanation,
-                    "cashback": cashback_amount,
-                    "annual_fee": card.get("annual_fee", 0)
-                })
+            # The cached ranking doesn't depend on the amount; bonus cards past their spend cap are re-sorted below
+            bonuses = self._get_bonus_table(self.scraper.get_snapshot())
+            ranked = self._get_ranking(categories, user_preferences, self._ranking_limit(limit, bonuses))
             
-            # Apply user preferences if provided
-            if user_preferences:
-                card_scores = self._apply_user_preferences(card_scores, user_preferences)
-            
-            # Sort by cashback amount (descending)
-            card_scores.sort(key=lambda x: x["cashback"], reverse=True)
+            # Calculate cashback amounts
+            start = time.perf_counter()
+            card_scores = [dict(entry, cashback=self._cashback(entry, amount)) for entry in ranked]
+            card_scores = self._order_by_cashback(card_scores, amount, limit)
+            metrics.RECOMMENDATION_PHASES.add("cashback", time.perf_counter() - start)
             
             # Return results
             return {
@@ -317,39 +316,223 @@ class CardRecommender:
             }
             
         except Exception as e:
-            logger.error(f"Error getting recommendations: {str(e)}", exc_info=True)
+            logger.error("Error getting recommendations: %s", e, exc_info=True)
             
             # Return fallback recommendations
             return self._get_fallback_recommendations(amount)
     
-    def _apply_user_preferences(self, card_scores, user_preferences):
-        """Apply user preferences to filter or adjust card scores"""
-        filtered_scores = []
+    def get_batch_recommendations(self, items, limit=None):
+        """Get recommendations for many (merchant, amount, user_preferences) items at once.
         
-        for card in card_scores:
-            # Filter by preferred issuers
-            if "preferred_issuers" in user_preferences and user_preferences["preferred_issuers"]:
-                if card["issuer"] not in user_preferences["preferred_issuers"]:
-                    continue
+        Merchants are classified once per distinct merchant, every distinct
+        category set is scored once over the reward matrix and cashback is
+        computed for a whole chunk of items in one operation. Results come
+        back in input order and match get_recommendations() item for item.
+        """
+        try:
+            snapshot = self.scraper.get_snapshot()
+            matrix = snapshot.get_index("reward_matrix", RewardMatrix)
+            bonuses = self._get_bonus_table(snapshot)
             
-            # Filter by preferred networks
-            if "preferred_networks" in user_preferences and user_preferences["preferred_networks"]:
-                if card["network"] not in user_preferences["preferred_networks"]:
-                    continue
+            # Classify each distinct merchant once
+            merchant_results = {}
+            for item in items:
+                merchant = item["merchant"]
+                if merchant not in merchant_results:
+                    merchant_results[merchant] = self.determine_merchant_categories(merchant)
             
-            # Filter by annual fee
-            if "max_annual_fee" in user_preferences and user_preferences["max_annual_fee"] is not None:
-                if card["annual_fee"] > user_preferences["max_annual_fee"]:
-                    continue
+            # Score each distinct category set once
+            groups = {}
+            group_categories = []
+            group_scores = []
+            for merchant_result in merchant_results.values():
+                key = tuple(merchant_result["categories"])
+                if key not in groups:
+                    groups[key] = len(group_scores)
+                    group_categories.append(key)
+                    group_scores.append(matrix.score(merchant_result["categories"], bonuses.postings))
+            group_rates = np.vstack([rates for rates, _, _ in group_scores])
+            
+            # Ranked card positions and their descriptions, once per (category set, preferences)
+            masks = {}
+            rankings = {}
             
-            # If it passes all filters, add it to results
-            filtered_scores.append(card)
+            def ranking(group, preferences):
+                mask_key = json.dumps(preferences, sort_keys=True, default=str) if preferences else None
+                if (group, mask_key) not in rankings:
+                    if mask_key not in masks:
+                        masks[mask_key] = matrix.preference_mask(preferences)
+                    mask = masks[mask_key]
+                    _, sources, order = group_scores[group]
+                    categories = group_categories[group]
+                    
+                    # If no cards passed the filters, fall back to the unfiltered ranking
+                    if mask is not None:
+                        filtered = order[mask[order]]
+                        if len(filtered):
+                            order = filtered
+                    if limit is not None:
+                        order = order[:self._ranking_limit(limit, bonuses)]
+                    
+                    described = []
+                    for position in order.tolist():
+                        source, category = sources[position]
+                        bonus = bonuses.bonuses.get(position) if source == SOURCE_QUARTERLY else None
+                        rate = bonus.rate if bonus else matrix.card_rate(position, source, category)
+                        described.append(self._describe_card(matrix.cards[position], rate, source, category, bonus,
+                                                             categories))
+                    rankings[(group, mask_key)] = (order, described)
+                return rankings[(group, mask_key)]
+            
+            responses = []
+            for start in range(0, len(items), BATCH_CHUNK_SIZE):
+                chunk = items[start:start + BATCH_CHUNK_SIZE]
+                item_groups = np.array([groups[tuple(merchant_results[item["merchant"]]["categories"])] for item in chunk])
+                amounts = np.array([float(item["amount"]) for item in chunk])
+                chunk_rankings = [ranking(group, item.get("user_preferences"))
+                                  for group, item in zip(item_groups.tolist(), chunk)]
+                
+                # Pad the ranked positions into an items x cards grid
+                width = max(len(order) for order, _ in chunk_rankings)
+                positions = np.zeros((len(chunk), width), dtype=np.intp)
+                for row, (order, _) in enumerate(chunk_rankings):
+                    positions[row, :len(order)] = order
+                
+                # Cashback for every item x ranked card in one operation
+                cashback = amounts[:, None] * (group_rates[item_groups[:, None], positions] / 100)
+                
+                for item, amount, (_, described), row in zip(chunk, amounts.tolist(), chunk_rankings, cashback.tolist()):
+                    merchant_result = merchant_results[item["merchant"]]
+                    card_scores = [dict(entry, cashback=self._cashback(entry, amount) if "spend_cap" in entry else round(value, 2))
+                                   for entry, value in zip(described, row)]
+                    card_scores = self._order_by_cashback(card_scores, amount, limit)
+                    responses.append({
+                        "success": True,
+                        "merchant": merchant_result["name"],
+                        "merchant_categories": merchant_result["categories"],
+                        "confidence": merchant_result["confidence"],
+                        "amount": amount,
+                        "recommendations": card_scores
+                    })
+            
+            return responses
         
-        # If no cards passed the filters, return original list
-        return filtered_scores if filtered_scores else card_scores
+        except Exception as e:
+            logger.error("Error getting batch recommendations: %s", e, exc_info=True)
+            
+            # Return fallback recommendations for every item
+            return [self._get_fallback_recommendations(float(item["amount"])) for item in items]
+    
+    def _get_ranking(self, categories, user_preferences, limit):
+        """Ranked, described cards for a category set, cached per catalog version.
+        
+        Entries are cached per (categories, rotating-category period,
+        preferences, catalog version). A cached ranking is reused when it is complete or at least
+        `limit` long; otherwise it is recomputed with the larger limit.
+        """
+        start = time.perf_counter()
+        snapshot = self.scraper.get_snapshot()
+        bonuses = self._get_bonus_table(snapshot)
+        metrics.RECOMMENDATION_PHASES.add("catalog", time.perf_counter() - start)
+        period = (self.merchant_data_generation, bonuses.period.start)
+        key = (tuple(categories), period, self._normalize_preferences(user_preferences), snapshot.version)
+        
+        cached = self.ranking_cache.get(key)
+        if cached is not None:
+            entries, complete = cached
+            if complete or (limit is not None and len(entries) >= limit):
+                return entries[:limit] if limit is not None else entries
+        
+        # Merge the posting lists of the merchant categories, best cards first
+        start = time.perf_counter()
+        index = snapshot.get_index("rewards", RewardIndex)
+        card_filter = self._preference_filter(user_preferences)
+        ranked = index.rank(categories, bonuses.postings, limit, card_filter)
+        
+        # If no cards passed the filters, fall back to the unfiltered ranking
+        if card_filter and not ranked:
+            ranked = index.rank(categories, bonuses.postings, limit)
+        metrics.RECOMMENDATION_PHASES.add("rank", time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        entries = [self._describe_card(index.cards[position], rate, source, category, bonuses.bonuses.get(position),
+                                       categories)
+                   for position, rate, source, category in ranked]
+        metrics.RECOMMENDATION_PHASES.add("describe", time.perf_counter() - start)
+        complete = limit is None or len(entries) < limit
+        self.ranking_cache.put(key, (entries, complete))
+        return entries
+    
+    def _normalize_preferences(self, user_preferences):
+        """Canonical, hashable form of the preference filters (None when unfiltered)"""
+        if self._preference_filter(user_preferences) is None:
+            return None
+        return (
+            tuple(sorted(user_preferences.get("preferred_issuers") or ())),
+            tuple(sorted(user_preferences.get("preferred_networks") or ())),
+            user_preferences.get("max_annual_fee")
+        )
+    
+    def _describe_card(self, card, reward_percentage, source, category, bonus=None, categories=()):
+        """Describe a ranked card's reward, everything but the cashback amount.
+        
+        `categories` are the merchant categories; spend beyond a bonus cap
+        earns the card's own best rate for them.
+        """
+        spend_cap = None
+        if source == SOURCE_QUARTERLY:
+            category = "quarterly_bonus"
+            explanation = f"{reward_percentage}% cash back on quarterly bonus categories (currently: {', '.join(bonus.categories)})"
+            spend_cap = bonus.spend_cap
+            if spend_cap is not None:
+                explanation += f" on up to ${spend_cap:,} in purchases through {bonus.end.isoformat()}"
+        elif source == SOURCE_BASE:
+            explanation = f"{reward_percentage}% cash back on all purchases"
+        else:
+            explanation = f"{reward_percentage}% back on {category}"
+        
+        entry = {
+            "name": card.get("name", "Unknown Card"),
+            "issuer": card.get("issuer", ""),
+            "network": card.get("network", ""),
+            "reward_percentage": reward_percentage,
+            "reward_category": category,
+            "explanation": explanation,
+            "annual_fee": card.get("annual_fee", 0)
+        }
+        if spend_cap is not None:
+            entry["spend_cap"] = spend_cap
+            entry["rate_after_cap"] = card_category_rate(card, categories)
+        return entry
+    
+    def _preference_filter(self, user_preferences):
+        """Build a card predicate from user preferences, or None if there are none"""
+        if not user_preferences:
+            return None
+        
+        preferred_issuers = user_preferences.get("preferred_issuers") or None
+        preferred_networks = user_preferences.get("preferred_networks") or None
+        max_annual_fee = user_preferences.get("max_annual_fee")
+        if not preferred_issuers and not preferred_networks and max_annual_fee is None:
+            return None
+        
+        def card_filter(card):
+            # Filter by preferred issuers
+            if preferred_issuers and card.get("issuer", "") not in preferred_issuers:
+                return False
+            # Filter by preferred networks
+            if preferred_networks and card.get("network", "") not in preferred_networks:
+                return False
+            # Filter by annual fee
+            if max_annual_fee is not None and card.get("annual_fee", 0) > max_annual_fee:
+                return False
+            return True
+        
+        return card_filter
     
     def _get_fallback_recommendations(self, amount):
         """Get fallback recommendations when there's an error"""
+        metrics.FALLBACK_RECOMMENDATIONS.inc()
         cashback_2percent = round(amount * 0.02, 2)
         cashback_1_5percent = round(amount * 0.015, 2)
         cashback_1percent = round(amount * 0.01, 2)
@@ -405,22 +588,18 @@ class CardRecommender:
         }
     
     def get_card_details(self, card_id):
-        """Get detailed information about a specific card"""
+        """Get detailed information about a card by its ID, name or an alias"""
         try:
-            # Get all cards
-            cards = self.scraper.get_card_data()
-            
-            # Find card by ID/name
-            for card in cards:
-                if card.get("id") == card_id or card.get("name").lower() == card_id.lower():
-                    return {
-                        "success": True,
-                        "card": card
-                    }
+            card = self.scraper.get_snapshot().get_index("lookup", CardLookup).get(card_id)
+            if card is not None:
+                return {
+                    "success": True,
+                    "card": card
+                }
             
             return {"success": False, "error": "Card not found"}
         except Exception as e:
-            logger.error(f"Error getting card details: {str(e)}", exc_info=True)
+            logger.error("Error getting card details: %s", e, exc_info=True)
             return {"success": False, "error": str(e)}
 
 # Test the recommender if run directly
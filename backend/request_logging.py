@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+
+from flask import request
+
+access_logger = logging.getLogger('swipe-access')
+
+DEFAULT_LOG_FILE = os.environ.get('SWIPE_LOG_FILE', 'api.log')
+DEFAULT_LOG_LEVEL = os.environ.get('SWIPE_LOG_LEVEL', 'INFO')
+# Fraction of requests per route whose info logs are kept: "/api/recommend=0.1,/ping=0"
+DEFAULT_SAMPLE_RATES = os.environ.get('SWIPE_LOG_SAMPLE_RATES', '')
+# Requests slower than this are logged as warnings, so sampling never hides them
+SLOW_REQUEST_MS = float(os.environ.get('SWIPE_SLOW_REQUEST_MS', 1000))
+# Records waiting for the writer thread; when it falls this far behind, new ones are dropped
+QUEUE_SIZE = 10000
+# Seconds the writer lets records accumulate between batches
+WRITE_INTERVAL = 0.05
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_VALID_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+
+# Context of the request being handled on this thread, None outside requests
+_request_context = contextvars.ContextVar('swipe_request_context', default=None)
+
+
+class RequestContext:
+    """Per-request log fields and the request's sampling decision"""
+
+    __slots__ = ("request_id", "route", "sampled", "start")
+
+    def __init__(self, request_id, route, sampled):
+        self.request_id = request_id
+        self.route = route
+        self.sampled = sampled
+        self.start = time.perf_counter()
+
+
+def parse_sample_rates(spec):
+    """Parse "route=rate,route=rate" into {route: rate}, ignoring malformed entries"""
+    rates = {}
+    for entry in (spec or '').split(','):
+        route, _, rate = entry.strip().rpartition('=')
+        try:
+            rates[route] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    rates.pop('', None)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    # Record attributes copied into the line when set
+    FIELDS = ("request_id", "route", "method", "path", "status", "duration_ms", "payload")
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """Hands records to a LogWriter instead of writing them on the calling thread.
+
+    Runs on the logging thread: it tags records with the current request's
+    ID and route, drops info records of requests that weren't sampled, and
+    interpolates the message (arguments may change once the call returns).
+    JSON encoding, traceback formatting and file I/O happen on the
+    writer's thread. When the queue is full, records are counted in
+    `dropped` rather than blocking the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def filter(self, record):
+        context = _request_context.get()
+        if context is not None:
+            if not context.sampled and record.levelno < logging.WARNING:
+                return False
+            record.request_id = context.request_id
+            record.route = context.route
+        return super().filter(record)
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= QUEUE_SIZE:
+            self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+class LogWriter:
+    """Background thread writing queued records to handlers in batches.
+
+    Instead of waking for every record (a thread switch per log call), the
+    writer sleeps WRITE_INTERVAL between batches and writes each batch to a
+    stream handler with a single write and flush.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handlers, interval=WRITE_INTERVAL):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write everything queued so far, then stop the thread"""
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            # Block while idle, then take whatever else is queued
+            records = [self.queue.get()]
+            while True:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Other threads may still log after stop() queued the marker
+            stopping = any(record is self._STOP for record in records)
+            records = [record for record in records if record is not self._STOP]
+            for handler in self.handlers:
+                self._write(handler, records)
+            if stopping:
+                return
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _write(handler, records):
+        records = [record for record in records if record.levelno >= handler.level and handler.filter(record)]
+        if not records:
+            return
+        if not isinstance(handler, logging.StreamHandler):
+            for record in records:
+                handler.handle(record)
+            return
+
+        lines = []
+        for record in records:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        handler.acquire()
+        try:
+            handler.stream.write(''.join(lines))
+            handler.flush()
+        except Exception:
+            handler.handleError(records[-1])
+        finally:
+            handler.release()
+
+
+_handler = None
+_writer = None
+
+
+def configure_logging(log_file=DEFAULT_LOG_FILE, level=DEFAULT_LOG_LEVEL, console=True):
+    """Send all logging through a queue to a background writer thread.
+
+    The log file gets JSON lines, the console the usual text format. Safe
+    to call more than once; later calls return the existing handler.
+    """
+    global _handler, _writer
+    if _handler is not None:
+        return _handler
+
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    _handler = RequestQueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_handler)
+
+    _writer = LogWriter(_handler.queue, handlers)
+    _writer.start()
+    atexit.register(stop_logging)
+    # A forked child (a gunicorn worker) has the queue but not the writer thread
+    os.register_at_fork(after_in_child=_restart_writer)
+    return _handler
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread"""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def _restart_writer():
+    global _writer
+    if _handler is None or _writer is None:
+        return
+    # Records the parent had queued are the parent's to write
+    _handler.queue = queue.SimpleQueue()
+    _writer = LogWriter(_handler.queue, _writer.handlers)
+    _writer.start()
+
+
+def init_app(app, sample_rates=None):
+    """Assign request IDs, sample info logs per route and log each request's duration.
+
+    sample_rates maps URL rules ("/api/card/<card_id>") to the fraction of
+    requests whose info records are kept; unlisted routes keep all of them.
+    Warnings, errors, server errors and slow requests are always logged.
+    """
+    rates = parse_sample_rates(DEFAULT_SAMPLE_RATES) if sample_rates is None else dict(sample_rates)
+
+    @app.before_request
+    def start_request_log():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        route = request.url_rule.rule if request.url_rule is not None else None
+        rate = rates.get(route, 1.0)
+        sampled = rate >= 1.0 or random.random() < rate
+        _request_context.set(RequestContext(request_id, route, sampled))
+
+    @app.after_request
+    def finish_request_log(response):
+        context = _request_context.get()
+        if context is None:
+            return response
+        duration_ms = round((time.perf_counter() - context.start) * 1000, 3)
+        level = logging.WARNING if response.status_code >= 500 or duration_ms >= SLOW_REQUEST_MS else logging.INFO
+        access_logger.log(level, "%s %s %s %.1fms", request.method, request.path, response.status_code, duration_ms,
+                          extra={"method": request.method, "path": request.path,
+                                 "status": response.status_code, "duration_ms": duration_ms})
+        response.headers[REQUEST_ID_HEADER] = context.request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_log(exc=None):
+        _request_context.set(None)
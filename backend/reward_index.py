@@ -0,0 +1,117 @@
+import heapq
+import numbers
+
+# Base reward rate for cards that don't list an "other" category
+DEFAULT_BASE_RATE = 1
+
+# Sources a recommendation's reward rate can come from
+SOURCE_CATEGORY = "category"
+SOURCE_QUARTERLY = "quarterly"
+SOURCE_BASE = "base"
+
+
+def _is_rate(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def card_base_rate(card):
+    """The card's rate on purchases outside its reward categories"""
+    base_rate = (card.get("categories") or {}).get("other", DEFAULT_BASE_RATE)
+    return base_rate if _is_rate(base_rate) else DEFAULT_BASE_RATE
+
+
+def card_category_rate(card, categories):
+    """The card's own best rate for a set of merchant categories, never below its base rate"""
+    rates = card.get("categories") or {}
+    best = card_base_rate(card)
+    for category in categories:
+        rate = rates.get(category)
+        if category != "other" and _is_rate(rate) and rate > best:
+            best = rate
+    return best
+
+
+class RewardIndex:
+    """Inverted index from reward category to cards, best rate first.
+
+    Built once per catalog snapshot. Every posting list holds
+    (-rate, card_position) tuples sorted ascending, i.e. highest rate first
+    and catalog order among equal rates, so a request only has to merge the
+    lists of its merchant categories with the base-rate list and the
+    rotating bonuses of the current period.
+    """
+
+    # Bump when the index layout changes, so persisted catalog snapshots are rebuilt
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.postings = {}
+        self.base_rates = []
+        self.base = []
+
+        for position, card in enumerate(cards):
+            categories = card.get("categories") or {}
+            for category, rate in categories.items():
+                if category != "other" and _is_rate(rate):
+                    self.postings.setdefault(category, []).append((-rate, position))
+
+            base_rate = card_base_rate(card)
+            self.base_rates.append(base_rate)
+            self.base.append((-base_rate, position))
+
+        for posting in self.postings.values():
+            posting.sort()
+        self.base.sort()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def _tagged(self, posting, priority, source, label):
+        # The priority breaks ties between lists for the same card and rate
+        for neg_rate, position in posting:
+            yield neg_rate, position, priority, source, label
+
+    def _sources(self, categories, bonuses):
+        """Posting lists for a request, in tie-break priority order"""
+        sources = []
+        requested = [category for category in dict.fromkeys(categories) if category != "other"]
+        for category in requested:
+            posting = self.postings.get(category)
+            if posting:
+                sources.append(self._tagged(posting, len(sources), SOURCE_CATEGORY, category))
+
+        # Rotating bonuses of the merchant categories active this period
+        for category in requested:
+            posting = bonuses.get(category)
+            if posting:
+                sources.append(self._tagged(posting, len(sources), SOURCE_QUARTERLY, category))
+
+        sources.append(self._tagged(self.base, len(sources), SOURCE_BASE, "other"))
+        return sources
+
+    def rank(self, categories, bonuses, limit=None, card_filter=None):
+        """Return the best cards as (position, rate, source, category) tuples.
+
+        `bonuses` maps categories to rotating-bonus posting lists, as in
+        BonusTable.postings.
+
+        Merges the request's posting lists lazily; the first time a card
+        comes out of the merge is its best rate, so the merge stops as soon
+        as `limit` distinct cards passed `card_filter`.
+        """
+        ranked = []
+        seen = set()
+        merged = heapq.merge(*self._sources(categories, bonuses))
+
+        for neg_rate, position, _, source, category in merged:
+            if position in seen:
+                continue
+            seen.add(position)
+            if card_filter and not card_filter(self.cards[position]):
+                continue
+            ranked.append((position, -neg_rate, source, category))
+            if limit is not None and len(ranked) >= limit:
+                break
+
+        return ranked
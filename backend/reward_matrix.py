@@ -0,0 +1,113 @@
+import numpy as np
+
+from reward_index import (
+    SOURCE_BASE,
+    SOURCE_CATEGORY,
+    SOURCE_QUARTERLY,
+    _is_rate,
+    card_base_rate
+)
+
+
+class RewardMatrix:
+    """Dense cards x categories reward-rate matrix for vectorized scoring.
+
+    Scores every card for a set of merchant categories with the same rules
+    and tie-breaking as RewardIndex.rank(): the best of the category rates
+    (in merchant-category order), the rotating bonuses and the base rate.
+    Missing categories are -inf so they never beat a card's base rate.
+    """
+
+    # Bump when the index layout changes, so persisted catalog snapshots are rebuilt
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.columns = {}
+        base_rates = []
+        entries = []
+
+        for position, card in enumerate(cards):
+            categories = card.get("categories") or {}
+            for category, rate in categories.items():
+                if category != "other" and _is_rate(rate):
+                    column = self.columns.setdefault(category, len(self.columns))
+                    entries.append((position, column, rate))
+
+            base_rates.append(card_base_rate(card))
+
+        self.rates = np.full((len(cards), len(self.columns)), -np.inf)
+        if entries:
+            positions, columns, rates = zip(*entries)
+            self.rates[list(positions), list(columns)] = rates
+        self.base_rates = base_rates
+        self.base = np.array(base_rates, dtype=float)
+
+        # Card attributes used by preference filters
+        self.issuers = np.array([card.get("issuer", "") for card in cards], dtype=object)
+        self.networks = np.array([card.get("network", "") for card in cards], dtype=object)
+        self.annual_fees = np.array([card.get("annual_fee", 0) for card in cards], dtype=float)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def score(self, categories, bonuses):
+        """Score all cards for a category set and the period's rotating bonuses.
+
+        Returns (rates, sources, order): the best rate of every card, the
+        (source, category) it came from, and card positions ranked by rate.
+        """
+        columns = []
+        labels = []
+        requested = [category for category in dict.fromkeys(categories) if category != "other"]
+        for category in requested:
+            if category in self.columns:
+                columns.append(self.rates[:, self.columns[category]])
+                labels.append((SOURCE_CATEGORY, category))
+
+        for category in requested:
+            posting = bonuses.get(category)
+            if posting:
+                bonus = np.full(len(self.cards), -np.inf)
+                neg_rates, positions = zip(*posting)
+                bonus[list(positions)] = [-neg_rate for neg_rate in neg_rates]
+                columns.append(bonus)
+                labels.append((SOURCE_QUARTERLY, category))
+
+        columns.append(self.base)
+        labels.append((SOURCE_BASE, "other"))
+
+        # argmax returns the first maximum, which follows the priority order above
+        stacked = np.column_stack(columns)
+        winners = stacked.argmax(axis=1)
+        rates = stacked[np.arange(len(self.cards)), winners]
+        order = np.argsort(-rates, kind="stable")
+        sources = [labels[winner] for winner in winners.tolist()]
+        return rates, sources, order
+
+    def card_rate(self, position, source, category):
+        """The card's rate as stored in the catalog, for building responses.
+
+        Rotating bonus rates live in the period's BonusTable, not here.
+        """
+        if source == SOURCE_CATEGORY:
+            return self.cards[position]["categories"][category]
+        return self.base_rates[position]
+
+    def preference_mask(self, user_preferences):
+        """Boolean mask of cards passing the user's preference filters, or None"""
+        if not user_preferences:
+            return None
+
+        mask = np.ones(len(self.cards), dtype=bool)
+        filtered = False
+        if user_preferences.get("preferred_issuers"):
+            mask &= np.isin(self.issuers, list(user_preferences["preferred_issuers"]))
+            filtered = True
+        if user_preferences.get("preferred_networks"):
+            mask &= np.isin(self.networks, list(user_preferences["preferred_networks"]))
+            filtered = True
+        if user_preferences.get("max_annual_fee") is not None:
+            mask &= self.annual_fees <= user_preferences["max_annual_fee"]
+            filtered = True
+        return mask if filtered else None
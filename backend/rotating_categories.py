@@ -0,0 +1,155 @@
+"""Dated rotating-category calendar and the bonus tables of its periods"""
+import bisect
+import json
+import logging
+import os
+from datetime import date, timedelta
+
+from reward_index import _is_rate
+
+logger = logging.getLogger('rotating-categories')
+
+# Bonus rate of a calendar entry that doesn't give one
+DEFAULT_BONUS_RATE = 5
+
+
+class RotatingBonus:
+    """One dated entry of the calendar: a card's bonus categories, rate and spend cap"""
+
+    __slots__ = ("start", "end", "categories", "rate", "spend_cap")
+
+    def __init__(self, start, end, categories, rate=DEFAULT_BONUS_RATE, spend_cap=None):
+        self.start = start
+        self.end = end
+        self.categories = categories
+        self.rate = rate
+        self.spend_cap = spend_cap
+
+    @classmethod
+    def from_json(cls, entry):
+        """Parse a calendar entry; raises ValueError when it is malformed"""
+        try:
+            start = date.fromisoformat(entry["start"])
+            end = date.fromisoformat(entry["end"])
+            categories = [str(category) for category in entry["categories"]]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid rotating category entry {entry!r}: {e}") from e
+        rate = entry.get("rate", DEFAULT_BONUS_RATE)
+        spend_cap = entry.get("spend_cap")
+        if end < start or not _is_rate(rate) or not (spend_cap is None or _is_rate(spend_cap)):
+            raise ValueError(f"Invalid rotating category entry {entry!r}")
+        return cls(start, end, categories, rate, spend_cap)
+
+    def to_json(self):
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "categories": list(self.categories),
+            "rate": self.rate,
+            "spend_cap": self.spend_cap
+        }
+
+
+class RotatingPeriod:
+    """A span of days in which the same calendar entries are active.
+
+    `start` is the first day and `end` the first day after the period; either
+    is None when the calendar has no boundary on that side.
+    """
+
+    def __init__(self, start, end, bonuses):
+        self.start = start
+        self.end = end
+        self.bonuses = bonuses
+
+    def __contains__(self, day):
+        return (self.start is None or self.start <= day) and (self.end is None or day < self.end)
+
+
+class RotatingCalendar:
+    """Rotating bonus categories per card ID, from rotating_categories.json.
+
+    The file maps each card ID to its dated entries:
+    {"chase-freedom-flex": [{"start": "2026-10-01", "end": "2026-12-31",
+    "categories": ["amazon", "walmart"], "rate": 5, "spend_cap": 1500}]}.
+    End dates are inclusive and a card's entries should not overlap; the
+    first entry covering a day wins.
+    """
+
+    def __init__(self, calendar=None):
+        self.entries = {}
+        boundaries = set()
+        for card_id, entries in (calendar or {}).items():
+            parsed = []
+            for entry in entries:
+                try:
+                    bonus = RotatingBonus.from_json(entry)
+                except ValueError as e:
+                    logger.error("Skipping rotating categories of %s: %s", card_id, e)
+                    continue
+                parsed.append(bonus)
+                boundaries.update((bonus.start, bonus.end + timedelta(days=1)))
+            if parsed:
+                self.entries[card_id] = sorted(parsed, key=lambda bonus: bonus.start)
+        self.boundaries = sorted(boundaries)
+
+    @classmethod
+    def load(cls, path):
+        """Load the calendar file; a missing or broken file gives an empty calendar"""
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    return cls(json.load(f))
+            except Exception as e:
+                logger.error("Error loading rotating categories: %s", e)
+        return cls()
+
+    def period_at(self, day):
+        """The period containing a day, with the entries active in it"""
+        i = bisect.bisect_right(self.boundaries, day)
+        start = self.boundaries[i - 1] if i > 0 else None
+        end = self.boundaries[i] if i < len(self.boundaries) else None
+
+        bonuses = {}
+        for card_id, entries in self.entries.items():
+            for bonus in entries:
+                if bonus.start <= day <= bonus.end:
+                    bonuses[card_id] = bonus
+                    break
+        return RotatingPeriod(start, end, bonuses)
+
+
+class BonusTable:
+    """Effective rotating bonuses of one period over one catalog snapshot.
+
+    Calendar card IDs are resolved to catalog positions once, when the
+    period starts or the catalog changes. `postings` maps each bonus
+    category to (-rate, card_position) tuples, best first, in the layout
+    RewardIndex and RewardMatrix merge with their own category rates.
+    `capped` counts the cards whose bonus has a spend cap.
+    """
+
+    def __init__(self, period, lookup, version=None):
+        self.period = period
+        self.version = version
+        self.bonuses = {}
+        self.postings = {}
+        self.capped = 0
+
+        for card_id, bonus in period.bonuses.items():
+            position = lookup.ids.get(card_id)
+            if position is None:
+                logger.debug("Rotating categories for unknown card %s", card_id)
+                continue
+            self.bonuses[position] = bonus
+            if bonus.spend_cap is not None:
+                self.capped += 1
+            for category in dict.fromkeys(bonus.categories):
+                self.postings.setdefault(category, []).append((-bonus.rate, position))
+
+        for posting in self.postings.values():
+            posting.sort()
+
+    def is_current(self, day, version):
+        """Whether the table still applies on a day to a catalog version"""
+        return day in self.period and version == self.version
@@ -0,0 +1,177 @@
+"""Production server: gunicorn workers forked from a preloaded master.
+
+    python serve.py [--bind 0.0.0.0:5001] [--workers 2] [--threads 1]
+
+The master imports the app, loads the card catalog, its indexes and the
+merchant tables once, then forks the workers, which share all of it
+copy-on-write. One worker at a time, whichever holds the refresh lock
+file, runs the card data refresh schedule; the others pick refreshed data
+up from the catalog snapshot file. Refreshes never run in the master: a
+worker forked while a refresh holds a catalog lock would inherit it locked.
+
+Counters and histograms from all processes are summed up at /metrics
+through prometheus_client's multiprocess mode (PROMETHEUS_MULTIPROC_DIR,
+a temporary directory unless set).
+
+`kill -HUP <master pid>` reloads the merchant tables and catalog in the
+master and gracefully replaces the workers; in-flight requests finish on
+the old ones. The development server (`python app.py`) is unchanged.
+"""
+import os
+import gc
+import fcntl
+import glob
+import atexit
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+
+from gunicorn.app.base import BaseApplication
+
+logger = logging.getLogger('swipe-serve')
+
+DEFAULT_BIND = os.environ.get('SWIPE_BIND', '0.0.0.0:5001')
+DEFAULT_WORKERS = int(os.environ.get('SWIPE_WORKERS', os.cpu_count() or 1))
+# Recommendations are CPU bound, so threads add no throughput under the GIL;
+# sync workers also finish every accepted connection when replaced on reload
+DEFAULT_THREADS = int(os.environ.get('SWIPE_THREADS', 1))
+# Seconds a worker may spend on one request, and to finish in-flight ones on reload
+DEFAULT_TIMEOUT = int(os.environ.get('SWIPE_WORKER_TIMEOUT', 30))
+GRACEFUL_TIMEOUT = 30
+# Directory where each process records its metrics for /metrics to sum up;
+# prometheus_client reads it when first imported, so it is set before the app loads
+METRICS_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+# Lock file in the data directory held by the worker that runs the refreshes
+REFRESH_LOCK_FILE = 'refresh.lock'
+
+# Open for as long as this worker holds the refresh lock
+_refresh_lock_file = None
+
+
+def _prepare_metrics_dir():
+    """Point prometheus_client at an empty per-server metrics directory"""
+    path = os.environ.get(METRICS_DIR_ENV)
+    if path:
+        # Counters of a previous run would otherwise be added to this one's
+        os.makedirs(path, exist_ok=True)
+        for stale in glob.glob(os.path.join(path, '*.db')):
+            os.remove(stale)
+        return path
+
+    path = tempfile.mkdtemp(prefix='swipe-metrics-')
+    os.environ[METRICS_DIR_ENV] = path
+    master_pid = os.getpid()
+    # Workers inherit atexit handlers; only the master removes the directory
+    atexit.register(lambda: os.getpid() == master_pid and shutil.rmtree(path, ignore_errors=True))
+    return path
+
+
+def _freeze_shared_state():
+    """Move everything loaded so far out of the garbage collector's reach.
+
+    Collections in a worker would otherwise touch (and so copy) every
+    page holding the preloaded catalog and indexes.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def _lead_refreshes(scraper, interval, retry_interval=None):
+    """Wait for the refresh lock, then keep card data fresh from this worker.
+
+    Besides the schedule, stale data is refreshed as in the development
+    server, retried every retry_interval while every source fails; this
+    thread checks that often, so retries don't wait for requests. The lock
+    is released when the worker exits, so a waiting worker takes over the
+    refreshes when the current one is replaced.
+    """
+    global _refresh_lock_file
+    # Imported here: the app's modules load after the metrics directory is set
+    from card_scraper import REFRESH_RETRY_INTERVAL
+    lock_file = open(os.path.join(scraper.data_dir, REFRESH_LOCK_FILE), 'a')
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    _refresh_lock_file = lock_file
+    logger.info("Worker %s runs the card data refreshes", os.getpid())
+    scraper.auto_refresh = True
+    scraper.start_refresh_scheduler(interval)
+    while True:
+        scraper.get_snapshot()
+        time.sleep(retry_interval or REFRESH_RETRY_INTERVAL)
+
+
+def post_fork(server, worker):
+    """Workers serve stale data as-is until one of them holds the refresh lock"""
+    import app as swipe_app
+    swipe_app.scraper.auto_refresh = False
+
+
+def post_worker_init(worker):
+    """Log which catalog each (re)started worker serves and compete for the refreshes"""
+    import app as swipe_app
+    snapshot = swipe_app.scraper.catalog.get_snapshot()
+    logger.info("Worker %s serving catalog version %s", worker.pid, snapshot.version)
+    threading.Thread(target=_lead_refreshes, args=(swipe_app.scraper, swipe_app.REFRESH_INTERVAL),
+                     name="card-refresh-leader", daemon=True).start()
+
+
+def on_reload(server):
+    """SIGHUP: reload data in the master so replacement workers inherit it"""
+    import app as swipe_app
+    logger.info("Reloading merchant tables and card catalog")
+    swipe_app.recommender.reload_merchant_data()
+    swipe_app.scraper.catalog.reload()
+    swipe_app.recommender.warm_up()
+    _freeze_shared_state()
+
+
+class SwipeServer(BaseApplication):
+    """gunicorn application serving app.app with preload_app"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app as swipe_app
+        snapshot = swipe_app.recommender.warm_up()
+        logger.info("Preloaded %s cards (catalog version %s)", len(snapshot), snapshot.version)
+        _freeze_shared_state()
+        return swipe_app.app
+
+
+def server_options(bind=DEFAULT_BIND, workers=DEFAULT_WORKERS, threads=DEFAULT_THREADS, timeout=DEFAULT_TIMEOUT):
+    return {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": True,
+        "timeout": timeout,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "on_reload": on_reload
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Swipe API on gunicorn")
+    parser.add_argument("--bind", default=DEFAULT_BIND, help="address to listen on (SWIPE_BIND)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes (SWIPE_WORKERS)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="threads per worker (SWIPE_THREADS)")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="request timeout (SWIPE_WORKER_TIMEOUT)")
+    args = parser.parse_args()
+
+    _prepare_metrics_dir()
+    SwipeServer(server_options(args.bind, args.workers, args.threads, args.timeout)).run()
+
+
+if __name__ == "__main__":
+    main()
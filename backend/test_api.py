@@ -2,7 +2,7 @@ import requests
 import json
 
 def test_health():
-    url = "http://localhost:5001/api/health"
+    url = "http://localhost:5001/ping"
     
     try:
         response = requests.get(url)
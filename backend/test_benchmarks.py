@@ -0,0 +1,34 @@
+from benchmarks import hot_paths
+
+
+def test_every_benchmark_runs_on_a_small_catalog():
+    results = hot_paths.run(sizes=(20, 40), merchants=30, min_time=0)
+
+    names = [result["benchmark"] for result in results]
+    # Classification doesn't depend on the catalog and runs once
+    assert names.count("classify") == 1 and names.count("search") == 2
+    assert set(names) == set(hot_paths.BENCHMARKS)
+    assert all(result["ops_per_sec"] > 0 and result["peak_kib"] >= 0 for result in results)
+    merge = next(result for result in results if result["benchmark"] == "merge_cards" and result["size"] == 40)
+    assert merge["ops_per_call"] == 40
+
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = {"results": [
+        {"benchmark": "search", "size": 100, "ops_per_sec": 1000, "peak_kib": 10},
+        {"benchmark": "merge_cards", "size": 100, "ops_per_sec": 1000, "peak_kib": 100},
+        {"benchmark": "parse_page", "size": 100, "ops_per_sec": 1000, "peak_kib": 100},
+    ]}
+    results = [
+        {"benchmark": "search", "size": 100, "ops_per_sec": 800, "peak_kib": 20},
+        {"benchmark": "merge_cards", "size": 100, "ops_per_sec": 500, "peak_kib": 100},
+        {"benchmark": "parse_page", "size": 100, "ops_per_sec": 1000, "peak_kib": 200},
+        {"benchmark": "recommend", "size": 100, "ops_per_sec": 1, "peak_kib": 1},
+    ]
+
+    regressions = hot_paths.compare(results, baseline, threshold=0.25)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("merge_cards (100): 500 ops/s")
+    assert regressions[1].startswith("parse_page (100): peak 200 KiB")
+    assert round(results[0]["speed_change"], 6) == -0.2 and "speed_change" not in results[3]
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import card_catalog
+from card_catalog import CardCatalog
+from card_identity import assign_card_ids
+from card_scraper import CardScraper
+
+
+def write_cards(path, cards):
+    with open(path, 'w') as f:
+        json.dump(cards, f)
+
+
+def make_cards(count, prefix="Card"):
+    return [{"name": f"{prefix} {i}", "issuer": "Test", "categories": {"other": 1}} for i in range(count)]
+
+
+def test_snapshot_is_loaded_once(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(3))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+
+    first = catalog.get_snapshot()
+    second = catalog.get_snapshot()
+
+    assert first is second
+    assert first.version == 1
+    assert [card["name"] for card in first.cards] == ["Card 0", "Card 1", "Card 2"]
+
+
+def test_reload_on_change_bumps_version(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(2))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    old = catalog.get_snapshot()
+
+    write_cards(cards_file, make_cards(5))
+    new = catalog.get_snapshot()
+
+    assert new.version == old.version + 1
+    assert len(new) == 5
+    # The old snapshot is untouched
+    assert len(old) == 2
+
+
+def test_touch_without_change_keeps_version(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(2))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    old = catalog.get_snapshot()
+
+    stat = os.stat(cards_file)
+    os.utime(cards_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert catalog.get_snapshot() is old
+
+
+def test_broken_file_keeps_last_good_snapshot(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(2))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    old = catalog.get_snapshot()
+
+    with open(cards_file, 'w') as f:
+        f.write('[{"name": ')
+
+    assert catalog.get_snapshot() is old
+
+
+def test_missing_file_uses_fallback(tmp_path):
+    catalog = CardCatalog(str(tmp_path / 'missing.json'), fallback=lambda: make_cards(1, "Default"))
+
+    snapshot = catalog.get_snapshot()
+
+    assert snapshot.source == 'default'
+    assert snapshot.cards[0]["name"] == "Default 0"
+    # Cursors and ETags derive from the checksum, the same in every process
+    other = CardCatalog(str(tmp_path / 'missing.json'), fallback=lambda: make_cards(1, "Default"))
+    assert snapshot.checksum and other.get_snapshot().checksum == snapshot.checksum
+
+
+def test_indexes_are_built_per_snapshot(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(2))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    catalog.register_index('names', lambda cards: {card["name"] for card in cards})
+
+    assert catalog.index('names') == {"Card 0", "Card 1"}
+    catalog.save(make_cards(1, "New"))
+    assert catalog.index('names') == {"New 0"}
+
+
+def test_concurrent_readers_never_see_partial_lists(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(50, "A"))
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    errors = []
+
+    def reader():
+        for _ in range(200):
+            snapshot = catalog.get_snapshot()
+            prefixes = {card["name"].split()[0] for card in snapshot.cards}
+            if len(snapshot) != 50 or len(prefixes) != 1:
+                errors.append((len(snapshot), prefixes))
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(20):
+        catalog.save(make_cards(50, "B" if i % 2 else "A"))
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+
+def test_scraper_instances_share_catalog(tmp_path):
+    write_cards(tmp_path / 'credit_cards.json', make_cards(2))
+    with open(tmp_path / 'last_updated.txt', 'w') as f:
+        f.write(datetime.now().isoformat())
+
+    first = CardScraper(str(tmp_path))
+    second = CardScraper(str(tmp_path))
+
+    assert first.catalog is second.catalog
+    assert first.get_snapshot() is second.get_snapshot()
+    assert not first.is_data_stale()
+
+
+class CountingIndex:
+    """Index builder that records how often it ran"""
+
+    SNAPSHOT_VERSION = 1
+    builds = 0
+
+    def __init__(self, cards):
+        type(self).builds += 1
+        self.names = [card["name"] for card in cards]
+
+
+def test_save_writes_snapshot_and_json_export(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+
+    catalog.save(make_cards(3))
+
+    assert json.loads(cards_file.read_text()) == make_cards(3)
+    assert (tmp_path / 'credit_cards.snapshot').read_bytes().startswith(b'SWIPECAT')
+    assert sorted(os.listdir(tmp_path)) == ['credit_cards.json', 'credit_cards.snapshot']
+
+
+def test_saved_files_keep_their_mode(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    write_cards(cards_file, make_cards(1))
+    os.chmod(cards_file, 0o664)
+
+    CardCatalog(str(cards_file), check_interval=0).save(make_cards(2))
+
+    assert cards_file.stat().st_mode & 0o777 == 0o664
+    # New files get the umask default
+    assert (tmp_path / 'credit_cards.snapshot').stat().st_mode & 0o777 == 0o666 & ~card_catalog._UMASK
+
+
+def test_restart_restores_snapshot_and_indexes(tmp_path, monkeypatch):
+    cards_file = str(tmp_path / 'credit_cards.json')
+    catalog = CardCatalog(cards_file, check_interval=0)
+    catalog.register_index('names', CountingIndex)
+    catalog.save(make_cards(3))
+    monkeypatch.setattr(CountingIndex, 'builds', 0)
+
+    restarted = CardCatalog(cards_file, check_interval=0)
+    restarted.register_index('names', CountingIndex)
+    monkeypatch.setattr(json, 'loads', None)
+
+    assert restarted.index('names').names == ["Card 0", "Card 1", "Card 2"]
+    assert CountingIndex.builds == 0
+    assert restarted.get_snapshot().checksum == catalog.get_snapshot().checksum
+
+
+def test_changed_index_layout_is_rebuilt(tmp_path, monkeypatch):
+    cards_file = str(tmp_path / 'credit_cards.json')
+    catalog = CardCatalog(cards_file, check_interval=0)
+    catalog.register_index('names', CountingIndex)
+    catalog.save(make_cards(2))
+    monkeypatch.setattr(CountingIndex, 'SNAPSHOT_VERSION', 2)
+    monkeypatch.setattr(CountingIndex, 'builds', 0)
+
+    restarted = CardCatalog(cards_file, check_interval=0)
+    restarted.register_index('names', CountingIndex)
+
+    assert restarted.index('names').names == ["Card 0", "Card 1"]
+    assert CountingIndex.builds == 1
+
+
+def test_hand_edited_json_is_imported(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    catalog = CardCatalog(str(cards_file), check_interval=0)
+    catalog.save(make_cards(2))
+
+    saved = (tmp_path / 'credit_cards.snapshot').read_bytes()
+    write_cards(cards_file, make_cards(4, "Edited"))
+    snapshot = catalog.get_snapshot()
+
+    assert [card["name"] for card in snapshot.cards][-1] == "Edited 3"
+    # Only save() writes the snapshot, a restart imports the edit again
+    assert (tmp_path / 'credit_cards.snapshot').read_bytes() == saved
+    restarted = CardCatalog(str(cards_file), check_interval=0)
+    assert restarted.get_snapshot().checksum == snapshot.checksum
+
+
+def test_cards_are_prepared_on_save_and_import(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    catalog = CardCatalog(str(cards_file), check_interval=0, prepare=assign_card_ids)
+    catalog.register_index('names', CountingIndex)
+
+    catalog.save(make_cards(2))
+    assert [card["id"] for card in json.loads(cards_file.read_text())] == ["test-card-0", "test-card-1"]
+
+    write_cards(cards_file, make_cards(3, "Edited"))
+    snapshot = catalog.get_snapshot()
+    assert [card["id"] for card in snapshot.cards] == ["test-edited-0", "test-edited-1", "test-edited-2"]
+    assert snapshot.get_index('names').names == ["Edited 0", "Edited 1", "Edited 2"]
+
+
+def test_corrupt_snapshot_falls_back_to_json(tmp_path):
+    cards_file = tmp_path / 'credit_cards.json'
+    CardCatalog(str(cards_file), check_interval=0).save(make_cards(2))
+    (tmp_path / 'credit_cards.snapshot').write_bytes(b'SWIPECAT\x00\x01garbage')
+
+    snapshot = CardCatalog(str(cards_file), check_interval=0).get_snapshot()
+
+    assert snapshot.source == 'file'
+    assert len(snapshot) == 2
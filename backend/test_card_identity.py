@@ -0,0 +1,155 @@
+import time
+
+import pytest
+
+from card_identity import (CardLookup, DuplicateIndex, MATCH_CANONICAL, MATCH_NEAR, assign_card_ids, canonical_issuer,
+                           canonical_key)
+from card_scraper import CardScraper
+
+
+@pytest.mark.parametrize("issuer, canonical", [
+    ("AMERICAN_EXPRESS", "amex"),
+    ("American Express", "amex"),
+    ("Chase", "chase"),
+    ("U.S. Bank", "us bank"),
+    ("US_BANK", "us bank"),
+    ("Unknown Issuer", ""),
+    ("FNBO", "fnbo")
+])
+def test_issuer_aliases(issuer, canonical):
+    assert canonical_issuer(issuer) == canonical
+
+
+@pytest.mark.parametrize("first, second", [
+    (("Blue Cash Preferred® Card from American Express", "American Express"),
+     ("American Express Blue Cash Preferred", "AMERICAN_EXPRESS")),
+    (("Citi® Double Cash Card", "Citi"), ("Double Cash", "CITI")),
+    (("Costco Anywhere Visa® Card by Citi", "Citi"), ("Costco Anywhere Visa", "Citi")),
+    (("Chase Freedom Unlimited®", "Chase"), ("Freedom Unlimited", "CHASE")),
+    (("Lowe's Advantage Card", "Synchrony"), ("Lowes Advantage", "SYNCHRONY"))
+])
+def test_spellings_share_a_canonical_key(first, second):
+    assert canonical_key({"name": first[0], "issuer": first[1]}) == \
+        canonical_key({"name": second[0], "issuer": second[1]})
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Platinum", "Platinum (Schwab)"),
+    ("Hilton Honors", "Hilton Honors Business"),
+    ("Blue Business Cash", "Blue Business Plus"),
+    ("Sapphire Preferred", "Sapphire Reserve"),
+    ("Venture 1", "Venture 2")
+])
+def test_different_cards_are_not_duplicates(first, second):
+    index = DuplicateIndex()
+    index.add({"name": first, "issuer": "AMERICAN_EXPRESS"}, 0)
+
+    assert index.find({"name": second, "issuer": "American Express"}) is None
+
+
+def test_near_duplicates_within_a_block():
+    index = DuplicateIndex()
+    index.add({"name": "Sapphire Preferred", "issuer": "Chase"}, 0)
+    index.add({"name": "Hilton Honors Surpass", "issuer": "AMERICAN_EXPRESS"}, 1)
+
+    assert index.find({"name": "Chase Sapphire Prefered", "issuer": "CHASE"}) == (0, MATCH_NEAR)
+    assert index.find({"name": "Hilton Honors Surpass Card", "issuer": "Amex"}) == (1, MATCH_CANONICAL)
+    # Same spelling from another issuer is another card
+    assert index.find({"name": "Sapphire Prefered", "issuer": "Citi"}) is None
+
+
+def test_unknown_issuer_matches_only_unambiguous_names():
+    index = DuplicateIndex()
+    index.add({"name": "Double Cash", "issuer": "CITI"}, 0)
+    index.add({"name": "Gold", "issuer": "AMERICAN_EXPRESS"}, 1)
+    index.add({"name": "Gold", "issuer": "US_BANK"}, 2)
+
+    assert index.find({"name": "Double Cash Card", "issuer": "Unknown Issuer"}) == (0, MATCH_CANONICAL)
+    assert index.find({"name": "Gold", "issuer": ""}) is None
+
+
+def test_generated_ids_are_unique_and_existing_ones_kept():
+    cards = [
+        {"name": "American Express® Gold Card", "issuer": "AMERICAN_EXPRESS"},
+        {"id": "amex-gold", "name": "Gold", "issuer": "US_BANK"},
+        {"name": "Gold Card", "issuer": "American Express"},
+        {"name": "Apple Card", "issuer": "Unknown Issuer"}
+    ]
+
+    assigned = assign_card_ids(cards)
+
+    assert [card["id"] for card in assigned] == ["amex-gold-2", "amex-gold", "amex-gold-3", "apple"]
+    assert "id" not in cards[0] and assigned[1] is cards[1]
+    assert assign_card_ids(assigned) is assigned
+
+
+def test_lookup_by_id_name_and_alias():
+    lookup = CardLookup(assign_card_ids([
+        {"name": "American Express® Gold Card", "issuer": "AMERICAN_EXPRESS", "aliases": ["AmEx Gold Rewards"]},
+        {"name": "Gold", "issuer": "US_BANK"},
+        {"name": "Sapphire Preferred", "issuer": "CHASE"}
+    ]))
+
+    assert lookup.find("amex-gold") == 0 and lookup.find("us-bank-gold") == 1
+    assert lookup.find("american express® gold card") == 0
+    for alias in ("Amex Gold", "American Express Gold", "Amex Gold Card", "amex gold rewards"):
+        assert lookup.find(alias) == 0, alias
+    assert lookup.find("Chase Sapphire Preferred Card") == lookup.find("Sapphire Preferred") == 2
+    # "Gold" is the US Bank card's name; the canonical name alone is ambiguous
+    assert lookup.find("gold") == 1
+    assert lookup.find("Platinum") is None
+
+
+def test_merge_reports_added_updated_and_merged(data_dir):
+    scraper = CardScraper(data_dir)
+    existing = [
+        {"name": "Chase Sapphire Preferred", "issuer": "Chase", "annual_fee": 95},
+        {"name": "Sapphire Preferred", "issuer": "CHASE", "url": "https://chase.example"},
+        {"name": "Double Cash", "issuer": "CITI", "annual_fee": 0}
+    ]
+    incoming = [
+        {"name": "Citi® Double Cash Card", "issuer": "Citi", "annual_fee": 0},
+        {"name": "Double Cash", "issuer": "CITI", "intro_offer": "$200 bonus"},
+        {"name": "Custom Cash", "issuer": "CITI"}
+    ]
+
+    stats = scraper._merge_cards(existing, incoming)
+
+    assert [card["name"] for card in existing] == ["Chase Sapphire Preferred", "Double Cash", "Custom Cash"]
+    # The folded duplicate only fills fields the kept card was missing
+    assert existing[0] == {"name": "Chase Sapphire Preferred", "issuer": "Chase", "annual_fee": 95,
+                           "url": "https://chase.example"}
+    assert existing[1]["intro_offer"] == "$200 bonus"
+    assert stats == {"received": 3, "added": 1, "updated": 1, "merged": 2, "changed": 3}
+
+
+def test_merge_keeps_stored_ids(data_dir):
+    scraper = CardScraper(data_dir)
+    cards = [{"id": "citi-double-cash", "name": "Double Cash", "issuer": "CITI"}]
+
+    scraper._merge_cards(cards, [{"id": "12345", "name": "Citi Double Cash Card", "issuer": "Citi", "annual_fee": 95}])
+
+    assert cards == [{"id": "citi-double-cash", "name": "Double Cash", "issuer": "CITI", "annual_fee": 95}]
+
+
+def test_merge_does_not_touch_snapshot_cards(data_dir):
+    scraper = CardScraper(data_dir)
+    shared = {"name": "Double Cash", "issuer": "CITI", "annual_fee": 0}
+    cards = [shared]
+
+    scraper._merge_cards(cards, [{"name": "Double Cash", "issuer": "CITI", "annual_fee": 95}])
+
+    assert cards[0]["annual_fee"] == 95
+    assert shared["annual_fee"] == 0
+
+
+def test_merge_scales_linearly(data_dir):
+    scraper = CardScraper(data_dir)
+    existing = [{"name": f"Rewards {i}", "issuer": "CHASE"} for i in range(20000)]
+    incoming = [{"name": f"Chase Rewards {i} Card", "issuer": "Chase", "annual_fee": 95} for i in range(20000)]
+
+    start = time.perf_counter()
+    stats = scraper._merge_cards(existing, incoming)
+
+    assert time.perf_counter() - start < 5
+    assert stats["merged"] == 20000 and stats["added"] == 0
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import card_listing
+from card_listing import StaleCursor, decode_cursor, encode_cursor, iter_json, iter_ndjson, parse_fields
+
+CARDS = [{"name": f"Card {i}", "issuer": "Chase", "benefits": ["Lounge access"]} for i in range(250)]
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None and parse_fields(" , ") is None
+    assert parse_fields("name, issuer,") == ("name", "issuer")
+    with pytest.raises(ValueError):
+        parse_fields("name,card[0]")
+
+
+def test_cursor_round_trip_and_catalog_changes():
+    checksum = "3f786850e387550fdab836ed7e6dc881de23001b"
+
+    assert decode_cursor(encode_cursor(checksum, 200), checksum) == 200
+    # Another worker or a restarted server serving the same catalog accepts it
+    assert encode_cursor(checksum, 200) == "3f786850e387550f.200"
+    with pytest.raises(StaleCursor):
+        decode_cursor(encode_cursor(checksum, 200), "89e6c98d92887913cadf06b2adb97f26cde4849b")
+    with pytest.raises(ValueError):
+        decode_cursor("3f786850e387550f.-1", checksum)
+
+
+def test_streamed_json_matches_a_single_document():
+    chunks = list(iter_json(CARDS, ("name", "missing"), next_cursor=None))
+
+    # One chunk per batch of cards, plus the closing one
+    assert len(chunks) == 1 + len(CARDS) // card_listing.STREAM_BATCH_SIZE + 1
+    document = json.loads("".join(chunks))
+    assert document == {"cards": [{"name": card["name"]} for card in CARDS], "next_cursor": None}
+    assert json.loads("".join(iter_json([]))) == {"cards": []}
+
+
+def test_ndjson_has_one_card_per_line():
+    lines = "".join(iter_ndjson(CARDS[:3])).splitlines()
+
+    assert [json.loads(line) for line in lines] == CARDS[:3]
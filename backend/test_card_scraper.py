@@ -0,0 +1,367 @@
+import os
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from card_scraper import CardScraper
+from fixture_server import FixtureServer, load_fixture
+from http_fetcher import SourceFetcher
+
+
+def json_route(name):
+    return 200, {"Content-Type": "application/json"}, load_fixture(name)
+
+
+def html_route(name):
+    return 200, {"Content-Type": "text/html; charset=utf-8"}, load_fixture(name)
+
+
+@pytest.fixture
+def server():
+    with FixtureServer({
+        "/github.json": json_route("github_cards.json"),
+        "/nerdwallet.html": html_route("nerdwallet.html")
+    }) as server:
+        yield server
+
+
+def point_at(scraper, server, **urls):
+    for source in scraper.sources:
+        source["url"] = server.url(urls.get(source["name"], f"/{source['name']}"))
+
+
+def test_refresh_from_local_sources(data_dir, server):
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/github.json", nerdwallet="/nerdwallet.html")
+
+    cards = scraper.fetch_card_data()
+    names = {card["name"] for card in cards}
+
+    assert {"Blue Business Cash", "Chase Sapphire Preferred", "Capital One Savor Cash Rewards"} <= names
+    # Cards already known under another name are merged, not duplicated
+    assert not {"Sapphire Preferred", "Double Cash", "Chase Freedom Unlimited®"} & names
+    assert scraper.catalog.get_snapshot().cards == tuple(cards)
+    report = scraper.last_fetch_report
+    assert report["github"]["status"] == 200 and report["github"]["cards"] == 3
+    assert (report["github"]["added"], report["github"]["merged"]) == (1, 2)
+    assert report["nerdwallet"]["cards"] == 3
+    assert (report["nerdwallet"]["added"], report["nerdwallet"]["merged"]) == (1, 2)
+    assert report["nerdwallet"]["fetch_seconds"] >= 0
+
+
+def test_sources_are_fetched_concurrently(data_dir, server):
+    def slow(handler):
+        time.sleep(0.5)
+        return json_route("github_cards.json")
+
+    server.routes["/slow-a"] = slow
+    server.routes["/slow-b"] = slow
+    fetcher = SourceFetcher(per_host_limit=4)
+
+    start = time.perf_counter()
+    results = list(fetcher.fetch_all([("a", server.url("/slow-a"), None), ("b", server.url("/slow-b"), None)]))
+
+    assert time.perf_counter() - start < 0.9
+    assert all(result.ok for result in results)
+
+
+def test_per_host_limit_serializes_requests(server):
+    def slow(handler):
+        time.sleep(0.2)
+        return 200, {}, b"ok"
+
+    server.routes["/slow"] = slow
+    fetcher = SourceFetcher(per_host_limit=1)
+
+    start = time.perf_counter()
+    list(fetcher.fetch_all([(str(i), server.url("/slow"), None) for i in range(3)]))
+
+    assert time.perf_counter() - start >= 0.6
+
+
+def test_retries_with_backoff(server):
+    calls = []
+
+    def flaky(handler):
+        calls.append(1)
+        if len(calls) < 3:
+            return 503, {}, b"busy"
+        return 200, {}, b"[]"
+
+    server.routes["/flaky"] = flaky
+    fetcher = SourceFetcher(backoff_factor=0.01)
+
+    result = fetcher.fetch("flaky", server.url("/flaky"))
+
+    assert result.ok
+    assert result.attempts == 3
+
+
+def test_timeout_does_not_block_other_sources(data_dir, server):
+    def hang(handler):
+        time.sleep(1.5)
+        return json_route("github_cards.json")
+
+    server.routes["/hang"] = hang
+    scraper = CardScraper(data_dir)
+    scraper.fetcher = SourceFetcher(timeout=(1, 0.3), retries=0)
+    point_at(scraper, server, github="/hang", nerdwallet="/nerdwallet.html")
+
+    scraper.fetch_card_data()
+
+    assert scraper.last_fetch_report["github"]["error"]
+    assert scraper.last_fetch_report["nerdwallet"]["cards"] == 3
+
+
+def test_failed_source_keeps_existing_cards(data_dir, server):
+    scraper = CardScraper(data_dir)
+    before = len(scraper.catalog.get_cards())
+    point_at(scraper, server)
+
+    cards = scraper.fetch_card_data()
+
+    assert len(cards) == before
+    assert scraper.last_fetch_report["github"]["status"] == 404
+
+
+def stale(data_dir):
+    with open(os.path.join(data_dir, 'last_updated.txt'), 'w') as f:
+        f.write((datetime.now() - timedelta(days=2)).isoformat())
+
+
+def test_failed_refresh_leaves_data_stale(data_dir, server):
+    stale(data_dir)
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server)
+
+    scraper.fetch_card_data()
+
+    assert {report["outcome"] for report in scraper.last_fetch_report.values()} == {"fetch_failed"}
+    assert scraper.is_data_stale()
+    # A source that answered keeps marking the data fresh
+    point_at(scraper, server, github="/github.json")
+    scraper.fetch_card_data()
+    assert not scraper.is_data_stale()
+
+
+def test_stale_data_is_served_while_refreshing(data_dir, server):
+    release = threading.Event()
+
+    def blocked(handler):
+        release.wait(5)
+        return json_route("github_cards.json")
+
+    server.routes["/blocked"] = blocked
+    stale(data_dir)
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/blocked", nerdwallet="/nerdwallet.html")
+    before = scraper.catalog.get_snapshot()
+
+    start = time.perf_counter()
+    snapshot = scraper.get_snapshot()
+
+    assert time.perf_counter() - start < 0.5
+    assert snapshot is before
+    assert scraper.is_refreshing
+
+    release.set()
+    scraper._refresh_thread.join(5)
+    assert not scraper.is_refreshing
+    assert not scraper.is_data_stale()
+    assert scraper.catalog.get_snapshot().version > before.version
+
+
+def test_refresh_is_single_flight(data_dir, server):
+    release = threading.Event()
+
+    def blocked(handler):
+        release.wait(5)
+        return json_route("github_cards.json")
+
+    server.routes["/blocked"] = blocked
+    first = CardScraper(data_dir)
+    second = CardScraper(data_dir)
+    for scraper in (first, second):
+        point_at(scraper, server, github="/blocked", nerdwallet="/nerdwallet.html")
+
+    started = [first.refresh_async(), second.refresh_async(), first.refresh_async()]
+    release.set()
+    first._refresh_thread.join(5)
+
+    assert started == [True, False, False]
+    assert server.hits("/blocked") == 1
+
+
+def test_refresh_scheduler(data_dir, server):
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/github.json", nerdwallet="/nerdwallet.html")
+
+    assert scraper.start_refresh_scheduler(0.05)
+    deadline = time.time() + 5
+    while server.hits("/github.json") < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    scraper.stop_refresh_scheduler()
+
+    assert server.hits("/github.json") >= 2
+
+
+def etag_route(name, etag):
+    def route(handler):
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        status, headers, body = json_route(name)
+        return status, dict(headers, ETag=etag), body
+    return route
+
+
+def test_not_modified_sources_keep_catalog_version(data_dir, server):
+    server.routes["/github.json"] = etag_route("github_cards.json", '"v1"')
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/github.json", nerdwallet="/nerdwallet.html")
+
+    scraper.fetch_card_data()
+    version = scraper.catalog.version
+    scraper.fetch_card_data()
+
+    github_requests = [headers for path, headers in server.requests if path == "/github.json"]
+    assert github_requests[-1].get("If-None-Match") == '"v1"'
+    assert scraper.last_fetch_report["github"]["status"] == 304
+    # NerdWallet sends no validators, but the body hash is unchanged
+    assert scraper.last_fetch_report["nerdwallet"]["changed"] is False
+    assert scraper.catalog.version == version
+    assert not scraper.is_data_stale()
+
+
+def test_changed_content_is_merged(data_dir, server):
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/github.json", nerdwallet="/nerdwallet.html")
+    scraper.fetch_card_data()
+    version = scraper.catalog.version
+
+    body = load_fixture("github_cards.json").replace(b"Double Cash", b"Custom Cash")
+    server.routes["/github.json"] = (200, {"Content-Type": "application/json"}, body)
+    cards = scraper.fetch_card_data()
+
+    assert scraper.last_fetch_report["github"]["changed"] is True
+    assert scraper.last_fetch_report["nerdwallet"]["changed"] is False
+    assert scraper.catalog.version > version
+    assert "Custom Cash" in {card["name"] for card in cards}
+
+
+def test_validators_ignored_for_new_source_url(data_dir, server):
+    server.routes["/github.json"] = etag_route("github_cards.json", '"v1"')
+    server.routes["/github-mirror.json"] = etag_route("github_cards.json", '"v1"')
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/github.json", nerdwallet="/nerdwallet.html")
+    scraper.fetch_card_data()
+
+    point_at(scraper, server, github="/github-mirror.json", nerdwallet="/nerdwallet.html")
+    scraper.fetch_card_data()
+
+    mirror_headers = [headers for path, headers in server.requests if path == "/github-mirror.json"]
+    assert "If-None-Match" not in mirror_headers[0]
+    assert scraper.last_fetch_report["github"]["status"] == 200
+
+
+def feed(count):
+    records = [{"id": f"card-{i}", "name": f"Feed Card {i}", "issuer": "CHASE", "annualFee": "$95",
+                "bonus": {"text": f"{i},000 points after you spend $4,000"}, "link": f"https://example.com/{i}"}
+               for i in range(count)]
+    return json.dumps(records).encode("utf-8")
+
+
+def test_streamed_feed_matches_buffered_parse(data_dir, server):
+    body = feed(2000)
+    server.routes["/feed.json"] = (200, {"Content-Type": "application/json"}, body)
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/feed.json", nerdwallet="/nerdwallet.html")
+
+    cards = scraper.fetch_card_data()
+
+    report = scraper.last_fetch_report["github"]
+    assert report["cards"] == 2000 and report["added"] == 2000
+    assert report["bytes"] == len(body)
+    # Stored cards also carry the ID the catalog assigned them
+    streamed = [{key: value for key, value in card.items() if key != "id"}
+                for card in cards if card["name"].startswith("Feed Card")]
+    assert streamed == scraper._parse_github_cards(body.decode("utf-8"))
+
+
+def test_unchanged_stream_keeps_catalog_version(data_dir, server):
+    server.routes["/feed.json"] = (200, {"Content-Type": "application/json"}, feed(50))
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/feed.json", nerdwallet="/nerdwallet.html")
+    scraper.fetch_card_data()
+    version = scraper.catalog.version
+
+    scraper.fetch_card_data()
+
+    assert scraper.last_fetch_report["github"]["changed"] is False
+    assert scraper.last_fetch_report["github"]["updated"] == 0
+    assert scraper.catalog.version == version
+
+
+def test_truncated_stream_is_read_again_next_refresh(data_dir, server):
+    body = feed(100)
+    server.routes["/feed.json"] = (200, {"Content-Type": "application/json"}, body[:len(body) // 2])
+    scraper = CardScraper(data_dir)
+    point_at(scraper, server, github="/feed.json", nerdwallet="/nerdwallet.html")
+
+    scraper.fetch_card_data()
+
+    report = scraper.last_fetch_report["github"]
+    assert report["error"] and 0 < report["cards"] < 100
+    # Cards before the cut are kept, but the source isn't marked as ingested
+    assert "github" not in json.load(open(scraper.source_state_file))
+
+    server.routes["/feed.json"] = (200, {"Content-Type": "application/json"}, body)
+    scraper.fetch_card_data()
+    assert scraper.last_fetch_report["github"]["cards"] == 100
+
+
+def listing_page(page, next_href=None):
+    html = load_fixture("nerdwallet.html").decode("utf-8").replace("</h3>", f" (page {page})</h3>")
+    if next_href:
+        html = html.replace("</section>", f'</section><a rel="next" href="{next_href}">Next</a>')
+    return 200, {"Content-Type": "text/html; charset=utf-8"}, html.encode("utf-8")
+
+
+def test_paginated_listing_is_followed(data_dir, server):
+    server.routes["/list"] = lambda handler: listing_page(2) if "page=2" in handler.path else listing_page(1, "/list?page=2")
+    scraper = CardScraper(data_dir, parse_workers=2)
+    point_at(scraper, server, github="/github.json", nerdwallet="/list")
+
+    cards = scraper.fetch_card_data()
+
+    report = scraper.last_fetch_report["nerdwallet"]
+    assert report["pages"] == 2 and report["cards"] == 6
+    names = {card["name"] for card in cards}
+    assert "Capital One Savor Cash Rewards (page 1)" in names
+    assert "Capital One Savor Cash Rewards (page 2)" in names
+
+
+def test_pagination_stops_at_max_pages(data_dir, server, monkeypatch):
+    server.routes["/loop"] = listing_page(1, "/loop")
+    scraper = CardScraper(data_dir, parse_workers=0)
+    monkeypatch.setattr(scraper.sources[1]["spec"], "max_pages", 3)
+    point_at(scraper, server, github="/github.json", nerdwallet="/loop")
+
+    scraper.fetch_card_data()
+
+    assert scraper.last_fetch_report["nerdwallet"]["pages"] == 3
+    assert server.hits("/loop") == 3
+
+
+def test_failed_follow_up_page_keeps_source_state(data_dir, server):
+    server.routes["/list"] = listing_page(1, "/missing")
+    scraper = CardScraper(data_dir, parse_workers=0)
+    point_at(scraper, server, github="/github.json", nerdwallet="/list")
+
+    scraper.fetch_card_data()
+
+    report = scraper.last_fetch_report["nerdwallet"]
+    assert "404" in report["error"] and report["cards"] == 3
+    assert "nerdwallet" not in json.load(open(scraper.source_state_file))
@@ -0,0 +1,107 @@
+import pickle
+import random
+
+from card_search import SearchIndex, tokenize
+
+CARDS = [
+    {"name": "Chase Sapphire Preferred", "issuer": "Chase", "network": "Visa", "annual_fee": 95,
+     "categories": {"travel": 2, "dining": 3, "other": 1}, "benefits": ["Trip insurance"]},
+    {"name": "Chase Freedom Unlimited", "issuer": "Chase", "network": "Visa", "annual_fee": 0,
+     "categories": {"dining": 3, "other": 1.5}},
+    {"name": "American Express Gold", "issuer": "American Express", "network": "Amex", "annual_fee": 250,
+     "categories": {"dining": 4, "groceries": 4, "other": 1}},
+    {"name": "Citi Double Cash", "issuer": "Citi", "network": "Mastercard", "annual_fee": 0,
+     "categories": {"other": 2}},
+    {"name": "Café Rewards", "issuer": "Bank of Example", "network": "Visa",
+     "categories": {"online_shopping": 5}},
+]
+
+
+def names(index, query, **kwargs):
+    _, page = index.search(query, **kwargs)
+    return [index.cards[position]["name"] for position, _ in page]
+
+
+def test_tokenize_drops_accents_and_punctuation():
+    assert tokenize("Café-Rewards, 5% back!") == ["cafe", "rewards", "5", "back"]
+
+
+def test_exact_prefix_and_infix_matches_are_ranked():
+    index = SearchIndex(CARDS)
+
+    assert names(index, "chase") == ["Chase Sapphire Preferred", "Chase Freedom Unlimited"]
+    assert names(index, "sapph") == ["Chase Sapphire Preferred"]
+    assert names(index, "press") == ["American Express Gold"]
+    # A name match outranks a benefit match, an exact word a prefix
+    assert names(index, "trip") == ["Chase Sapphire Preferred"]
+    assert names(index, "cafe") == names(index, "café") == ["Café Rewards"]
+    assert names(index, "online shop") == ["Café Rewards"]
+    assert names(index, "no such card") == []
+
+
+def test_every_query_word_must_match():
+    index = SearchIndex(CARDS)
+
+    assert names(index, "chase free") == ["Chase Freedom Unlimited"]
+    assert names(index, "visa rewards") == ["Café Rewards"]
+
+
+def test_paging_keeps_the_total_count():
+    index = SearchIndex(CARDS)
+
+    count, page = index.search("visa", limit=2, offset=1)
+    assert count == 3
+    assert [position for position, _ in page] == [1, 4]
+
+
+def test_filters():
+    index = SearchIndex(CARDS)
+
+    assert names(index, "chase", category="travel") == ["Chase Sapphire Preferred"]
+    assert names(index, "", category="dining", min_rate=3) == [
+        "American Express Gold", "Chase Sapphire Preferred", "Chase Freedom Unlimited"]
+    assert names(index, "", min_rate=4) == ["American Express Gold", "Café Rewards"]
+    assert names(index, "", issuer="chase", max_annual_fee=0) == ["Chase Freedom Unlimited"]
+    assert names(index, "c", network="mastercard") == ["Citi Double Cash"]
+    assert index.search("", category="dining", min_rate=10) == (0, [])
+
+
+def test_matches_a_full_scan():
+    rng = random.Random(3)
+    words = ["sapphire", "saver", "gold", "golden", "cash", "cashback", "travel", "platinum"]
+    cards = [{"name": " ".join(rng.sample(words, 2)), "issuer": rng.choice(["Chase", "Citi"]),
+              "categories": {"dining": rng.randint(1, 5)}} for _ in range(300)]
+    index = SearchIndex(cards)
+
+    def score(card, word):
+        best = 0
+        for field, weight in (("name", 4), ("issuer", 3), ("categories", 2)):
+            for card_word in tokenize(card[field] if field != "categories" else "dining"):
+                if card_word == word:
+                    best = max(best, weight)
+                elif card_word.startswith(word):
+                    best = max(best, weight * 0.75)
+                elif len(word) >= 3 and word in card_word:
+                    best = max(best, weight * 0.5)
+        return best
+
+    for query in ["sa", "sap", "gold", "old", "cash gold", "ch", "chase sav", "citi di", "ver"]:
+        expected = []
+        for position, card in enumerate(cards):
+            scores = [score(card, word) for word in tokenize(query)]
+            if all(scores):
+                expected.append((-sum(scores), position))
+        expected.sort()
+        count, page = index.search(query, limit=10, offset=5)
+        assert count == len(expected), query
+        assert page == [(position, -neg_score) for neg_score, position in expected[5:15]], query
+
+
+def test_index_survives_pickling():
+    index = SearchIndex(CARDS)
+    index.search("", category="dining")
+
+    restored = pickle.loads(pickle.dumps(index))
+
+    assert restored._allowed_cache == {}
+    assert names(restored, "chase", category="travel") == ["Chase Sapphire Preferred"]
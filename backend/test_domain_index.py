@@ -0,0 +1,72 @@
+import pytest
+
+from domain_index import MerchantDomainIndex, extract_host, registrable_domain
+from recommender import CardRecommender
+
+MERCHANTS = {
+    "amazon.com": {"name": "Amazon", "category": "online_shopping"},
+    "walmart.com": {"name": "Walmart", "category": "groceries"},
+    "grocery.walmart.com": {"name": "Walmart Grocery", "category": "groceries"},
+    "shell.com": {"name": "Shell", "category": "gas"},
+    "shell.co.uk": {"name": "Shell UK", "category": "gas"}
+}
+
+
+@pytest.mark.parametrize("text, host", [
+    ("https://checkout.amazon.com/cart?item=1", "checkout.amazon.com"),
+    ("Amazon.com", "amazon.com"),
+    ("Checkout - Amazon.co.uk, order 123", "amazon.co.uk"),
+    ("www.target.com:443/checkout", "www.target.com"),
+    ("Mr. Smith's Deli", None),
+    ("1.5% back", None),
+    ("Trader Joe's", None),
+])
+def test_extract_host(text, host):
+    assert extract_host(text) == host
+
+
+def test_registrable_domain_respects_public_suffixes():
+    assert registrable_domain("m.amazon.co.uk") == "amazon.co.uk"
+    assert registrable_domain("grocery.walmart.com") == "walmart.com"
+    assert registrable_domain("co.uk") is None
+
+
+@pytest.mark.parametrize("host, domain, match_type", [
+    ("walmart.com", "walmart.com", "exact"),
+    ("grocery.walmart.com", "grocery.walmart.com", "exact"),
+    ("m.walmart.com", "walmart.com", "suffix"),
+    ("www.grocery.walmart.com", "grocery.walmart.com", "suffix"),
+    ("checkout.amazon.com", "amazon.com", "suffix"),
+    ("amazon.co.uk", "amazon.com", "brand"),
+    ("www.amazon.de", "amazon.com", "brand"),
+])
+def test_lookup_most_specific_entry(host, domain, match_type):
+    index = MerchantDomainIndex(MERCHANTS)
+
+    found, _, found_type = index.lookup(host)
+
+    assert (found, found_type) == (domain, match_type)
+
+
+def test_lookup_misses():
+    index = MerchantDomainIndex(MERCHANTS)
+
+    # "shell" is ambiguous across suffixes, and "com" alone is a public suffix
+    assert index.lookup("shell.de") is None
+    assert index.lookup("com") is None
+    assert index.lookup("notamazon.com") is None
+
+
+def test_large_merchant_lists():
+    index = MerchantDomainIndex({f"shop{i}.com": {"name": str(i)} for i in range(200000)})
+
+    assert index.lookup("pay.shop123456.com")[1]["name"] == "123456"
+
+
+def test_recommender_resolves_subdomains(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    assert recommender.determine_merchant_categories("https://checkout.amazon.com/pay")["name"] == "Amazon"
+    assert recommender.determine_merchant_categories("grocery.walmart.com")["name"] == "Walmart Grocery"
+    uk = recommender.determine_merchant_categories("amazon.co.uk")
+    assert (uk["name"], uk["confidence"]) == ("Amazon", "medium")
@@ -0,0 +1,51 @@
+import pytest
+
+from card_scraper import CardScraper, NERDWALLET_SPEC
+from fixture_server import load_fixture
+from html_parsing import SiteSpec, available_backends, extract_items, get_backend
+
+PAGE = load_fixture("nerdwallet.html").decode("utf-8")
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_backends_extract_the_same_items(backend):
+    reference = extract_items(PAGE, NERDWALLET_SPEC, get_backend("html.parser"))
+
+    items = extract_items(PAGE, NERDWALLET_SPEC, get_backend(backend))
+
+    assert items == reference
+    assert [item["name"] for item in items] == [
+        "Chase Freedom Unlimited®",
+        "Blue Cash Preferred® Card from American Express",
+        "Capital One Savor Cash Rewards"
+    ]
+    assert items[2]["fee"] == "No annual fee"
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_missing_fields_are_none(backend):
+    spec = SiteSpec("test", ".card", {"name": ".name", "fee": ".fee"})
+    html = '<div class="card"><b class="name"> Only Name </b></div><div class="other"><i class="fee">$5</i></div>'
+
+    assert extract_items(html, spec, get_backend(backend)) == [{"name": "Only Name", "fee": None}]
+
+
+def test_strainer_only_for_simple_container_selectors():
+    assert SiteSpec("a", "div.card", {}).strainer is not None
+    assert SiteSpec("b", ".card", {}).strainer is not None
+    assert SiteSpec("c", "section > .card", {}).strainer is None
+
+
+def test_unknown_backend_falls_back(monkeypatch):
+    monkeypatch.setenv("SWIPE_HTML_PARSER", "does-not-exist")
+
+    assert get_backend().name == available_backends()[0]
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_nerdwallet_parser_is_backend_independent(data_dir, backend):
+    cards = CardScraper(data_dir, html_parser=backend)._parse_nerdwallet(PAGE)
+    reference = CardScraper(data_dir, html_parser="html.parser")._parse_nerdwallet(PAGE)
+
+    assert cards == reference
+    assert cards[0]["categories"] == {"other": 1, "travel": 5, "dining": 3}
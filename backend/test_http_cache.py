@@ -0,0 +1,152 @@
+import gzip
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+import http_cache
+from http_cache import ResponseCache
+
+
+@pytest.fixture
+def served():
+    app = Flask(__name__)
+    cache = ResponseCache(maxsize=4)
+    state = {"version": 1, "builds": 0}
+
+    @app.route('/data')
+    def data():
+        def build():
+            state["builds"] += 1
+            return json.dumps({"version": state["version"], "items": ["x" * 10] * 200})
+        return cache.respond("data", state["version"], build)
+
+    return app.test_client(), state
+
+
+def test_unchanged_data_gets_a_304(served):
+    client, state = served
+
+    first = client.get('/data')
+    again = client.get('/data', headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "public, no-cache"
+    assert again.status_code == 304 and again.data == b"" and again.headers["ETag"] == first.headers["ETag"]
+    assert state["builds"] == 1
+
+    state["version"] = 2
+    changed = client.get('/data', headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+    assert changed.get_json()["version"] == 2
+
+
+def test_gzip_is_negotiated_and_compressed_once(served):
+    client, state = served
+
+    plain = client.get('/data')
+    compressed = [client.get('/data', headers={"Accept-Encoding": "gzip;q=1, deflate"}) for _ in range(2)]
+
+    assert "Content-Encoding" not in plain.headers and "Accept-Encoding" in plain.headers["Vary"]
+    assert compressed[0].headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed[0].data) == plain.data
+    assert compressed[0].data == compressed[1].data and state["builds"] == 1
+
+
+def test_each_content_coding_has_its_own_etag(served):
+    client, _ = served
+
+    plain = client.get('/data')
+    compressed = client.get('/data', headers={"Accept-Encoding": "gzip"})
+    again = client.get('/data', headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+    assert again.status_code == 304 and again.headers["ETag"] == compressed.headers["ETag"]
+    assert "Accept-Encoding" in again.headers["Vary"]
+    # A client holding the uncompressed body gets the compressed one, under its own tag
+    switched = client.get('/data', headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]})
+    assert switched.status_code == 200 and switched.headers["ETag"] == compressed.headers["ETag"]
+
+
+def test_encoding_choice(monkeypatch):
+    from werkzeug.datastructures import Accept
+
+    monkeypatch.setattr(http_cache, "brotli", object())
+    assert http_cache.choose_encoding(Accept([("gzip", 1), ("br", 1)]), 4096) == "br"
+    assert http_cache.choose_encoding(Accept([("gzip", 1), ("br", 0.5)]), 4096) == "gzip"
+    assert http_cache.choose_encoding(Accept([("gzip", 1)]), 100) == "identity"
+    assert http_cache.choose_encoding(Accept([("br", 0)]), 4096) == "identity"
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert http_cache.choose_encoding(Accept([("br", 1), ("*", 0.1)]), 4096) == "gzip"
+
+
+def test_concurrent_misses_build_and_compress_once(monkeypatch):
+    app = Flask(__name__)
+    cache = ResponseCache()
+    builds = []
+    compressions = []
+    compress = http_cache.CachedBody._compress
+
+    def slow_compress(self, encoding):
+        compressions.append(encoding)
+        time.sleep(0.05)
+        return compress(self, encoding)
+
+    monkeypatch.setattr(http_cache.CachedBody, "_compress", slow_compress)
+
+    @app.route('/data')
+    def data():
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return json.dumps(["x" * 10] * 200)
+        return cache.respond("data", 1, build)
+
+    def fetch():
+        return app.test_client().get('/data', headers={"Accept-Encoding": "gzip"}).data
+
+    with ThreadPoolExecutor(8) as pool:
+        bodies = list(pool.map(lambda _: fetch(), range(8)))
+
+    assert len(set(bodies)) == 1 and gzip.decompress(bodies[0])
+    assert builds == [1] and compressions == ["gzip"]
+
+
+def test_cache_is_bounded_by_body_bytes():
+    app = Flask(__name__)
+    cache = ResponseCache(maxsize=16, max_bytes=5000)
+
+    @app.route('/data/<int:n>')
+    def data(n):
+        return cache.respond(("data", n), 1, lambda: json.dumps(["x" * 10] * 150))
+
+    client = app.test_client()
+    for n in range(4):
+        client.get(f'/data/{n}')
+    assert len(cache.cache) == 2 and cache.cache.weight <= 5000
+
+    # The gzip body counts too once it is compressed
+    before = cache.cache.weight
+    client.get('/data/3', headers={"Accept-Encoding": "gzip"})
+    assert cache.cache.weight > before
+
+
+def test_misses_for_other_keys_build_in_parallel():
+    app = Flask(__name__)
+    cache = ResponseCache()
+    started = threading.Barrier(2, timeout=5)
+
+    @app.route('/data/<int:n>')
+    def data(n):
+        def build():
+            # Both builds must be running at once to pass the barrier
+            started.wait()
+            return json.dumps([n])
+        return cache.respond(("data", n), 1, build)
+
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda n: app.test_client().get(f'/data/{n}'), range(2)))
+
+    assert [response.get_json() for response in responses] == [[0], [1]]
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from json_stream import iter_json_array
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOCUMENT = [
+    {"name": "Sapphire Preferred", "bonus": {"text": "60,000 points"}, "tags": ["travel", "dining"]},
+    12345,
+    -0.5e3,
+    "café — \"quoted\"",
+    True,
+    None,
+    [],
+    {}
+]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 16])
+def test_elements_survive_any_chunk_boundary(size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode("utf-8")
+
+    assert list(iter_json_array(chunked(data, size))) == DOCUMENT
+
+
+def test_numbers_are_not_cut_at_chunk_ends():
+    assert list(iter_json_array([b"[12", b"34, 5", b"6]"])) == [1234, 56]
+
+
+def test_empty_array_and_byte_order_mark():
+    assert list(iter_json_array([b"\xef\xbb\xbf [ ", b"]\n"])) == []
+
+
+def test_elements_are_yielded_before_the_document_ends():
+    def chunks():
+        yield b'[{"a": 1}, '
+        raise ConnectionError("connection reset")
+
+    elements = iter_json_array(chunks())
+
+    assert next(elements) == {"a": 1}
+    with pytest.raises(ConnectionError):
+        next(elements)
+
+
+@pytest.mark.parametrize("data", [b'{"a": 1}', b'[1, 2', b'[1 2]', b'[1,]', b'[1] [2]', b'[{"a": }]'])
+def test_invalid_documents_raise(data):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(data, 2)))
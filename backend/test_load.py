@@ -0,0 +1,65 @@
+import json
+import time
+
+import requests
+
+from benchmarks import load
+
+
+def test_recorded_requests_from_both_log_formats(tmp_path):
+    log = tmp_path / "api.log"
+    log.write_text("\n".join([
+        "2025-04-14 18:09:41,877 - swipe-api - INFO - Received request: "
+        "<Request 'http://localhost:5001/api/recommend' [POST]>",
+        "2025-04-14 18:09:41,878 - swipe-api - INFO - Request JSON: {'merchant': 'Target', 'amount': 75.25}",
+        "2025-04-14 18:09:41,878 - swipe-api - INFO - Processing request for merchant: target, amount: 75.25",
+        json.dumps({"message": "Received request", "route": "/api/recommend",
+                    "payload": {"merchant": "amazon.com", "amount": 10, "limit": 3}}),
+        json.dumps({"message": "POST /api/recommend 200 1.2ms", "status": 200}),
+        "{not json",
+        "2025-04-14 18:10:00,000 - swipe-api - INFO - Request JSON: {'merchant': 'orphan', 'amount': 1}",
+    ]))
+
+    assert load.read_recorded_requests(str(log)) == [
+        ("POST /api/recommend", "POST", "/api/recommend", {"merchant": "Target", "amount": 75.25}),
+        ("POST /api/recommend", "POST", "/api/recommend", {"merchant": "amazon.com", "amount": 10, "limit": 3}),
+    ]
+
+
+def test_summary_per_endpoint():
+    samples = [("GET /ping", 200, i / 1000) for i in range(1, 101)]
+    samples += [("POST /api/recommend", 200, 0.005), ("POST /api/recommend", 500, 0.5),
+                ("POST /api/recommend", 0, 10.0)]
+
+    summary = load.summarize(samples, duration=2)
+
+    ping = summary["GET /ping"]
+    assert ping["requests"] == 100 and ping["throughput"] == 50 and ping["error_rate"] == 0
+    assert (ping["latency_ms"]["p50"], ping["latency_ms"]["p99"], ping["latency_ms"]["max"]) == (50, 99, 100)
+    recommend = summary["POST /api/recommend"]
+    assert recommend["statuses"] == {"200": 1, "500": 1, "error": 1}
+    assert round(recommend["error_rate"], 3) == 0.667
+    assert summary["all"]["requests"] == 103
+
+
+def test_mixed_requests_follow_the_weights():
+    plan = load.mixed_requests(load.parse_mix("recommend=3,ping=1"), 400)
+
+    labels = [label for label, _, _, _ in plan]
+    assert set(labels) == {"POST /api/recommend", "GET /ping"}
+    assert 250 < labels.count("POST /api/recommend") < 350
+
+
+def test_local_server_runs_offline():
+    with load.LocalServer("dev") as server:
+        plan = load.mixed_requests({"recommend": 1, "search": 1}, 50)
+        summary = load.run(server.url, plan, rate=50, duration=1, concurrency=2, warmup=0, processes=1)
+
+        # A refresh reads the card sources from the local fixture server
+        requests.post(server.url + '/api/refresh-card-data', timeout=5).raise_for_status()
+        deadline = time.monotonic() + 10
+        while server.sources.hits("/nerdwallet.html") == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    assert summary["all"]["requests"] >= 40 and summary["all"]["error_rate"] == 0
+    assert server.sources.hits("/github.json") == 1 and server.sources.hits("/nerdwallet.html") == 1
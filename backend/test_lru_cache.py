@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+
+from lru_cache import LRUCache
+from recommender import CardRecommender
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expires_entries():
+    cache = LRUCache(maxsize=10, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_max_weight_evicts_and_reweighs():
+    cache = LRUCache(maxsize=10, max_weight=10, weigh=len)
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    cache.put("c", "x" * 4)
+
+    assert cache.get("a") is None and cache.stats()["weight"] == 8
+    cache.put("b", "x" * 10)
+    assert cache.get("c") is None and cache.stats()["weight"] == 10
+    # Heavier than the whole cache: not stored
+    cache.put("d", "x" * 11)
+    assert cache.get("d") is None and cache.get("b") == "x" * 10
+
+
+def test_hit_rate_statistics():
+    cache = LRUCache(maxsize=10)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("a", lambda: 2)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_concurrent_access_stays_bounded():
+    cache = LRUCache(maxsize=50)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.get_or_compute((offset + i) % 200, lambda: i)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["size"] <= 50
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+
+
+def test_classification_is_cached_by_normalized_merchant(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    first = recommender.determine_merchant_categories("Shell Gas")
+    second = recommender.determine_merchant_categories("  shell gas ")
+
+    assert first["categories"] == second["categories"] == ["gas"]
+    # The name still reflects the caller's input
+    assert second["name"] == "  shell gas "
+    assert recommender.classification_cache.stats()["hits"] == 1
+
+
+def test_reload_invalidates_classifications(data_dir):
+    recommender = CardRecommender(data_dir)
+    assert recommender.determine_merchant_categories("Blue Bottle")["categories"] == ["other"]
+
+    with open(recommender.merchant_categories_file, 'w') as f:
+        json.dump({"dining": ["blue bottle"]}, f)
+    recommender.reload_merchant_data()
+
+    assert recommender.determine_merchant_categories("Blue Bottle")["categories"] == ["dining"]
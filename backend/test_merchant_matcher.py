@@ -0,0 +1,91 @@
+import pytest
+
+from merchant_matcher import KeywordMatcher
+from recommender import CardRecommender
+
+
+def test_finds_overlapping_keywords_in_one_pass():
+    matcher = KeywordMatcher([("new", 1), ("new york", 2), ("york", 3), ("york city", 4), ("city", 5)]).build()
+
+    assert sorted(matcher.find("New York City")) == [1, 2, 3, 4, 5]
+
+
+def test_matching_is_case_insensitive():
+    matcher = KeywordMatcher([("Whole Foods", "groceries")]).build()
+
+    assert matcher.find("WHOLE FOODS MARKET") == ["groceries"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("BP Gas Station", ["bp"]),
+    ("bp", ["bp"]),
+    ("subpar goods", []),
+    ("Greyhound bus", ["bus"]),
+    ("business supplies", []),
+    ("City buses", ["bus"]),
+    ("BPs", ["bp"]),
+    ("bpx", []),
+])
+def test_word_boundaries(text, expected):
+    matcher = KeywordMatcher([("bp", "bp"), ("bus", "bus")]).build()
+
+    assert matcher.find(text) == expected
+
+
+def test_punctuation_edges_do_not_require_boundaries():
+    matcher = KeywordMatcher([(".com", "online"), ("disney+", "streaming")]).build()
+
+    assert matcher.find("amazon.com/checkout") == ["online"]
+    assert matcher.find("disney+plus") == ["streaming"]
+    assert matcher.find("amazon.community") == []
+
+
+def test_large_keyword_sets():
+    keywords = [(f"merchant{i}", i) for i in range(20000)]
+    matcher = KeywordMatcher(keywords).build()
+
+    assert matcher.find("paid at merchant12345 today") == [12345]
+
+
+@pytest.fixture(scope="module")
+def recommender(tmp_path_factory):
+    return CardRecommender(str(tmp_path_factory.mktemp("data")))
+
+
+def test_classification_keeps_category_order(recommender):
+    result = recommender.determine_merchant_categories("Shell gas station")
+
+    assert result["categories"] == ["gas"]
+
+
+def test_merchant_specific_mapping(recommender):
+    result = recommender.determine_merchant_categories("Delta Air Lines")
+
+    assert result["categories"] == ["travel", "airlines"]
+
+
+def test_online_indicator(recommender):
+    result = recommender.determine_merchant_categories("Some online store")
+
+    assert result["categories"] == ["online_shopping"]
+
+
+def test_short_keywords_no_longer_match_inside_words(recommender):
+    result = recommender.determine_merchant_categories("Business Depot")
+
+    assert "transit" not in result["categories"]
+    assert result["categories"] == ["other"]
+
+
+@pytest.mark.parametrize("merchant, category", [
+    ("JetBlue Airlines", "travel"),
+    ("Spirit Airlines", "travel"),
+    ("Best Western Hotels", "travel"),
+    ("Cheap Flights Inc", "travel"),
+    ("Harkins Movies", "entertainment"),
+    ("Lou's Restaurants", "dining"),
+])
+def test_plural_keywords_match(recommender, merchant, category):
+    result = recommender.determine_merchant_categories(merchant)
+
+    assert category in result["categories"]
@@ -0,0 +1,100 @@
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+
+import metrics
+from card_catalog import CatalogSnapshot
+from lru_cache import LRUCache
+from metrics import PhaseTimings, StatsExporter, record_source_report
+
+
+class FakeCatalog:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get_snapshot(self):
+        return self.snapshot
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture(scope="module")
+def client():
+    # One app per test module: the catalog collector registers on the global registry
+    app = Flask(__name__)
+    catalog = FakeCatalog(CatalogSnapshot([{"name": "A"}, {"name": "B"}], 7, "abc", "test"))
+    metrics.init_app(app, catalog)
+
+    @app.route('/hello/<name>')
+    def hello(name):
+        return "hello " + name
+
+    return app.test_client()
+
+
+def test_requests_are_counted_per_route_and_status(client):
+    labels = {"route": "/hello/<name>", "method": "GET"}
+    before = sample('swipe_http_requests_total', status="200", **labels)
+    unmatched_before = sample('swipe_http_requests_total', route="unmatched", method="GET", status="404")
+    observed_before = sample('swipe_http_request_duration_seconds_count', **labels)
+
+    client.get('/hello/a')
+    client.get('/hello/b')
+    client.get('/nowhere')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert 'swipe_http_requests_total{method="GET",route="/hello/<name>",status="200"}' in response.text
+    assert sample('swipe_http_requests_total', status="200", **labels) == before + 2
+    assert sample('swipe_http_requests_total', route="unmatched", method="GET", status="404") == unmatched_before + 1
+    assert sample('swipe_http_request_duration_seconds_count', **labels) == observed_before + 2
+
+
+def test_catalog_gauges(client):
+    text = client.get('/metrics').text
+
+    assert "swipe_catalog_cards 2.0" in text
+    assert "swipe_catalog_version 7.0" in text
+    assert "swipe_catalog_loaded_timestamp_seconds " in text
+
+
+def test_phase_timings_are_exported_as_deltas():
+    timings = PhaseTimings(("test-phase",))
+    timings.add("test-phase", 0.25)
+    timings.add("test-phase", 0.5)
+
+    timings.export()
+    timings.export()
+
+    assert sample('swipe_recommendation_phase_seconds_total', phase="test-phase") == 0.75
+    assert sample('swipe_recommendation_phase_calls_total', phase="test-phase") == 2
+
+
+def test_cache_statistics_are_exported_as_deltas():
+    cache = LRUCache(maxsize=1)
+    exporter = StatsExporter({"test-cache": cache}, phase_timings=PhaseTimings(()))
+    cache.get("a")
+    cache.put("a", 1)
+    cache.get("a")
+    exporter.export()
+
+    cache.put("b", 2)
+    cache.get("b")
+    exporter.export()
+
+    assert sample('swipe_cache_events_total', cache="test-cache", event="hits") == 2
+    assert sample('swipe_cache_events_total', cache="test-cache", event="misses") == 1
+    assert sample('swipe_cache_events_total', cache="test-cache", event="evictions") == 1
+
+
+def test_source_reports():
+    record_source_report("test-source", {"outcome": "changed", "fetch_seconds": 1.5, "parse_seconds": 0.2})
+    record_source_report("test-source", {"outcome": "fetch_failed", "fetch_seconds": 3.0, "parse_seconds": None})
+
+    assert sample('swipe_source_refreshes_total', source="test-source", outcome="changed") == 1
+    assert sample('swipe_source_refreshes_total', source="test-source", outcome="fetch_failed") == 1
+    assert sample('swipe_source_fetch_seconds_count', source="test-source") == 2
+    assert sample('swipe_source_fetch_seconds_sum', source="test-source") == 4.5
+    assert sample('swipe_source_parse_seconds_count', source="test-source") == 1
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from card_scraper import NERDWALLET_SPEC
+from fixture_server import load_fixture
+from html_parsing import parse_page
+from parse_pool import ParsePool, ParseWorker, WORKER_SCRIPT
+
+PAGE = load_fixture("nerdwallet.html").decode("utf-8")
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_pages_parse_like_the_calling_thread(workers):
+    with ParsePool(workers) as pool:
+        pages = [pool.submit(PAGE, NERDWALLET_SPEC) for _ in range(3)]
+        results = [page.result() for page in pages]
+
+    assert results == [parse_page(PAGE, NERDWALLET_SPEC)] * 3
+    assert len(results[0][0]) == 3 and results[0][1] is None
+
+
+def test_parse_errors_surface_on_result():
+    with ParsePool(0) as pool:
+        page = pool.submit(None, NERDWALLET_SPEC)
+
+    with pytest.raises(Exception):
+        page.result()
+
+
+def test_slow_page_times_out_and_its_worker_is_replaced():
+    huge = PAGE.replace("<main>", "<main>" + "<div><p>filler</p></div>" * 100000)
+
+    with ParsePool(1, page_timeout=0.05, backend_name="html.parser") as pool:
+        page = pool.submit(huge, NERDWALLET_SPEC)
+        with pytest.raises(TimeoutError):
+            page.result()
+
+        # The stuck worker was killed, a new one parses the next page
+        pool.page_timeout = 30
+        assert pool.submit(PAGE, NERDWALLET_SPEC).result() == parse_page(PAGE, NERDWALLET_SPEC)
+
+
+def test_page_timeout_counts_from_the_start_of_parsing(monkeypatch):
+    def slow_parse(worker, html, spec, backend_name):
+        time.sleep(0.3)
+        return [], None
+
+    monkeypatch.setattr(ParseWorker, "parse", slow_parse)
+    with ParsePool(1, page_timeout=0.5) as pool:
+        # The second page waits 0.3s for the worker, then parses within its timeout
+        pages = [pool.submit(PAGE, NERDWALLET_SPEC) for _ in range(2)]
+
+        assert [page.result() for page in pages] == [([], None)] * 2
+
+
+def test_a_late_timeout_spares_the_workers_next_page():
+    with ParsePool(1) as pool:
+        first = pool.submit(PAGE, NERDWALLET_SPEC)
+        first.result()
+        worker = pool._idle[0]
+        second = pool.submit(PAGE, NERDWALLET_SPEC)
+
+        # The first page's timer firing now must not kill the worker, which is no longer its own
+        pool._expire(first, worker)
+
+        assert second.result() == parse_page(PAGE, NERDWALLET_SPEC)
+        assert worker.alive and not first.timed_out
+
+
+def test_workers_are_kept_across_batches():
+    with ParsePool(2) as pool:
+        first = [pool.submit(PAGE, NERDWALLET_SPEC) for _ in range(2)]
+        [page.result() for page in first]
+        workers = {worker.process.pid for worker in pool._idle}
+        second = [pool.submit(PAGE, NERDWALLET_SPEC) for _ in range(2)]
+        [page.result() for page in second]
+
+        assert {worker.process.pid for worker in pool._idle} == workers and len(workers) <= 2
+    assert pool._idle == []
+
+
+def test_workers_never_rerun_the_entry_script(tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text("\n".join([
+        "import sys",
+        "if __name__ != '__main__':",
+        "    raise SystemExit('entry script re-run in a parse worker')",
+        f"sys.path.insert(0, {os.path.dirname(WORKER_SCRIPT)!r})",
+        "from card_scraper import NERDWALLET_SPEC",
+        "from fixture_server import load_fixture",
+        "from parse_pool import ParsePool",
+        "with ParsePool(1) as pool:",
+        "    items, _ = pool.submit(load_fixture('nerdwallet.html').decode('utf-8'), NERDWALLET_SPEC).result()",
+        "print(len(items))",
+    ]))
+
+    output = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, check=True,
+                            cwd=tmp_path).stdout
+
+    assert output.strip() == "3"
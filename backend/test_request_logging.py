@@ -0,0 +1,159 @@
+import io
+import json
+import queue
+import logging
+
+import pytest
+from flask import Flask
+
+import request_logging
+from request_logging import JsonFormatter, LogWriter, RequestQueueHandler, parse_sample_rates
+
+test_logger = logging.getLogger('swipe-test')
+
+
+@pytest.fixture
+def log_queue():
+    """Queue receiving every record logged during the test"""
+    handler = RequestQueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    old_level = root.level
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    yield handler
+    root.removeHandler(handler)
+    root.setLevel(old_level)
+
+
+def drain(handler):
+    records = []
+    while not handler.queue.empty():
+        records.append(handler.queue.get())
+    return records
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    request_logging.init_app(app, sample_rates={"/quiet": 0.0})
+
+    @app.route('/hello')
+    def hello():
+        test_logger.info("Saying hello to %s", "you")
+        return "hello"
+
+    @app.route('/quiet')
+    def quiet():
+        test_logger.info("Sampled out")
+        test_logger.warning("Kept anyway")
+        return "shh"
+
+    return app.test_client()
+
+
+def test_records_carry_request_id_route_and_duration(client, log_queue):
+    response = client.get('/hello', headers={"X-Request-ID": "req-42"})
+
+    assert response.headers["X-Request-ID"] == "req-42"
+    message, access = drain(log_queue)
+    assert message.getMessage() == "Saying hello to you" and message.args is None
+    assert message.request_id == access.request_id == "req-42"
+    assert access.route == "/hello" and access.status == 200 and access.duration_ms >= 0
+
+
+def test_invalid_request_ids_are_replaced(client, log_queue):
+    response = client.get('/hello', headers={"X-Request-ID": "bad id" + "x" * 100})
+
+    request_id = response.headers["X-Request-ID"]
+    assert len(request_id) == 32
+    assert {record.request_id for record in drain(log_queue)} == {request_id}
+
+
+def test_unsampled_routes_keep_only_warnings(client, log_queue):
+    client.get('/quiet')
+    client.get('/hello')
+
+    messages = [record.getMessage() for record in drain(log_queue)]
+    assert messages[0] == "Kept anyway"
+    assert messages[1] == "Saying hello to you" and messages[2].startswith("GET /hello 200 ")
+    assert len(messages) == 3
+
+
+def test_arguments_are_not_formatted_for_dropped_records():
+    class Expensive:
+        formatted = 0
+
+        def __str__(self):
+            Expensive.formatted += 1
+            return "expensive"
+
+    # Kept away from the root logger, where pytest's capture handlers format everything
+    lazy_logger = logging.getLogger('swipe-test.lazy')
+    lazy_logger.propagate = False
+    lazy_logger.setLevel(logging.INFO)
+    handler = RequestQueueHandler(queue.SimpleQueue())
+    lazy_logger.addHandler(handler)
+
+    app = Flask(__name__)
+    request_logging.init_app(app, sample_rates={"/": 0.0})
+    app.add_url_rule('/', 'index', lambda: lazy_logger.info("Sampled out %s", Expensive()) or "ok")
+    try:
+        lazy_logger.debug("Disabled level %s", Expensive())
+        app.test_client().get('/')
+    finally:
+        lazy_logger.removeHandler(handler)
+
+    assert Expensive.formatted == 0
+    assert handler.queue.empty()
+
+
+def test_full_queue_drops_records(log_queue, monkeypatch):
+    monkeypatch.setattr(request_logging, "QUEUE_SIZE", 2)
+
+    for i in range(5):
+        test_logger.info("record %s", i)
+
+    assert len(drain(log_queue)) == 2
+    assert log_queue.dropped == 3
+
+
+def test_writer_writes_json_lines_and_flushes_on_stop(log_queue):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    writer = LogWriter(log_queue.queue, [handler], interval=0.01)
+    writer.start()
+
+    test_logger.info("Received request", extra={"payload": {"merchant": "amazon.com"}})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        test_logger.error("Request failed", exc_info=True)
+    writer.stop()
+
+    received, failed = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert received["message"] == "Received request" and received["level"] == "INFO"
+    assert received["payload"] == {"merchant": "amazon.com"}
+    assert failed["level"] == "ERROR" and "ValueError: boom" in failed["exception"]
+
+
+def test_writer_stops_when_records_follow_the_stop_marker(log_queue):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    writer = LogWriter(log_queue.queue, [handler])
+
+    # Logged by another thread between stop() queueing the marker and the writer waking up
+    log_queue.queue.put(LogWriter._STOP)
+    test_logger.info("Late record")
+    writer.start()
+    writer._thread.join(timeout=5)
+
+    assert not writer._thread.is_alive()
+    assert json.loads(stream.getvalue())["message"] == "Late record"
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("/api/recommend=0.1, /ping=0,bogus,/x=2") == {
+        "/api/recommend": 0.1, "/ping": 0.0, "/x": 1.0
+    }
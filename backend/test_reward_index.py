@@ -0,0 +1,123 @@
+import random
+
+from recommender import CardRecommender
+from reward_index import RewardIndex, SOURCE_BASE, SOURCE_CATEGORY, SOURCE_QUARTERLY
+
+CATEGORIES = ["dining", "groceries", "gas", "travel", "streaming", "amazon"]
+
+
+def make_catalog(count, seed=7):
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        categories = {"other": rng.choice([1, 1.5, 2])}
+        for category in rng.sample(CATEGORIES, rng.randint(0, 3)):
+            categories[category] = rng.choice([1, 2, 3, 4, 5, 6])
+        cards.append({"name": f"Card {i}", "issuer": rng.choice(["Chase", "Citi"]), "categories": categories})
+    return cards
+
+
+def brute_force(cards, categories):
+    scores = []
+    for position, card in enumerate(cards):
+        rates = [card["categories"].get("other", 1)]
+        rates += [card["categories"][c] for c in categories if c in card["categories"]]
+        scores.append((-max(rates), position))
+    return [(position, -neg_rate) for neg_rate, position in sorted(scores)]
+
+
+def test_rank_matches_full_scan():
+    cards = make_catalog(500)
+    index = RewardIndex(cards)
+
+    for categories in (["dining"], ["gas", "travel"], ["other"], ["unknown"]):
+        ranked = [(position, rate) for position, rate, _, _ in index.rank(categories, {})]
+        assert ranked == brute_force(cards, categories)
+
+
+def test_rank_top_k_is_prefix_of_full_ranking():
+    index = RewardIndex(make_catalog(500))
+
+    full = index.rank(["dining", "groceries"], {})
+    assert index.rank(["dining", "groceries"], {}, limit=10) == full[:10]
+
+
+def test_rank_reports_reward_source():
+    cards = [
+        {"name": "Dining Card", "categories": {"dining": 4, "other": 1}},
+        {"name": "Flat Card", "categories": {"other": 2}},
+        {"name": "Discover it Cash Back", "categories": {"other": 1}}
+    ]
+    index = RewardIndex(cards)
+
+    ranked = index.rank(["dining"], {"dining": [(-5, 2)], "gas": [(-5, 1)]})
+
+    assert ranked == [
+        (2, 5, SOURCE_QUARTERLY, "dining"),
+        (0, 4, SOURCE_CATEGORY, "dining"),
+        (1, 2, SOURCE_BASE, "other")
+    ]
+
+
+def test_rank_applies_card_filter():
+    index = RewardIndex(make_catalog(200))
+
+    ranked = index.rank(["dining"], {}, limit=5, card_filter=lambda card: card["issuer"] == "Citi")
+
+    assert len(ranked) == 5
+    assert all(index.cards[position]["issuer"] == "Citi" for position, _, _, _ in ranked)
+
+
+def test_recommendations_respect_limit(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    full = recommender.get_recommendations("Whole Foods", 100.0)
+    top = recommender.get_recommendations("Whole Foods", 100.0, limit=3)
+
+    assert len(full["recommendations"]) == len(recommender.scraper.get_snapshot().cards)
+    assert top["recommendations"] == full["recommendations"][:3]
+    cashback = [card["cashback"] for card in full["recommendations"]]
+    assert cashback == sorted(cashback, reverse=True)
+
+
+def test_preferences_fall_back_to_unfiltered(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    filtered = recommender.get_recommendations("Amazon", 50.0, {"preferred_issuers": ["Chase"]})
+    unmatched = recommender.get_recommendations("Amazon", 50.0, {"preferred_issuers": ["Nobody"]})
+
+    assert {card["issuer"] for card in filtered["recommendations"]} == {"Chase"}
+    assert unmatched["recommendations"] == recommender.get_recommendations("Amazon", 50.0)["recommendations"]
+
+
+def test_ranking_is_cached_across_amounts(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    small = recommender.get_recommendations("Whole Foods", 10.0)
+    large = recommender.get_recommendations("Whole Foods", 1000.0)
+
+    assert recommender.ranking_cache.stats()["hits"] == 1
+    assert [card["name"] for card in small["recommendations"]] == [card["name"] for card in large["recommendations"]]
+    for card in large["recommendations"]:
+        assert card["cashback"] == round(1000.0 * (card["reward_percentage"] / 100), 2)
+
+
+def test_ranking_cache_serves_shorter_limits(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    full = recommender.get_recommendations("Amazon", 50.0)
+    top = recommender.get_recommendations("Amazon", 75.0, limit=2)
+
+    assert recommender.ranking_cache.stats()["hits"] == 1
+    assert [card["name"] for card in top["recommendations"]] == [card["name"] for card in full["recommendations"][:2]]
+
+
+def test_ranking_cache_follows_catalog_version(data_dir):
+    recommender = CardRecommender(data_dir)
+    before = recommender.get_recommendations("Shell", 40.0, limit=1)
+
+    recommender.scraper.catalog.save([{"name": "Gas Card", "issuer": "Test", "categories": {"gas": 9, "other": 1}}])
+    after = recommender.get_recommendations("Shell", 40.0, limit=1)
+
+    assert before["recommendations"][0]["name"] != "Gas Card"
+    assert after["recommendations"][0]["name"] == "Gas Card"
@@ -0,0 +1,47 @@
+from recommender import CardRecommender
+from reward_index import RewardIndex
+from reward_matrix import RewardMatrix
+from test_reward_index import make_catalog
+
+MERCHANTS = ["Amazon", "amazon.com", "Whole Foods", "Shell gas", "Delta Air Lines",
+             "Netflix", "Corner Store", "Costco", "Starbucks", "uber.com"]
+
+
+def test_matrix_ranking_matches_index():
+    cards = make_catalog(300)
+    index = RewardIndex(cards)
+    matrix = RewardMatrix(cards)
+    quarterly = {"gas": [(-6, 9), (-5, 5)], "streaming": [(-5, 5)]}
+
+    for categories in (["dining"], ["gas", "travel"], ["other"], ["streaming", "amazon"]):
+        rates, sources, order = matrix.score(categories, quarterly)
+        expected = index.rank(categories, quarterly)
+        assert order.tolist() == [position for position, _, _, _ in expected]
+        assert [sources[position] for position in order] == [(source, category) for _, _, source, category in expected]
+
+
+def test_batch_matches_single_requests(data_dir):
+    recommender = CardRecommender(data_dir)
+    items = []
+    for i, merchant in enumerate(MERCHANTS * 3):
+        item = {"merchant": merchant, "amount": 12.34 * (i + 1)}
+        if i % 3 == 1:
+            item["user_preferences"] = {"preferred_issuers": ["Chase", "Citi"]}
+        elif i % 3 == 2:
+            item["user_preferences"] = {"max_annual_fee": 0, "preferred_networks": ["Visa"]}
+        items.append(item)
+
+    batch = recommender.get_batch_recommendations(items)
+
+    assert len(batch) == len(items)
+    for item, result in zip(items, batch):
+        single = recommender.get_recommendations(item["merchant"], item["amount"], item.get("user_preferences"))
+        assert result == single
+
+
+def test_batch_respects_limit(data_dir):
+    recommender = CardRecommender(data_dir)
+
+    batch = recommender.get_batch_recommendations([{"merchant": "Amazon", "amount": 80}], limit=2)
+
+    assert batch[0] == recommender.get_recommendations("Amazon", 80.0, limit=2)
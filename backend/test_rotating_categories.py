@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+from datetime import date
+
+from card_identity import CardLookup
+from recommender import MERCHANT_SPECIFIC_MAPPING, CardRecommender
+from rotating_categories import BonusTable, RotatingCalendar
+
+CALENDAR = {
+    "flex": [
+        {"start": "2026-10-01", "end": "2026-12-31", "categories": ["amazon", "walmart"], "spend_cap": 1500},
+        {"start": "2027-01-01", "end": "2027-03-31", "categories": ["groceries"], "rate": 4},
+        {"start": "2027-04-01", "end": "2027-03-01", "categories": ["gas"]}
+    ],
+    "discover": [
+        {"start": "2026-11-15", "end": "2026-11-30", "categories": ["dining"]},
+        {"start": "2026-12-01", "categories": ["gas"]}
+    ]
+}
+
+
+def test_periods_split_at_every_boundary():
+    calendar = RotatingCalendar(CALENDAR)
+
+    period = calendar.period_at(date(2026, 11, 20))
+    assert (period.start, period.end) == (date(2026, 11, 15), date(2026, 12, 1))
+    assert {card_id: bonus.categories for card_id, bonus in period.bonuses.items()} == {
+        "flex": ["amazon", "walmart"], "discover": ["dining"]}
+
+    after = calendar.period_at(date(2026, 12, 1))
+    assert after.start == date(2026, 12, 1) and set(after.bonuses) == {"flex"}
+    assert calendar.period_at(date(2027, 2, 1)).bonuses["flex"].rate == 4
+    # Before the first and after the last entry
+    assert calendar.period_at(date(2026, 1, 1)).start is None
+    assert calendar.period_at(date(2027, 6, 1)).bonuses == {}
+    # Entries ending before they start or without an end are skipped
+    assert [len(calendar.entries[card_id]) for card_id in ("flex", "discover")] == [2, 1]
+    assert RotatingCalendar.load("/nonexistent.json").entries == {}
+
+
+def test_bonus_table_resolves_card_ids():
+    cards = [{"id": "flex", "name": "Chase Freedom Flex"}, {"id": "other", "name": "Discover it"}]
+    period = RotatingCalendar(CALENDAR).period_at(date(2026, 11, 20))
+
+    table = BonusTable(period, CardLookup(cards), version=3)
+
+    # "discover" names no card in the catalog, and names don't match IDs
+    assert table.postings == {"amazon": [(-5, 0)], "walmart": [(-5, 0)]}
+    assert table.is_current(date(2026, 11, 30), 3)
+    assert not table.is_current(date(2026, 12, 1), 3) and not table.is_current(date(2026, 11, 30), 4)
+
+
+def test_recommendations_switch_period_without_reload(data_dir, monkeypatch):
+    recommender = CardRecommender(data_dir)
+    today = [date(2026, 12, 31)]
+    monkeypatch.setattr(recommender, "_today", lambda: today[0])
+
+    q4 = recommender.get_recommendations("Amazon", 2000.0)["recommendations"]
+    bonus = {card["name"]: card for card in q4 if card["reward_category"] == "quarterly_bonus"}
+    assert set(bonus) == {"Chase Freedom Flex", "Discover it Cash Back"}
+    flex = bonus["Chase Freedom Flex"]
+    assert flex["reward_percentage"] == 5 and flex["spend_cap"] == 1500
+    assert "up to $1,500" in flex["explanation"]
+    # 5% on the first $1,500, the card's 1% base rate on the rest
+    assert flex["cashback"] == 80.0
+    # Past the cap the uncapped 5% Amazon card earns the most
+    cashback = [card["cashback"] for card in q4]
+    assert q4[0]["name"] == "Amazon Prime Rewards Visa" and cashback == sorted(cashback, reverse=True)
+
+    today[0] = date(2027, 1, 1)
+    q1 = recommender.get_recommendations("Amazon", 2000.0)["recommendations"]
+    assert not any(card["reward_category"] == "quarterly_bonus" for card in q1)
+    assert recommender.ranking_cache.stats()["hits"] == 0
+
+
+def test_capped_bonuses_rank_by_cashback_with_limits(data_dir, monkeypatch):
+    recommender = CardRecommender(data_dir)
+    monkeypatch.setattr(recommender, "_today", lambda: date(2026, 11, 1))
+    items = [{"merchant": "Amazon", "amount": amount} for amount in (100.0, 10000.0)]
+
+    small, large = (recommender.get_recommendations(item["merchant"], item["amount"], limit=3) for item in items)
+
+    # Below the cap the bonus cards lead, far above it they earn less than flat 2% cards
+    assert small["recommendations"][0]["reward_category"] == "quarterly_bonus"
+    top = [(card["name"], card["cashback"]) for card in large["recommendations"]]
+    assert top[0] == ("Amazon Prime Rewards Visa", 500.0) and top[1][1] == 200.0
+    assert all(card["reward_category"] != "quarterly_bonus" for card in large["recommendations"])
+    assert recommender.get_batch_recommendations(items, limit=3) == [small, large]
+
+
+def test_spend_beyond_a_cap_earns_the_cards_category_rate(data_dir, monkeypatch):
+    calendar = {"chase-freedom-flex": [
+        {"start": "2026-10-01", "end": "2026-12-31", "categories": ["dining"], "spend_cap": 1500}]}
+    with open(os.path.join(data_dir, "rotating_categories.json"), "w") as f:
+        json.dump(calendar, f)
+    recommender = CardRecommender(data_dir)
+    monkeypatch.setattr(recommender, "_today", lambda: date(2026, 11, 1))
+
+    response = recommender.get_recommendations("Starbucks", 10000.0)
+    flex = next(card for card in response["recommendations"] if card["name"] == "Chase Freedom Flex")
+
+    # 5% on the first $1,500, the card's own 3% dining rate on the rest
+    assert flex["reward_category"] == "quarterly_bonus" and flex["rate_after_cap"] == 3
+    assert flex["cashback"] == 330.0
+    cashback = [card["cashback"] for card in response["recommendations"]]
+    assert cashback == sorted(cashback, reverse=True)
+    assert recommender.get_batch_recommendations([{"merchant": "Starbucks", "amount": 10000.0}]) == [response]
+
+
+def test_a_day_outside_the_calendar_is_logged(data_dir, monkeypatch, caplog):
+    recommender = CardRecommender(data_dir)
+    today = [date(2026, 12, 31)]
+    monkeypatch.setattr(recommender, "_today", lambda: today[0])
+
+    with caplog.at_level(logging.WARNING, logger="card-recommender"):
+        recommender.get_recommendations("Amazon", 100.0)
+        assert not caplog.records
+        today[0] = date(2027, 1, 1)
+        recommender.get_recommendations("Amazon", 100.0)
+        recommender.get_recommendations("Walmart", 100.0)
+
+    # Once per period, not per request
+    assert [record.getMessage() for record in caplog.records] == [
+        f"No rotating categories cover 2027-01-01, add its period to {recommender.rotating_categories_file}"]
+
+
+def test_calendar_categories_are_ones_merchants_classify_into(data_dir):
+    recommender = CardRecommender(data_dir)
+    classified = {"other", "online_shopping"} | set(recommender.merchant_categories)
+    classified |= {merchant["category"] for merchant in recommender.top_merchants.values()}
+    classified |= {category for categories in MERCHANT_SPECIFIC_MAPPING.values() for category in categories}
+
+    calendar = RotatingCalendar.load(recommender.rotating_categories_file)
+    categories = {category for entries in calendar.entries.values() for entry in entries
+                  for category in entry.categories}
+    assert categories and categories <= classified
+
+
+def test_merchant_bonuses_apply_by_name_and_domain(data_dir, monkeypatch):
+    recommender = CardRecommender(data_dir)
+    monkeypatch.setattr(recommender, "_today", lambda: date(2026, 11, 1))
+
+    for merchant in ("Walmart", "walmart.com", "Target", "amazon.com"):
+        recommendations = recommender.get_recommendations(merchant, 100.0)["recommendations"]
+        bonus = {card["name"] for card in recommendations if card["reward_category"] == "quarterly_bonus"}
+        assert "Discover it Cash Back" in bonus, merchant
@@ -0,0 +1,144 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import threading
+
+import pytest
+import requests
+
+SERVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            pytest.fail(f"server exited with {process.returncode}")
+        try:
+            return requests.get(url, timeout=1)
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    pytest.fail("server did not start")
+
+
+def wait_for_log(path, pattern, count, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(path) as f:
+            if f.read().count(pattern) >= count:
+                return
+        time.sleep(0.1)
+    pytest.fail(f"{pattern!r} not logged {count} times")
+
+
+@pytest.fixture
+def server(data_dir):
+    pytest.importorskip('gunicorn')
+    port = free_port()
+    env = dict(os.environ, SWIPE_DATA_DIR=data_dir, SWIPE_REFRESH_INTERVAL='0')
+    log_path = os.path.join(data_dir, 'serve.log')
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, SERVE, '--bind', f'127.0.0.1:{port}', '--workers', '2'],
+            cwd=data_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    base_url = f'http://127.0.0.1:{port}'
+    wait_until_up(base_url + '/ping', process)
+    wait_for_log(log_path, 'serving catalog version', 2)
+    yield base_url, process, log_path
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def recommend(base_url):
+    response = requests.post(base_url + '/api/recommend', json={"merchant": "amazon.com", "amount": 100}, timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+def test_preloaded_workers_serve_recommendations(server):
+    base_url, _, _ = server
+
+    results = [recommend(base_url) for _ in range(6)]
+
+    assert all(result["merchant"] == "Amazon" for result in results)
+    assert all(result["recommendations"] for result in results)
+
+
+def test_invalid_preferences_get_a_400(server):
+    base_url, _, _ = server
+    request = {"merchant": "amazon.com", "amount": 100, "user_preferences": {"max_annual_fee": [1]}}
+
+    single = requests.post(base_url + '/api/recommend', json=request, timeout=5)
+    batch = requests.post(base_url + '/api/recommend/batch', json={"items": [request]}, timeout=5)
+    valid = requests.post(base_url + '/api/recommend', timeout=5, json=dict(
+        request, user_preferences={"max_annual_fee": "95", "preferred_issuers": ["Chase"]}))
+
+    assert single.status_code == 400 and "max_annual_fee" in single.json()["error"]
+    assert batch.status_code == 400 and batch.json()["error"].startswith("items[0]")
+    assert valid.status_code == 200 and valid.json()["merchant"] == "Amazon"
+
+
+def test_hup_reloads_without_dropping_requests(server):
+    base_url, process, log_path = server
+    before = recommend(base_url)
+
+    process.send_signal(signal.SIGHUP)
+    results = [recommend(base_url) for _ in range(20)]
+    # Both replacement workers came up on the reloaded catalog
+    wait_for_log(log_path, 'serving catalog version', 4)
+    results += [recommend(base_url) for _ in range(5)]
+
+    assert process.poll() is None
+    assert all(result["recommendations"] == before["recommendations"] for result in results)
+
+
+def test_one_worker_at_a_time_runs_the_refreshes(server):
+    base_url, process, log_path = server
+    wait_for_log(log_path, 'runs the card data refreshes', 1)
+    time.sleep(0.5)
+    with open(log_path) as f:
+        leaders = re.findall(r'Worker (\d+) runs the card data refreshes', f.read())
+    assert len(leaders) == 1 and int(leaders[0]) != process.pid
+
+    # The lock goes with the worker, a waiting one takes the refreshes over
+    os.kill(int(leaders[0]), signal.SIGKILL)
+    wait_for_log(log_path, 'runs the card data refreshes', 2)
+    assert recommend(base_url)["recommendations"]
+
+
+def test_refresh_leader_retries_stale_data(tmp_path):
+    pytest.importorskip('gunicorn')
+    import serve
+
+    class Scraper:
+        data_dir = str(tmp_path)
+        auto_refresh = False
+        reads = 0
+
+        def start_refresh_scheduler(self, interval):
+            pass
+
+        def get_snapshot(self):
+            # A stale read is what starts and retries refreshes when auto_refresh is on
+            self.reads += 1
+            if self.reads == 3:
+                threading.Event().wait()
+
+    scraper = Scraper()
+    threading.Thread(target=serve._lead_refreshes, args=(scraper, 0, 0.01), daemon=True).start()
+    deadline = time.monotonic() + 5
+    while scraper.reads < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert scraper.auto_refresh and scraper.reads >= 3
@@ -4,7 +4,8 @@ import { CardDetails, getCardDetails } from './utils';
 
 // API endpoint for recommendations
 const API_URL = 'http://localhost:5001/api/recommend';
-const API_CARDS_URL = 'http://localhost:5001/api/cards';
+// Only the card fields the popup shows
+const API_CARDS_URL = 'http://localhost:5001/api/cards?fields=name,issuer,network,annual_fee,categories,image';
 const API_SEARCH_URL = 'http://localhost:5001/api/search';
 
 // User preferences (will be loaded from storage)